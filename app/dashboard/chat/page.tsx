@@ -15,7 +15,6 @@ import {
   startConversation,
   endConversation,
   logMessage,
-  extractAndStoreKeywords,
   saveConversationFeedback,
 } from "@/lib/server-actions"
 
@@ -140,10 +139,7 @@ export default function ChatPage() {
       // Registrar mensaje del usuario en la base de datos
       if (conversationId) {
         await logMessage(conversationId, "user", userMessage, intent, confidence)
-
-        // Extraer y almacenar palabras clave
-        const today = new Date().toISOString().split("T")[0]
-        await extractAndStoreKeywords(userMessage, today)
+        // Las palabras clave las cuenta el servicio keyword-stats a partir de messages (rasa/actions/keyword_stats.py)
       }
 
       // Verificar si hay respuesta
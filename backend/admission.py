@@ -0,0 +1,320 @@
+"""
+Limitación de peticiones y control de admisión para la pasarela.
+
+Antes de llegar a Rasa cada petición de chat pasa por dos controles:
+
+1. Cubetas de fichas por usuario y por IP: cada clave recibe `rate` fichas por
+   segundo hasta un máximo de `burst`; sin fichas se responde 429 con el
+   tiempo hasta la siguiente ficha en Retry-After.
+2. Límite global de peticiones simultáneas a Rasa con una cola por
+   prioridad: profesores y administradores pasan antes que los estudiantes,
+   y estos antes que los usuarios anónimos. Si la cola está llena, la
+   petición de menor prioridad se rechaza en el acto, y ninguna espera más de
+   ADMISSION_QUEUE_TIMEOUT segundos: con el sistema saturado se responde 429
+   enseguida en lugar de dejar que la petición agote su tiempo.
+
+Las cubetas se guardan en memoria o, con RATE_LIMIT_REDIS_URL, en Redis (o un
+servidor compatible) para compartirlas entre réplicas de la pasarela. El
+límite de concurrencia es siempre por proceso.
+
+La identidad y la prioridad salen del usuario autenticado (`auth.current_user`),
+nunca del cuerpo de la petición. Si el token no incluye el rol, se consulta en
+`users` con una caché acotada; si la base de datos no responde se usa
+ROLE_DEFAULT y el fallo también se cachea, para no bloquear cada petición.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la admisión
+RATE_LIMIT_USER_RATE = float(os.environ.get("RATE_LIMIT_USER_RATE", "1"))
+RATE_LIMIT_USER_BURST = float(os.environ.get("RATE_LIMIT_USER_BURST", "10"))
+RATE_LIMIT_IP_RATE = float(os.environ.get("RATE_LIMIT_IP_RATE", "5"))
+RATE_LIMIT_IP_BURST = float(os.environ.get("RATE_LIMIT_IP_BURST", "50"))
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+RASA_MAX_CONCURRENCY = int(os.environ.get("RASA_MAX_CONCURRENCY", "16"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "2"))
+ROLE_CACHE_TTL = float(os.environ.get("ROLE_CACHE_TTL", "300"))
+ROLE_CACHE_SIZE = int(os.environ.get("ROLE_CACHE_SIZE", "10000"))
+ROLE_FAILURE_TTL = float(os.environ.get("ROLE_FAILURE_TTL", "30"))
+ROLE_DEFAULT = os.environ.get("ROLE_DEFAULT", "student")
+
+# Prioridad por rol (menor = antes)
+ROLE_PRIORITY = {"admin": 0, "teacher": 0, "student": 1}
+ANONYMOUS_PRIORITY = 2
+
+
+class AdmissionRejected(Exception):
+    """La petición no se admite; se responde 429 con Retry-After."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class LocalTokenBuckets:
+    """Cubetas de fichas en memoria, con un número máximo de claves (LRU)."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Consume una ficha de la cubeta `key`.
+
+        Returns:
+            0 si había ficha, o los segundos hasta la siguiente.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisTokenBuckets:
+    """Cubetas de fichas compartidas en Redis, actualizadas de forma atómica con Lua."""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix="ratelimit:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+        # Si Redis no responde se sigue limitando en memoria
+        self._fallback = LocalTokenBuckets()
+
+    def take(self, key, rate, burst):
+        try:
+            return float(self._script(keys=[self.prefix + key], args=[rate, burst, time.time()]))
+        except Exception as e:
+            logger.warning("Redis no disponible para la limitación de peticiones: %s", e)
+            return self._fallback.take(key, rate, burst)
+
+
+class PriorityLimiter:
+    """Límite de peticiones simultáneas con una cola de espera ordenada por prioridad."""
+
+    def __init__(self, max_concurrency=RASA_MAX_CONCURRENCY, queue_size=ADMISSION_QUEUE_SIZE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiting = []  # heap de (prioridad, orden, waiter)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        # Duración media de una petición admitida, para estimar Retry-After
+        self._avg_service = 0.5
+
+    def _retry_after(self):
+        return self._avg_service * (len(self._waiting) + 1) / max(1, self.max_concurrency)
+
+    def acquire(self, priority):
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if len(self._waiting) >= self.queue_size:
+                # Cola llena: se descarta la espera de menor prioridad (o esta misma)
+                worst = max(self._waiting)
+                if worst[0] <= priority:
+                    self.shed += 1
+                    raise AdmissionRejected("overloaded", self._retry_after())
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                worst[2]["rejected"] = True
+                worst[2]["event"].set()
+            waiter = {"event": threading.Event(), "granted": False, "rejected": False}
+            entry = (priority, next(self._counter), waiter)
+            heapq.heappush(self._waiting, entry)
+
+        waiter["event"].wait(self.queue_timeout)
+        with self._lock:
+            if waiter["granted"]:
+                self.admitted += 1
+                return
+            if not waiter["rejected"]:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            self.shed += 1
+            raise AdmissionRejected("overloaded", self._retry_after())
+
+    def release(self, duration):
+        with self._lock:
+            self._avg_service = 0.9 * self._avg_service + 0.1 * duration
+            if self._waiting:
+                # El hueco pasa directamente a la siguiente petición en espera
+                _, _, waiter = heapq.heappop(self._waiting)
+                waiter["granted"] = True
+                waiter["event"].set()
+            else:
+                self.active -= 1
+
+    @contextmanager
+    def slot(self, priority):
+        self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": len(self._waiting),
+                "max_concurrency": self.max_concurrency,
+                "admitted": self.admitted,
+                "shed": self.shed,
+            }
+
+
+class RoleResolver:
+    """
+    Rol de un usuario autenticado: el del token o, si no lo trae, el de `users`.
+
+    Las consultas se cachean `ttl` segundos en una LRU de como mucho `max_size`
+    usuarios. Si la base de datos falla, durante `failure_ttl` segundos no se
+    vuelve a consultar para nadie y se usa `default_role`.
+    """
+
+    def __init__(self, ttl=ROLE_CACHE_TTL, max_size=ROLE_CACHE_SIZE, failure_ttl=ROLE_FAILURE_TTL,
+                 default_role=ROLE_DEFAULT):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.failure_ttl = failure_ttl
+        self.default_role = default_role
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+
+    def role(self, user):
+        """Rol del usuario (`{"id", "role"}` de auth.current_user), o None si es anónimo."""
+        if not user:
+            return None
+        if user.get("role"):
+            return user["role"]
+        user_id = str(user.get("id") or "")
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and cached[1] > now:
+                self._cache.move_to_end(user_id)
+                return cached[0]
+            if self._unavailable_until > now:
+                return self.default_role
+
+        ttl = self.ttl
+        try:
+            role = self._lookup(user_id) or self.default_role
+        except Exception as e:
+            logger.warning("No se pudo consultar el rol de %s: %s", user_id, e)
+            role, ttl = self.default_role, self.failure_ttl
+            with self._lock:
+                self._unavailable_until = now + self.failure_ttl
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._cache[user_id] = (role, now + ttl)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return role
+
+    def _lookup(self, user_id):
+        column = "email" if "@" in user_id else "id" if user_id.isdigit() else None
+        if column is None:
+            return None
+        connection = get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT role FROM users WHERE {column} = %s", (user_id,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        finally:
+            connection.close()
+
+    def priority(self, user):
+        if not user:
+            return ANONYMOUS_PRIORITY
+        return ROLE_PRIORITY.get(self.role(user), ROLE_PRIORITY.get(self.default_role, ANONYMOUS_PRIORITY))
+
+
+class AdmissionController:
+    """Reúne la limitación por usuario e IP y el límite de concurrencia hacia Rasa."""
+
+    def __init__(self, redis_url=RATE_LIMIT_REDIS_URL, limiter=None, roles=None):
+        self.buckets = RedisTokenBuckets(redis_url) if redis_url else LocalTokenBuckets()
+        self.limiter = limiter or PriorityLimiter()
+        self.roles = roles or RoleResolver()
+        self.rate_limited = 0
+
+    def check_rate(self, user, ip):
+        """
+        Consume una ficha del usuario autenticado y de la IP; lanza
+        AdmissionRejected si falta alguna. Para los anónimos solo cuenta la IP.
+        """
+        wait = 0.0
+        if user:
+            wait = self.buckets.take(f"user:{user['id']}", RATE_LIMIT_USER_RATE, RATE_LIMIT_USER_BURST)
+        if not wait and ip:
+            wait = self.buckets.take(f"ip:{ip}", RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST)
+        if wait:
+            self.rate_limited += 1
+            raise AdmissionRejected("rate_limited", wait)
+
+    def rasa_slot(self, user):
+        """Contexto que reserva un hueco hacia Rasa según la prioridad del usuario autenticado."""
+        return self.limiter.slot(self.roles.priority(user))
+
+    def stats(self):
+        return {"rate_limited": self.rate_limited, **self.limiter.stats()}
@@ -1,28 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 import os
 import requests
 from werkzeug.utils import secure_filename
+import functools
 import json
 import logging
+import time
 from datetime import datetime
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+from admission import AdmissionController, AdmissionRejected
+from auth import (JWT_EXPIRATION, AuthError, authenticate, bearer_token, current_user, issue_token,
+                  require_auth, require_role, unauthorized)
+from fast_path import FAST_PATH_ENABLED, FastPathRouter
+from health import HealthProber, http_check, mysql_check
+from idempotency import IdempotencyStore, idempotent
+from logging_config import setup_logging, bind_request_id
+from model_rollout import MODEL_STANDBY_URLS, ModelRollout, RolloutError
+from nlu_batcher import NLU_BATCH_CHAT, MicroBatcher, RasaBatchParser
+from rasa_router import RASA_URLS, RasaRouter
+from streaming import (STREAM_TOKEN_TTL, SessionStreams, new_stream_session, stream_rasa,
+                       verify_stream_token, webhook_payload)
+from tracing import start_span, trace_metadata
+from training import TrainingJobManager
+
+# Configurar logging (cola + escritura en segundo plano)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuración
-RASA_URL = os.environ.get("RASA_URL", "http://rasa:5005")
+# Réplica principal: análisis NLU y entrenamientos (el chat se reparte entre RASA_URLS)
+RASA_URL = os.environ.get("RASA_URL") or RASA_URLS[0]
+RASA_ACTIONS_URL = os.environ.get("RASA_ACTIONS_URL", "http://rasa-actions:5055")
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "/app/data/documents")
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
 
@@ -32,59 +44,329 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 # Asegurar que el directorio de subida existe
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Réplicas de Rasa (RASA_URLS); cada usuario se queda en la misma mientras esté sana
+rasa_router = RasaRouter()
+
+# Sondeo de salud en segundo plano
+prober = HealthProber()
+for index, replica_url in enumerate(rasa_router.urls + MODEL_STANDBY_URLS):
+    prober.add_check(f"rasa_{index}", rasa_router.replica_check(replica_url, http_check(f"{replica_url}/status")),
+                     required=False)
+prober.add_check("rasa", rasa_router.check_any)
+prober.add_check("actions", http_check(f"{RASA_ACTIONS_URL}/health"), required=False)
+prober.add_check("mysql", mysql_check)
+prober.start()
+
+# Ruta rápida opcional para intenciones triviales (saludos, despedidas, agradecimientos)
+fast_path = FastPathRouter() if FAST_PATH_ENABLED else None
+
+# Análisis NLU agrupado en micro-lotes
+nlu_parser = RasaBatchParser(RASA_URL)
+nlu_batcher = MicroBatcher(nlu_parser)
+
+# Gestor de entrenamientos en segundo plano
+training_manager = TrainingJobManager(RASA_URL)
+
+def follow_model_switch(urls, model_file):
+    """Tras un cambio de modelo, el análisis NLU pasa a las réplicas y al modelo nuevos."""
+    nlu_parser.rasa_url = urls[0]
+    nlu_parser.load_model(model_file)
+
+# Despliegue sin cortes del modelo marcado como activo en trained_models. Con
+# una configuración inválida la pasarela arranca igual, sin despliegues.
+try:
+    model_rollout = ModelRollout(rasa_router, on_switch=follow_model_switch)
+    model_rollout.start()
+    model_rollout_error = None
+except RolloutError as e:
+    logger.error("Despliegue de modelos desactivado: %s", e)
+    model_rollout = None
+    model_rollout_error = str(e)
+
+# Limitación por usuario e IP y concurrencia máxima hacia Rasa
+admission = AdmissionController()
+
+# Conexiones SSE abiertas por sesión de chat
+chat_streams = SessionStreams()
+
+# Respuestas guardadas para los reintentos con la misma clave de idempotencia
+idempotency_store = IdempotencyStore()
+
+@app.before_request
+def assign_request_id():
+    """Asigna un identificador a cada petición para correlacionar los logs"""
+    g.request_id = bind_request_id(request.headers.get("X-Request-ID"))
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def log_request(response):
+    """Registra la petición completada y expone su identificador"""
+    response.headers["X-Request-ID"] = g.request_id
+    logger.info(
+        "%s %s -> %s", request.method, request.path, response.status_code,
+        extra={"fields": {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - g.request_start) * 1000, 2)
+        }}
+    )
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def rollout_status():
+    """Estado del despliegue de modelos, o el motivo por el que está desactivado"""
+    if model_rollout is None:
+        return {"state": "disabled", "error": model_rollout_error}
+    return model_rollout.status()
+
+def rollout_disabled():
+    """Respuesta 503 para las operaciones de modelos con el despliegue desactivado"""
+    return jsonify({"error": "Model rollout is disabled", "reason": model_rollout_error}), 503
+
+def too_many_requests(rejection):
+    """Respuesta 429 con el tiempo de espera sugerido"""
+    response = jsonify({"error": "Too many requests", "reason": rejection.reason})
+    response.status_code = 429
+    response.headers["Retry-After"] = rejection.retry_after_header
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Endpoint para verificar el estado del servicio"""
+    """Endpoint para verificar el estado del servicio (servido desde la caché del sondeo)"""
+    components = prober.snapshot()
+    ready = prober.is_ready(components)
+    
+    return jsonify({
+        "status": "ok" if ready else "error",
+        "timestamp": datetime.now().isoformat(),
+        "rasa_status": components.get("rasa", {}).get("detail"),
+        "components": components,
+        "admission": admission.stats(),
+        "rasa_routing": rasa_router.stats(),
+        "model_rollout": rollout_status(),
+        "idempotency": idempotency_store.stats()
+    }), 200 if ready else 503
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Endpoint de liveness: el proceso responde y el sondeo sigue activo"""
+    alive = prober.is_alive()
+    return jsonify({"status": "ok" if alive else "error"}), 200 if alive else 503
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Endpoint de readiness: Rasa y MySQL respondieron en el último sondeo"""
+    ready = prober.is_ready()
+    return jsonify({"status": "ok" if ready else "error"}), 200 if ready else 503
+
+@app.route('/api/auth/login', methods=['POST'])
+def login():
+    """Endpoint para obtener un token de la pasarela con el correo y la contraseña"""
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    password = data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
+        return jsonify({"error": "Email and password are required"}), 400
     try:
-        # Verificar conexión con Rasa
-        rasa_status = requests.get(f"{RASA_URL}/status").json()
-        
-        return jsonify({
-            "status": "ok",
-            "timestamp": datetime.now().isoformat(),
-            "rasa_status": rasa_status
-        })
+        user = authenticate(email, password)
     except Exception as e:
-        logger.error(f"Error en health check: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": str(e),
-            "timestamp": datetime.now().isoformat()
-        }), 500
+        logger.error("Error en login: %s", e)
+        return jsonify({"error": "Authentication unavailable"}), 503
+    if user is None:
+        return unauthorized()
+    
+    try:
+        token = issue_token(user["id"], role=user["role"])
+    except AuthError as e:
+        logger.error("Error en login: %s", e)
+        return jsonify({"error": "Authentication unavailable"}), 503
+    return jsonify({
+        "token": token,
+        "token_type": "Bearer",
+        "expires_in": JWT_EXPIRATION,
+        "user": user
+    })
+
+def batched_parse(message):
+    """
+    Análisis NLU del mensaje en el micro-lote compartido, para que Rasa no lo
+    repita. None si no hay servidor de lotes con el modelo que sirve Rasa o si
+    falla: entonces Rasa analiza el mensaje.
+    """
+    if not NLU_BATCH_CHAT or not nlu_parser.in_sync() or message.startswith("/"):
+        return None
+    try:
+        with start_span("nlu.parse_batched"):
+            parse_data = nlu_batcher.process(message)
+    except Exception as e:
+        logger.warning("Análisis NLU por lotes no disponible: %s", e)
+        return None
+    return parse_data if nlu_parser.in_sync() else None
+
+def chat_user_scope():
+    """Usuario de la petición de chat, para que las claves de idempotencia no se compartan"""
+    return str((request.get_json(silent=True) or {}).get('user_id', 'default'))
 
 @app.route('/api/chat', methods=['POST'])
+@idempotent(idempotency_store, scope=chat_user_scope)
 def chat():
     """Endpoint para enviar mensajes al asistente Rasa"""
-    try:
-        data = request.json
-        message = data.get('message', '')
-        user_id = data.get('user_id', 'default')
-        
-        if not message:
-            return jsonify({"error": "No message provided"}), 400
-        
-        # Enviar mensaje a Rasa
-        rasa_response = requests.post(
-            f"{RASA_URL}/webhooks/rest/webhook",
-            json={"sender": user_id, "message": message}
-        )
+    with start_span("gateway.chat", trace_id=request.headers.get("X-Trace-Id")) as span:
+        try:
+            data = request.json
+            message = data.get('message', '')
+            user_id = data.get('user_id', 'default')
+            span.set_attribute("user_id", user_id)
+            
+            if not message:
+                return jsonify({"error": "No message provided"}), 400
+            
+            admission.check_rate(current_user(), request.remote_addr)
+            
+            # Responder localmente los mensajes triviales sin pasar por Rasa
+            if fast_path is not None:
+                local_responses = fast_path.respond(user_id, message, span.trace_id)
+                if local_responses is not None:
+                    span.set_attribute("fast_path", True)
+                    response = jsonify(local_responses)
+                    response.headers["X-Trace-Id"] = span.trace_id
+                    return response
+            
+            # Enviar mensaje a Rasa propagando el contexto de traza como metadata
+            parse_data = batched_parse(message)
+            with admission.rasa_slot(current_user()), rasa_router.request(user_id) as rasa_url, \
+                    start_span("rasa.webhook", replica=rasa_url, batched_nlu=parse_data is not None) as rasa_span:
+                rasa_response = requests.post(
+                    f"{rasa_url}/webhooks/rest/webhook",
+                    json=webhook_payload(user_id, message, trace_metadata(), parse_data)
+                )
+                rasa_span.set_attribute("status_code", rasa_response.status_code)
+            
+            if not rasa_response.ok:
+                span.status = "error"
+                return jsonify({"error": f"Rasa error: {rasa_response.status_code}"}), 500
+            
+            responses = rasa_response.json()
+            
+            # Si no hay respuestas, proporcionar una respuesta por defecto
+            if not responses:
+                responses = [{"text": "Lo siento, no pude procesar tu mensaje. ¿Podrías intentarlo de nuevo?"}]
+            
+            response = jsonify(responses)
+            response.headers["X-Trace-Id"] = span.trace_id
+            return response
         
-        if not rasa_response.ok:
-            return jsonify({"error": f"Rasa error: {rasa_response.status_code}"}), 500
+        except AdmissionRejected as e:
+            span.set_attribute("rejected", e.reason)
+            return too_many_requests(e)
+        except Exception as e:
+            span.set_error(e)
+            logger.error("Error en chat: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+def require_stream_token(view):
+    """Exige el token de la sesión de streaming (`?token=` o Authorization) y guarda su dueño en g"""
+    @functools.wraps(view)
+    def wrapper(session_id):
+        try:
+            g.stream_owner = verify_stream_token(request.args.get("token") or bearer_token(), session_id)
+        except AuthError as e:
+            logger.info("Token de streaming rechazado para %s: %s", session_id, e)
+            return unauthorized()
+        return view(session_id)
+    return wrapper
+
+@app.route('/api/chat/stream', methods=['POST'])
+@require_auth
+def chat_stream_create():
+    """Crea una sesión de chat en streaming del usuario autenticado"""
+    session_id, token = new_stream_session(current_user()["id"])
+    return jsonify({"session_id": session_id, "token": token, "expires_in": STREAM_TOKEN_TTL}), 201
+
+@app.route('/api/chat/stream/<session_id>', methods=['GET'])
+@require_stream_token
+def chat_stream(session_id):
+    """Conexión SSE persistente que recibe los mensajes del bot de la sesión"""
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    response = Response(chat_streams.events(session_id, last_event_id), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Evita que nginx acumule el stream antes de enviarlo
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route('/api/chat/stream/<session_id>', methods=['POST'])
+@require_stream_token
+@idempotent(idempotency_store, scope=lambda: request.view_args['session_id'])
+def chat_stream_send(session_id):
+    """Envía un mensaje; cada respuesta del bot se publica en el stream de la sesión en cuanto llega"""
+    with start_span("gateway.chat_stream", trace_id=request.headers.get("X-Trace-Id")) as span:
+        try:
+            data = request.json or {}
+            message = data.get('message', '')
+            span.set_attribute("user_id", session_id)
+            
+            if not message:
+                return jsonify({"error": "No message provided"}), 400
+            
+            owner = {"id": g.stream_owner, "role": None}
+            admission.check_rate(owner, request.remote_addr)
+            
+            delivered = 0
+            local_responses = fast_path.respond(session_id, message, span.trace_id) if fast_path is not None else None
+            if local_responses is not None:
+                span.set_attribute("fast_path", True)
+                for item in local_responses:
+                    chat_streams.publish(session_id, "message", item)
+                    delivered += 1
+            else:
+                parse_data = batched_parse(message)
+                with admission.rasa_slot(owner), rasa_router.request(session_id) as rasa_url, \
+                        start_span("rasa.webhook", replica=rasa_url, stream=True, batched_nlu=parse_data is not None):
+                    for item in stream_rasa(rasa_url, session_id, message, trace_metadata(), parse_data):
+                        chat_streams.publish(session_id, "message", item)
+                        delivered += 1
+                if not delivered:
+                    chat_streams.publish(session_id, "message", {
+                        "text": "Lo siento, no pude procesar tu mensaje. ¿Podrías intentarlo de nuevo?"
+                    })
+                    delivered = 1
+            
+            chat_streams.publish(session_id, "done", {"trace_id": span.trace_id, "messages": delivered})
+            response = jsonify({
+                "status": "ok",
+                "messages": delivered,
+                "subscribers": chat_streams.subscriber_count(session_id)
+            })
+            response.headers["X-Trace-Id"] = span.trace_id
+            return response
         
-        responses = rasa_response.json()
+        except AdmissionRejected as e:
+            span.set_attribute("rejected", e.reason)
+            return too_many_requests(e)
+        except Exception as e:
+            span.set_error(e)
+            logger.error("Error en chat_stream_send: %s", e)
+            chat_streams.publish(session_id, "error", {"error": str(e), "trace_id": span.trace_id})
+            return jsonify({"error": str(e)}), 500
+
+@app.route('/api/nlu/parse', methods=['POST'])
+def parse_message():
+    """Endpoint para analizar un mensaje con el NLU de Rasa (agrupado en micro-lotes)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        text = data.get('text', '')
         
-        # Si no hay respuestas, proporcionar una respuesta por defecto
-        if not responses:
-            return jsonify([{"text": "Lo siento, no pude procesar tu mensaje. ¿Podrías intentarlo de nuevo?"}])
+        if not text:
+            return jsonify({"error": "No text provided"}), 400
         
-        return jsonify(responses)
+        with start_span("nlu.parse_batched"):
+            return jsonify(nlu_batcher.process(text))
     
     except Exception as e:
-        logger.error(f"Error en chat: {str(e)}")
+        logger.error("Error en parse_message: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/upload', methods=['POST'])
@@ -126,7 +408,7 @@ def upload_file():
         })
     
     except Exception as e:
-        logger.error(f"Error en upload_file: {str(e)}")
+        logger.error("Error en upload_file: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/documents', methods=['GET'])
@@ -158,26 +440,86 @@ def list_documents():
         return jsonify(documents)
     
     except Exception as e:
-        logger.error(f"Error en list_documents: {str(e)}")
+        logger.error("Error en list_documents: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/train', methods=['POST'])
+@require_role("admin")
 def train_model():
-    """Endpoint para entrenar el modelo de Rasa"""
+    """Endpoint para encolar un entrenamiento del modelo de Rasa"""
     try:
-        # Iniciar entrenamiento
-        rasa_response = requests.post(f"{RASA_URL}/model/train")
+        # trained_models.trained_by referencia users.id: se usa el usuario autenticado
+        user_id = current_user()["id"]
+        if not str(user_id).isdigit():
+            return jsonify({"error": "Invalid user"}), 403
+        requested_by = int(user_id)
         
-        if not rasa_response.ok:
-            return jsonify({"error": f"Rasa training error: {rasa_response.status_code}"}), 500
+        job, coalesced = training_manager.submit(requested_by)
         
         return jsonify({
-            "message": "Training started successfully",
-            "status": rasa_response.json()
-        })
+            "message": "Training queued successfully",
+            "coalesced": coalesced,
+            "status": job.to_dict()
+        }), 202
+    
+    except Exception as e:
+        logger.error("Error en train_model: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/train', methods=['GET'])
+def list_training_jobs():
+    """Endpoint para listar los trabajos de entrenamiento recientes"""
+    return jsonify([job.to_dict() for job in training_manager.list_jobs()])
+
+@app.route('/api/train/<job_id>', methods=['GET'])
+def training_status(job_id):
+    """Endpoint para consultar el estado y progreso de un entrenamiento"""
+    job = training_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Training job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/train/<job_id>/activate', methods=['POST'])
+@require_role("admin")
+def activate_trained_model(job_id):
+    """Endpoint para activar el modelo producido por un entrenamiento (se despliega sin cortes)"""
+    if model_rollout is None:
+        return rollout_disabled()
+    try:
+        job = training_manager.activate(job_id)
+        model_rollout.wake()
+        return jsonify({
+            "message": "Model activation scheduled",
+            "status": job.to_dict(),
+            "rollout": model_rollout.status()
+        }), 202
+    
+    except KeyError:
+        return jsonify({"error": "Training job not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.error("Error en activate_trained_model: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/models/rollout', methods=['GET'])
+def model_rollout_status():
+    """Endpoint para consultar el modelo servido y el último despliegue"""
+    return jsonify(rollout_status())
+
+@app.route('/api/models/rollback', methods=['POST'])
+@require_role("admin")
+def rollback_model():
+    """Endpoint para volver al modelo anterior"""
+    if model_rollout is None:
+        return rollout_disabled()
+    try:
+        return jsonify({"message": "Model rolled back", "rollout": model_rollout.rollback()})
     
+    except RolloutError as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
-        logger.error(f"Error en train_model: {str(e)}")
+        logger.error("Error en rollback_model: %s", e)
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,191 @@
+"""
+Autenticación de la pasarela con tokens JWT.
+
+Las peticiones autenticadas llevan `Authorization: Bearer <token>` con un JWT
+firmado con JWT_SECRET. El token identifica al usuario en `sub` y puede
+incluir su rol (`admin`, `teacher`, `student`) en `role`. La identidad y el
+rol se toman siempre del token verificado, nunca del cuerpo de la petición.
+
+Sin JWT_SECRET no se acepta ningún token: todas las peticiones son anónimas
+y los endpoints con `require_auth` responden 401.
+
+Los tokens los emite `POST /api/auth/login` a partir del correo y la
+contraseña de la tabla `users` (`authenticate`). Los endpoints que cambian el
+modelo exigen además el rol `admin` con `require_role`.
+
+Los tokens con `scope` (como los de las sesiones de chat en streaming, que
+viajan en la URL) solo dan acceso a su recurso y no identifican al usuario
+en el resto de endpoints.
+"""
+
+import functools
+import logging
+import os
+import time
+
+import jwt
+from flask import g, jsonify, request
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la autenticación
+JWT_SECRET = os.environ.get("JWT_SECRET", "")
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+JWT_EXPIRATION = int(os.environ.get("JWT_EXPIRATION", "86400"))
+
+
+class AuthError(Exception):
+    """Token ausente, inválido o caducado."""
+
+
+def check_password(password, password_hash):
+    """Comprueba una contraseña contra un hash bcrypt (`$2y$` de PHP incluido)."""
+    import bcrypt
+
+    if not password_hash:
+        return False
+    if password_hash.startswith("$2y$"):
+        password_hash = "$2b$" + password_hash[4:]
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+def authenticate(email, password):
+    """
+    Busca el usuario por correo y comprueba su contraseña.
+
+    Returns:
+        Un diccionario con `id`, `name` y `role`, o None si las credenciales
+        no son válidas.
+    """
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, name, password, role FROM users WHERE email = %s LIMIT 1",
+                (email,),
+            )
+            row = cursor.fetchone()
+    finally:
+        connection.close()
+    if row is None or not check_password(password, row[2]):
+        return None
+    return {"id": row[0], "name": row[1], "role": row[3]}
+
+
+def issue_token(subject, expires_in=JWT_EXPIRATION, secret=None, **claims):
+    """
+    Firma un JWT para `subject` con los claims adicionales indicados.
+
+    Raises:
+        AuthError: si no hay secreto configurado.
+    """
+    key = secret or JWT_SECRET
+    if not key:
+        raise AuthError("JWT_SECRET no está configurado")
+    now = int(time.time())
+    payload = dict(claims, sub=str(subject), iat=now, exp=now + int(expires_in))
+    return jwt.encode(payload, key, algorithm=JWT_ALGORITHM)
+
+
+def decode_token(token, secret=None, **options):
+    """
+    Verifica la firma y la caducidad de un JWT.
+
+    Returns:
+        Los claims del token.
+
+    Raises:
+        AuthError: si no hay secreto configurado o el token no es válido.
+    """
+    key = secret or JWT_SECRET
+    if not key:
+        raise AuthError("JWT_SECRET no está configurado")
+    try:
+        return jwt.decode(token, key, algorithms=[JWT_ALGORITHM],
+                          options={"require": ["sub", "exp"]}, **options)
+    except jwt.PyJWTError as e:
+        raise AuthError(str(e)) from e
+
+
+def bearer_token():
+    """Token de la cabecera Authorization, o None."""
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def current_user():
+    """
+    Usuario autenticado de la petición actual.
+
+    Returns:
+        Un diccionario con `id` y `role` (None si el token no lo incluye), o
+        None si la petición no trae un token válido.
+    """
+    if "auth_user" not in g:
+        g.auth_user = None
+        token = bearer_token()
+        if token:
+            try:
+                claims = decode_token(token)
+                if claims.get("scope"):
+                    raise AuthError(f"token restringido a {claims['scope']}")
+                g.auth_user = {"id": claims["sub"], "role": claims.get("role")}
+            except AuthError as e:
+                logger.info("Token rechazado: %s", e)
+    return g.auth_user
+
+
+def unauthorized():
+    """Respuesta 401 para peticiones sin credenciales válidas."""
+    response = jsonify({"error": "Authentication required"})
+    response.status_code = 401
+    response.headers["WWW-Authenticate"] = "Bearer"
+    return response
+
+
+def require_auth(view):
+    """Decorador para endpoints que requieren un usuario autenticado (401 si no lo hay)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user() is None:
+            return unauthorized()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def forbidden():
+    """Respuesta 403 para usuarios autenticados sin el rol necesario."""
+    return jsonify({"error": "Insufficient permissions"}), 403
+
+
+def require_role(*roles):
+    """
+    Decorador para endpoints restringidos a ciertos roles.
+
+    Responde 401 si no hay usuario autenticado y 403 si su rol no está entre
+    `roles`.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                return unauthorized()
+            if user["role"] not in roles:
+                return forbidden()
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,42 @@
+"""
+Acceso a la base de datos MySQL desde la pasarela.
+"""
+
+import os
+
+import pymysql
+
+# Configuración de la base de datos
+DB_HOST = os.environ.get("DB_HOST", "db")
+DB_PORT = int(os.environ.get("DB_PORT", "3306"))
+DB_DATABASE = os.environ.get("DB_DATABASE", "eduassistai")
+DB_USERNAME = os.environ.get("DB_USERNAME", "eduassistai")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "password")
+DB_CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", "5"))
+
+
+def get_connection(**kwargs):
+    """Abre una conexión nueva a la base de datos de la aplicación."""
+    options = {
+        "host": DB_HOST,
+        "port": DB_PORT,
+        "database": DB_DATABASE,
+        "user": DB_USERNAME,
+        "password": DB_PASSWORD,
+        "connect_timeout": DB_CONNECT_TIMEOUT,
+        "read_timeout": DB_CONNECT_TIMEOUT,
+        "charset": "utf8mb4",
+    }
+    options.update(kwargs)
+    return pymysql.connect(**options)
+
+
+def ping(**kwargs):
+    """Comprueba que la base de datos responde."""
+    connection = get_connection(**kwargs)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    finally:
+        connection.close()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Agrupación de preguntas sin respuesta en `difficult_questions`.
+
+Recorre en streaming los mensajes de usuario cuya intención es de fallback,
+a partir del último mensaje procesado, y agrupa las preguntas casi iguales
+con MinHash y LSH (bandas), sin comparar nunca todas las parejas:
+
+1. Cada pregunta se normaliza y se divide en 5-gramas de caracteres, que
+   toleran faltas de ortografía y variaciones de una palabra.
+2. Su firma MinHash estima la similitud de Jaccard entre preguntas.
+3. La firma se divide en bandas; dos preguntas son candidatas si coinciden en
+   alguna banda de la misma materia, y se unen si la similitud estimada
+   supera el umbral.
+
+Cada grupo se guarda como una fila de `difficult_questions` con su pregunta
+representativa (la primera que se vio), el número de fallbacks y la última
+vez que se preguntó. Las filas se actualizan sumando, y el último mensaje
+procesado se guarda en la misma transacción, así que el proceso se puede
+interrumpir y repetir sin contar dos veces.
+
+La materia se toma de `message_subjects` o, si el mensaje no está
+clasificado, buscando el nombre o el código de la materia en el texto.
+
+Requiere la migración scripts/migrations/003_difficult_questions_clusters.sql.
+
+Ejecutar este script con: python fallback_clusters.py
+Para ejecutarlo periódicamente: python fallback_clusters.py --interval 3600
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pymysql
+
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la agrupación de fallbacks
+FALLBACK_INTENTS = [i.strip() for i in os.environ.get("FALLBACK_INTENTS", "nlu_fallback,fallback").split(",")
+                    if i.strip()]
+FALLBACK_SIMILARITY = float(os.environ.get("FALLBACK_SIMILARITY", "0.5"))
+FALLBACK_CLUSTER_BATCH_SIZE = int(os.environ.get("FALLBACK_CLUSTER_BATCH_SIZE", "50000"))
+
+JOB_NAME = "fallback_clusters"
+NUM_PERM = 120
+BANDS = 40
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# Primo de Mersenne 2^61 - 1 para las permutaciones (a * x + b) mod p
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+NON_WORD = re.compile(r"[^\w\s]")
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text):
+    """Minúsculas, sin acentos, sin puntuación y con espacios colapsados."""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def minhash(normalized):
+    """Firma MinHash (NUM_PERM valores uint32) de los 5-gramas de caracteres del texto."""
+    padded = f" {normalized} "
+    if len(padded) <= SHINGLE_SIZE:
+        shingles = {padded}
+    else:
+        shingles = {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64,
+                         count=len(shingles))
+    # Los productos caben en 64 bits: a < 2^31 y el hash < 2^32
+    permuted = ((np.outer(hashes, _PERM_A) + _PERM_B) % MERSENNE_PRIME) & MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a, b):
+    """Similitud de Jaccard estimada a partir de dos firmas."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class Cluster:
+    __slots__ = ("key", "subject_id", "question", "signature", "count", "last_asked")
+
+    def __init__(self, key, subject_id, question, signature, count=0, last_asked=None):
+        self.key = key
+        self.subject_id = subject_id
+        self.question = question
+        self.signature = signature
+        self.count = count
+        self.last_asked = last_asked
+
+
+class FallbackClusterer:
+    """Índice LSH de grupos de preguntas, por materia."""
+
+    def __init__(self, threshold=FALLBACK_SIMILARITY):
+        self.threshold = threshold
+        self.clusters = {}
+        self.buckets = defaultdict(list)
+        self._changed = set()
+
+    def _bands(self, subject_id, signature):
+        data = signature.tobytes()
+        width = ROWS * 4
+        return [(subject_id, band, data[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+    def _index(self, cluster):
+        for bucket in self._bands(cluster.subject_id, cluster.signature):
+            self.buckets[bucket].append(cluster.key)
+
+    def load(self, cursor):
+        """Carga los grupos ya guardados para seguir ampliándolos."""
+        cursor.execute(
+            """
+            SELECT cluster_key, subject_id, question, minhash
+            FROM difficult_questions
+            WHERE cluster_key IS NOT NULL AND minhash IS NOT NULL
+            """
+        )
+        for key, subject_id, question, signature in cursor.fetchall():
+            cluster = Cluster(key, subject_id, question, np.frombuffer(signature, dtype=np.uint32))
+            self.clusters[key] = cluster
+            self._index(cluster)
+
+    def add(self, subject_id, question, asked_at):
+        """Asigna una pregunta a su grupo, creando uno nuevo si no se parece a ninguno."""
+        normalized = normalize(question)
+        if not normalized:
+            return None
+        signature = minhash(normalized)
+        bands = self._bands(subject_id, signature)
+
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for bucket in bands:
+            for key in self.buckets.get(bucket, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(signature, self.clusters[key].signature)
+                if score >= best_similarity:
+                    best, best_similarity = self.clusters[key], score
+
+        if best is None:
+            key = hashlib.sha1(f"{subject_id}:{normalized}".encode("utf-8")).hexdigest()[:16]
+            best = Cluster(key, subject_id, question[:1000], signature)
+            self.clusters[key] = best
+            self._index(best)
+
+        best.count += 1
+        self._changed.add(best.key)
+        if asked_at is not None and (best.last_asked is None or asked_at > best.last_asked):
+            best.last_asked = asked_at
+        return best
+
+    def take_changes(self):
+        """Grupos con preguntas nuevas desde el último guardado; reinicia sus contadores."""
+        changed = [self.clusters[key] for key in self._changed]
+        self._changed = set()
+        now = datetime.now()
+        rows = [(c.subject_id, c.question, c.count, c.last_asked or now, c.key, c.signature.tobytes())
+                for c in changed]
+        for cluster in changed:
+            cluster.count = 0
+            cluster.last_asked = None
+        return rows
+
+
+class SubjectMatcher:
+    """Materia de un mensaje por su nombre o código cuando no está clasificado."""
+
+    def __init__(self, subjects):
+        self.patterns = []
+        for subject_id, name, code in subjects:
+            terms = [normalize(name)] + ([normalize(code)] if code else [])
+            terms = [t for t in terms if t]
+            if terms:
+                pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\b")
+                self.patterns.append((subject_id, pattern))
+
+    def match(self, text):
+        normalized = normalize(text)
+        for subject_id, pattern in self.patterns:
+            if pattern.search(normalized):
+                return subject_id
+        return None
+
+
+def message_time_column(cursor):
+    """Columna de fecha de `messages`, que difiere entre los esquemas del proyecto."""
+    cursor.execute("SHOW COLUMNS FROM messages LIKE 'timestamp'")
+    return "timestamp" if cursor.fetchone() else "created_at"
+
+
+def get_checkpoint(cursor):
+    cursor.execute("SELECT last_message_id FROM batch_job_state WHERE job = %s", (JOB_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def save_changes(cursor, clusterer, last_message_id):
+    """Suma los grupos modificados a `difficult_questions` y guarda el punto de control."""
+    rows = clusterer.take_changes()
+    if rows:
+        cursor.executemany(
+            """
+            INSERT INTO difficult_questions
+                (subject_id, question, fallback_count, last_asked, cluster_key, minhash)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                fallback_count = fallback_count + VALUES(fallback_count),
+                last_asked = GREATEST(last_asked, VALUES(last_asked))
+            """,
+            rows,
+        )
+    cursor.execute(
+        """
+        INSERT INTO batch_job_state (job, last_message_id) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_message_id = VALUES(last_message_id)
+        """,
+        (JOB_NAME, last_message_id),
+    )
+    return len(rows)
+
+
+def cluster_fallbacks(threshold=FALLBACK_SIMILARITY, batch_size=FALLBACK_CLUSTER_BATCH_SIZE):
+    """
+    Procesa los mensajes de fallback nuevos.
+
+    Returns:
+        Diccionario con mensajes leídos, sin materia, grupos actualizados y grupos totales.
+    """
+    connection = get_connection(autocommit=False)
+    # Conexión aparte sin búfer para leer los mensajes sin cargarlos todos en memoria
+    stream = get_connection(cursorclass=pymysql.cursors.SSCursor, read_timeout=None)
+    stats = {"messages": 0, "unassigned": 0, "updated": 0, "clusters": 0}
+    try:
+        with connection.cursor() as cursor:
+            clusterer = FallbackClusterer(threshold)
+            clusterer.load(cursor)
+            checkpoint = get_checkpoint(cursor)
+            cursor.execute("SELECT id, name, code FROM subjects")
+            matcher = SubjectMatcher(cursor.fetchall())
+            time_column = message_time_column(cursor)
+
+        placeholders = ", ".join(["%s"] * len(FALLBACK_INTENTS))
+        with stream.cursor() as reader:
+            # message_subjects puede tener varias materias por mensaje: se usa la de mayor confianza
+            reader.execute(
+                f"""
+                SELECT m.id, m.message, m.{time_column},
+                       (SELECT ms.subject_id FROM message_subjects ms
+                        WHERE ms.message_id = m.id ORDER BY ms.confidence DESC LIMIT 1)
+                FROM messages m
+                WHERE m.id > %s AND m.sender = 'user' AND m.intent IN ({placeholders})
+                ORDER BY m.id
+                """,
+                [checkpoint] + FALLBACK_INTENTS,
+            )
+            pending = 0
+            last_id = checkpoint
+            while True:
+                rows = reader.fetchmany(5000)
+                if not rows:
+                    break
+                for message_id, text, asked_at, subject_id in rows:
+                    last_id = message_id
+                    stats["messages"] += 1
+                    subject_id = subject_id or matcher.match(text or "")
+                    if subject_id is None:
+                        stats["unassigned"] += 1
+                        continue
+                    clusterer.add(subject_id, text, asked_at)
+                    pending += 1
+                if pending >= batch_size:
+                    with connection.cursor() as cursor:
+                        stats["updated"] += save_changes(cursor, clusterer, last_id)
+                    connection.commit()
+                    pending = 0
+
+        with connection.cursor() as cursor:
+            stats["updated"] += save_changes(cursor, clusterer, last_id)
+        connection.commit()
+        stats["clusters"] = len(clusterer.clusters)
+    finally:
+        stream.close()
+        connection.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrupación de preguntas sin respuesta")
+    parser.add_argument("--similarity", type=float, default=FALLBACK_SIMILARITY,
+                        help="Similitud de Jaccard mínima para unir dos preguntas")
+    parser.add_argument("--batch-size", type=int, default=FALLBACK_CLUSTER_BATCH_SIZE,
+                        help="Mensajes procesados entre dos guardados")
+    parser.add_argument("--interval", type=int, default=0, help="Repetir cada N segundos (0 = una sola vez)")
+    args = parser.parse_args()
+
+    while True:
+        start = time.time()
+        stats = cluster_fallbacks(args.similarity, args.batch_size)
+        print(f"🧩 {stats['messages']} fallbacks procesados ({stats['unassigned']} sin materia), "
+              f"{stats['updated']} grupos actualizados de {stats['clusters']} en {time.time() - start:.1f} s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
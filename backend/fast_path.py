@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Ruta rápida previa al NLU para intenciones triviales de alta frecuencia.
+
+Responde localmente saludos, despedidas y agradecimientos sin pasar por
+Rasa cuando el mensaje coincide con un ejemplo normalizado de
+`data/nlu.yml` o cuando un pequeño clasificador lineal (Naive Bayes
+multinomial entrenado con todas las intenciones) lo asigna a una de esas
+intenciones con margen suficiente. Las probabilidades del clasificador son
+demasiado optimistas con mensajes mixtos ("hola, quiero saber mis notas"),
+así que solo se acepta su decisión si todas las palabras del mensaje
+aparecen en los ejemplos de la propia intención y no hay negaciones
+("no gracias"). Cada respuesta local se registra para auditar su
+consistencia con Rasa.
+
+Auditar las decisiones registradas con: python fast_path.py audit
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+import requests
+import yaml
+
+from tracing import JsonLinesWriter
+
+# Configuración
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "false").lower() == "true"
+FAST_PATH_INTENTS = os.environ.get("FAST_PATH_INTENTS", "saludo,despedida,agradecimiento").split(",")
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.9"))
+FAST_PATH_MARGIN = float(os.environ.get("FAST_PATH_MARGIN", "0.5"))
+FAST_PATH_MAX_TOKENS = int(os.environ.get("FAST_PATH_MAX_TOKENS", "5"))
+FAST_PATH_AUDIT_FILE = os.environ.get("FAST_PATH_AUDIT_FILE", "fast_path_audit.jsonl")
+RASA_PROJECT_DIR = os.environ.get(
+    "RASA_PROJECT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rasa")
+)
+
+# Anotaciones de entidades en los ejemplos: [texto](entidad) o [texto]{"entity": ...}
+ENTITY_ANNOTATION = re.compile(r"\[([^\]]+)\](\([^)]*\)|\{[^}]*\})")
+NON_WORD = re.compile(r"[^\w\s]")
+REPEATED_LETTERS = re.compile(r"(.)\1+")
+
+# Palabras que invierten el sentido del mensaje: nunca se responden localmente
+NEGATIONS = {"no", "ni", "nunca", "tampoco", "nada", "jamas", "sin"}
+
+
+def normalize(text):
+    """Minúsculas, sin acentos, sin puntuación y con espacios colapsados."""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def features(normalized):
+    """Unigramas de palabras más trigramas de caracteres con delimitadores."""
+    words = normalized.split()
+    feats = [f"w:{w}" for w in words]
+    for word in words:
+        padded = f"#{word}#"
+        feats.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return feats
+
+
+def load_nlu_examples(path):
+    """Devuelve una lista de (intención, texto) a partir de un archivo NLU de Rasa."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = yaml.safe_load(f) or {}
+    examples = []
+    for item in content.get("nlu", []):
+        intent = item.get("intent")
+        if not intent:
+            continue
+        for line in (item.get("examples") or "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                examples.append((intent, ENTITY_ANNOTATION.sub(r"\1", line[2:])))
+    return examples
+
+
+class NaiveBayesClassifier:
+    """Clasificador Naive Bayes multinomial con suavizado de Laplace."""
+
+    def __init__(self, examples, alpha=1.0):
+        self.alpha = alpha
+        self.counts = defaultdict(Counter)
+        intent_counts = Counter()
+        for intent, text in examples:
+            self.counts[intent].update(features(normalize(text)))
+            intent_counts[intent] += 1
+        total = sum(intent_counts.values())
+        self.vocabulary = set()
+        for counter in self.counts.values():
+            self.vocabulary.update(counter)
+        self.log_prior = {intent: math.log(n / total) for intent, n in intent_counts.items()}
+        self.totals = {intent: sum(counter.values()) for intent, counter in self.counts.items()}
+
+    def predict(self, normalized):
+        """Devuelve las intenciones ordenadas por probabilidad posterior."""
+        feats = [f for f in features(normalized) if f in self.vocabulary]
+        vocab_size = len(self.vocabulary)
+        scores = {}
+        for intent, counter in self.counts.items():
+            denominator = math.log(self.totals[intent] + self.alpha * vocab_size)
+            score = self.log_prior[intent]
+            for feat in feats:
+                score += math.log(counter.get(feat, 0) + self.alpha) - denominator
+            scores[intent] = score
+        best = max(scores.values())
+        exp_scores = {intent: math.exp(score - best) for intent, score in scores.items()}
+        norm = sum(exp_scores.values())
+        return sorted(((intent, value / norm) for intent, value in exp_scores.items()),
+                      key=lambda item: item[1], reverse=True)
+
+
+class FastPathRouter:
+    """Decide si un mensaje puede responderse localmente sin pasar por Rasa."""
+
+    def __init__(self, project_dir=RASA_PROJECT_DIR, intents=FAST_PATH_INTENTS,
+                 min_confidence=FAST_PATH_MIN_CONFIDENCE, margin=FAST_PATH_MARGIN,
+                 max_tokens=FAST_PATH_MAX_TOKENS, audit_file=FAST_PATH_AUDIT_FILE):
+        self.intents = set(intents)
+        self.min_confidence = min_confidence
+        self.margin = margin
+        self.max_tokens = max_tokens
+
+        examples = load_nlu_examples(os.path.join(project_dir, "data", "nlu.yml"))
+        self.classifier = NaiveBayesClassifier(examples)
+
+        # Tabla de frases exactas: solo se conservan las que pertenecen a una única intención
+        phrases = defaultdict(set)
+        for intent, text in examples:
+            phrases[normalize(text)].add(intent)
+        self.phrases = {phrase: next(iter(owners)) for phrase, owners in phrases.items() if len(owners) == 1}
+
+        # Palabras de los ejemplos de cada intención (también sin letras repetidas: "holaaa")
+        self.vocabulary = defaultdict(set)
+        for intent, text in examples:
+            for word in normalize(text).split():
+                self.vocabulary[intent].update((word, REPEATED_LETTERS.sub(r"\1", word)))
+
+        with open(os.path.join(project_dir, "domain.yml"), "r", encoding="utf-8") as f:
+            domain = yaml.safe_load(f) or {}
+        responses = domain.get("responses", {})
+        self.responses = {
+            intent: [r["text"] for r in responses.get(f"utter_{intent}", []) if "{" not in r.get("text", "{")]
+            for intent in self.intents
+        }
+        self.audit = JsonLinesWriter(audit_file)
+
+    def classify(self, message):
+        """
+        Clasifica el mensaje si es trivial.
+
+        Returns:
+            Una tupla (intención, confianza, origen) o None si debe ir a Rasa.
+        """
+        normalized = normalize(message)
+        if not normalized or len(normalized.split()) > self.max_tokens:
+            return None
+
+        intent = self.phrases.get(normalized)
+        if intent is not None:
+            return (intent, 1.0, "exact") if intent in self.intents else None
+
+        ranking = self.classifier.predict(normalized)
+        (intent, confidence), runner_up = ranking[0], ranking[1][1] if len(ranking) > 1 else 0.0
+        if intent in self.intents and confidence >= self.min_confidence and confidence - runner_up >= self.margin \
+                and self.covers(intent, normalized):
+            return intent, confidence, "model"
+        return None
+
+    def covers(self, intent, normalized):
+        """True si todas las palabras aparecen en los ejemplos de la intención y ninguna es una negación."""
+        vocabulary = self.vocabulary.get(intent, set())
+        for word in normalized.split():
+            if word in NEGATIONS:
+                return False
+            if word not in vocabulary and REPEATED_LETTERS.sub(r"\1", word) not in vocabulary:
+                return False
+        return True
+
+    def respond(self, sender, message, trace_id=None):
+        """Devuelve la respuesta local en formato del webhook REST de Rasa, o None."""
+        decision = self.classify(message)
+        if decision is None:
+            return None
+        intent, confidence, source = decision
+        if not self.responses.get(intent):
+            return None
+
+        self.audit.write({
+            "timestamp": time.time(),
+            "sender": sender,
+            "message": message,
+            "intent": intent,
+            "confidence": round(confidence, 4),
+            "source": source,
+            "trace_id": trace_id,
+        })
+        return [{"recipient_id": sender, "text": random.choice(self.responses[intent])}]
+
+
+# ---------------------------------------------------------------------------
+# CLI de auditoría de consistencia frente a Rasa
+# ---------------------------------------------------------------------------
+
+def audit(path, rasa_url, limit):
+    """Reenvía las decisiones registradas a `/model/parse` y compara intenciones."""
+    totals, agreements, disagreements = Counter(), Counter(), []
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if limit and i >= limit:
+                break
+            record = json.loads(line)
+            parsed = requests.post(f"{rasa_url}/model/parse", json={"text": record["message"]}, timeout=10).json()
+            rasa_intent = parsed.get("intent", {}).get("name")
+            totals[record["intent"]] += 1
+            if rasa_intent == record["intent"]:
+                agreements[record["intent"]] += 1
+            else:
+                disagreements.append((record["message"], record["intent"], rasa_intent))
+
+    for intent, total in sorted(totals.items()):
+        print(f"{intent:<20} {agreements[intent]}/{total} coincidencias ({agreements[intent] / total:.1%})")
+    for message, local, remote in disagreements[:20]:
+        print(f"⚠️ '{message}': ruta rápida={local}, Rasa={remote}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herramientas de la ruta rápida")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    audit_parser = subparsers.add_parser("audit", help="Comparar decisiones registradas con Rasa")
+    audit_parser.add_argument("--file", default=FAST_PATH_AUDIT_FILE)
+    audit_parser.add_argument("--rasa-url", default=os.environ.get("RASA_URL", "http://rasa:5005"))
+    audit_parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "audit":
+        audit(args.file, args.rasa_url, args.limit)
+
+
+if __name__ == "__main__":
+    main()
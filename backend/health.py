@@ -0,0 +1,122 @@
+"""
+Sondeo de salud en segundo plano para la pasarela.
+
+Un hilo comprueba periódicamente Rasa, el servidor de acciones y MySQL y
+guarda el último resultado de cada uno con su marca de tiempo, de modo que
+los endpoints de salud responden desde la caché sin llamar a nadie.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", "2"))
+HEALTH_STALE_AFTER = float(os.environ.get("HEALTH_STALE_AFTER", "30"))
+
+
+class HealthProber:
+    """Ejecuta comprobaciones periódicas y cachea sus resultados."""
+
+    def __init__(self, interval=HEALTH_PROBE_INTERVAL, stale_after=HEALTH_STALE_AFTER):
+        self.interval = interval
+        self.stale_after = stale_after
+        self._checks = {}
+        self._required = set()
+        # Se reemplaza el diccionario completo en cada ronda, así que leerlo
+        # desde los endpoints no necesita ningún bloqueo.
+        self._results = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add_check(self, name, check, required=True):
+        """
+        Registra una comprobación.
+
+        Args:
+            name: Nombre del componente
+            check: Función sin argumentos que devuelve un detalle o lanza una excepción
+            required: Si el componente es necesario para que el servicio esté listo
+        """
+        self._checks[name] = check
+        if required:
+            self._required.add(name)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def probe_once(self):
+        results = {}
+        for name, check in self._checks.items():
+            start = time.perf_counter()
+            try:
+                detail = check()
+                results[name] = {"status": "ok", "detail": detail}
+            except Exception as e:
+                logger.warning("Comprobación de salud fallida para %s: %s", name, e)
+                results[name] = {"status": "error", "error": str(e)}
+            results[name]["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            results[name]["checked_at"] = time.time()
+        self._results = results
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_once()
+            self._stop.wait(self.interval)
+
+    def snapshot(self):
+        """Devuelve los últimos resultados con su antigüedad."""
+        now = time.time()
+        components = {}
+        for name, result in self._results.items():
+            entry = dict(result)
+            entry["age_seconds"] = round(now - result["checked_at"], 3)
+            entry["checked_at"] = datetime.fromtimestamp(result["checked_at"]).isoformat()
+            entry["stale"] = entry["age_seconds"] > self.stale_after
+            components[name] = entry
+        return components
+
+    def is_ready(self, components=None):
+        """El servicio está listo si todos los componentes requeridos están bien y al día."""
+        components = components if components is not None else self.snapshot()
+        for name in self._required:
+            entry = components.get(name)
+            if entry is None or entry["status"] != "ok" or entry["stale"]:
+                return False
+        return True
+
+
+def http_check(url):
+    """Crea una comprobación HTTP con timeout que devuelve el JSON de la respuesta."""
+    def check():
+        response = requests.get(url, timeout=HEALTH_PROBE_TIMEOUT)
+        response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError:
+            return response.text[:200]
+    return check
+
+
+def mysql_check():
+    timeout = max(1, int(HEALTH_PROBE_TIMEOUT))
+    db.ping(connect_timeout=timeout, read_timeout=timeout)
+    return "ok"
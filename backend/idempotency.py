@@ -0,0 +1,171 @@
+"""
+Peticiones idempotentes para los endpoints de chat.
+
+Los clientes móviles reintentan /api/chat cuando la red tarda. Si el
+reintento lleva la misma clave (cabecera `Idempotency-Key` o campo
+`request_id` del cuerpo), la pasarela devuelve la respuesta guardada de la
+primera petición sin volver a llamar a Rasa, de modo que las acciones no se
+ejecutan dos veces. Si la primera petición sigue en curso, el reintento
+espera su resultado.
+
+Las respuestas se guardan en memoria durante IDEMPOTENCY_TTL segundos, con
+un máximo de IDEMPOTENCY_MAX_ENTRIES claves (se descartan las terminadas más
+antiguas).
+Solo se guardan las respuestas definitivas: los errores 5xx y los 429 se
+pueden reintentar.
+"""
+
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, make_response, request
+
+# Configuración de la idempotencia
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "300"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires_at")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    """Tabla de resultados por clave, acotada en tiempo y en tamaño."""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES,
+                 wait_timeout=IDEMPOTENCY_WAIT_TIMEOUT):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def _evict(self, now):
+        """Descarta las entradas caducadas y, si no cabe otra, las terminadas más antiguas."""
+        # Las entradas se añaden en orden, así que las caducadas están al principio. Las
+        # peticiones en curso no se descartan: sus reintentos esperan el resultado.
+        excess = len(self._entries) - self.max_entries + 1
+        stale = []
+        for key, entry in self._entries.items():
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at < now or len(stale) < excess:
+                stale.append(key)
+            else:
+                break
+        for key in stale:
+            del self._entries[key]
+
+    def begin(self, key, fingerprint):
+        """
+        Registra el inicio de una petición.
+
+        Si la tabla está llena de peticiones en curso, la nueva se procesa sin
+        guardarse, y sus reintentos se ejecutarán de nuevo.
+
+        Returns:
+            Tupla (entrada, es_nueva). Si no es nueva, la entrada es de una
+            petición anterior con la misma clave (terminada o en curso).
+        """
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires_at is None or entry.expires_at >= now):
+                return entry, False
+            self._entries.pop(key, None)
+            self._evict(now)
+            entry = _Entry(fingerprint)
+            if len(self._entries) < self.max_entries:
+                self._entries[key] = entry
+            return entry, True
+
+    def complete(self, key, entry, response):
+        """Guarda la respuesta de la petición y despierta a los reintentos en espera."""
+        with self._lock:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def abort(self, key, entry):
+        """Descarta la petición sin guardar nada; el siguiente reintento se procesa de nuevo."""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "replays": self.replays}
+
+
+def _replayable(status):
+    return status < 500 and status != 429
+
+
+def idempotent(store, scope=lambda: ""):
+    """
+    Decorador para vistas de Flask que responde a los reintentos con la respuesta guardada.
+
+    Args:
+        store: IdempotencyStore compartido.
+        scope: Función que devuelve el ámbito de la clave (por ejemplo, el usuario),
+            para que clientes distintos no compartan respuestas.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            body = request.get_json(silent=True) or {}
+            key = request.headers.get(IDEMPOTENCY_HEADER) or body.get("request_id")
+            if not key:
+                return view(*args, **kwargs)
+
+            key = f"{request.path}:{scope()}:{key}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            while True:
+                entry, is_new = store.begin(key, fingerprint)
+                if is_new:
+                    break
+                if entry.fingerprint != fingerprint:
+                    return jsonify({"error": "Idempotency key reused with a different request"}), 422
+                if not entry.done.wait(store.wait_timeout):
+                    return jsonify({"error": "Original request still in progress"}), 409
+                if entry.response is not None:
+                    store.replays += 1
+                    status, data, headers = entry.response
+                    response = make_response(data, status)
+                    response.headers.update(headers)
+                    response.headers["Idempotent-Replayed"] = "true"
+                    return response
+                # La petición original falló sin guardar respuesta: se procesa esta
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                store.abort(key, entry)
+                raise
+            if _replayable(response.status_code) and not response.is_streamed:
+                headers = {name: value for name, value in response.headers.items()
+                           if name.lower() not in ("content-length", "x-request-id")}
+                store.complete(key, entry, (response.status_code, response.get_data(), headers))
+            else:
+                store.abort(key, entry)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,385 @@
+"""
+Despliegue de modelos de Rasa sin cortes, guiado por `trained_models.is_active`.
+
+Un hilo consulta cada MODEL_ROLLOUT_POLL_INTERVAL segundos qué modelo está
+marcado como activo. Cuando cambia:
+
+1. Carga: el modelo se carga con `PUT /model` en las réplicas de reserva
+   (MODEL_STANDBY_URLS), que no reciben tráfico, y se comprueba en /status.
+2. Calentamiento: se analizan con `/model/parse` los últimos
+   MODEL_WARMUP_MESSAGES mensajes de usuarios, para que la primera petición
+   real no pague la inicialización del pipeline.
+3. Cambio: el enrutador pasa a las réplicas de reserva en una sola operación
+   (`RasaRouter.set_replicas`); las antiguas quedan como reserva.
+4. Drenaje: se espera a que terminen las peticiones en curso en las réplicas
+   antiguas (como máximo MODEL_DRAIN_TIMEOUT segundos).
+
+Las réplicas antiguas conservan el modelo anterior, así que `rollback()`
+devuelve el tráfico a ellas al instante. Si falla la carga o el
+calentamiento, el tráfico no cambia y se vuelve a marcar como activo el
+modelo que se está sirviendo.
+
+Sin réplicas de reserva se actualizan las réplicas de una en una, retirando
+cada una del enrutador mientras carga el modelo; con una sola réplica el
+chat espera mientras se carga.
+
+Los tiempos de carga, calentamiento y drenaje se guardan en
+`performance_metrics.rollout` del modelo.
+
+Con réplicas de reserva o varias réplicas, una conversación pasa de una
+réplica a otra en cada cambio o vuelta atrás. Cada réplica guarda en caché
+los trackers (rasa/tracker_stores.py), así que su caché tiene que ser la
+compartida en Redis (TRACKER_CACHE_BACKEND=redis): con la caché local de
+cada réplica, volver a una réplica antes de que caduque su copia serviría una
+conversación obsoleta. Si no lo es, ModelRollout no arranca.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+import db
+from training import set_active_model
+
+logger = logging.getLogger(__name__)
+
+# Configuración del despliegue de modelos
+MODEL_STANDBY_URLS = [u.strip().rstrip("/") for u in os.environ.get("MODEL_STANDBY_URLS", "").split(",") if u.strip()]
+MODEL_ROLLOUT_POLL_INTERVAL = float(os.environ.get("MODEL_ROLLOUT_POLL_INTERVAL", "10"))
+MODEL_WARMUP_MESSAGES = int(os.environ.get("MODEL_WARMUP_MESSAGES", "50"))
+MODEL_DRAIN_TIMEOUT = float(os.environ.get("MODEL_DRAIN_TIMEOUT", "30"))
+MODEL_LOAD_TIMEOUT = float(os.environ.get("MODEL_LOAD_TIMEOUT", "600"))
+# Caché de trackers de las réplicas de Rasa (cache_backend en rasa/endpoints.yml)
+TRACKER_CACHE_BACKEND = os.environ.get("TRACKER_CACHE_BACKEND", "local")
+
+# Fracción máxima de mensajes de calentamiento que pueden fallar
+WARMUP_MAX_ERROR_RATIO = 0.5
+
+
+class RolloutError(RuntimeError):
+    """El despliegue o la vuelta atrás no se pudieron completar."""
+
+
+def fetch_active_model():
+    """Modelo marcado como activo en `trained_models`, o None."""
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, file_path FROM trained_models WHERE is_active ORDER BY id DESC LIMIT 1"
+            )
+            row = cursor.fetchone()
+            return {"model_id": row[0], "model_file": row[1]} if row else None
+    finally:
+        connection.close()
+
+
+def fetch_warmup_messages(limit=MODEL_WARMUP_MESSAGES):
+    """Últimos mensajes de usuarios, para calentar el modelo con texto real."""
+    if limit <= 0:
+        return []
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT message FROM messages WHERE sender = 'user' ORDER BY id DESC LIMIT %s", (limit,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def record_rollout_metrics(model_id, metrics):
+    """Añade los datos del despliegue a `performance_metrics.rollout` del modelo."""
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE trained_models
+                SET performance_metrics = JSON_SET(
+                    COALESCE(performance_metrics, JSON_OBJECT()), '$.rollout',
+                    JSON_MERGE_PATCH(COALESCE(performance_metrics->'$.rollout', JSON_OBJECT()), CAST(%s AS JSON)))
+                WHERE id = %s
+                """,
+                (json.dumps(metrics), model_id)
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def served_model_path(rasa_url, timeout=5):
+    """Ruta del modelo que sirve una réplica, tal como la indica /status."""
+    response = requests.get(f"{rasa_url}/status", timeout=timeout)
+    response.raise_for_status()
+    return response.json().get("model_file") or ""
+
+
+def served_model(rasa_url, timeout=5):
+    """Nombre del archivo del modelo que sirve una réplica, según /status."""
+    return os.path.basename(served_model_path(rasa_url, timeout))
+
+
+def load_model(rasa_url, model_file, timeout=MODEL_LOAD_TIMEOUT):
+    """Carga el modelo en una réplica y comprueba que lo está sirviendo."""
+    response = requests.put(f"{rasa_url}/model", json={"model_file": model_file}, timeout=timeout)
+    if not response.ok:
+        raise RolloutError(f"{rasa_url} no pudo cargar el modelo: {response.status_code}")
+    loaded = served_model(rasa_url)
+    if loaded != os.path.basename(model_file):
+        raise RolloutError(f"{rasa_url} sirve {loaded} en lugar de {model_file}")
+
+
+def warm_up(rasa_url, texts, timeout=30):
+    """Analiza los textos en la réplica; devuelve el número de errores."""
+    errors = 0
+    session = requests.Session()
+    for text in texts:
+        try:
+            session.post(f"{rasa_url}/model/parse", json={"text": text}, timeout=timeout).raise_for_status()
+        except requests.RequestException:
+            errors += 1
+    if texts and errors > len(texts) * WARMUP_MAX_ERROR_RATIO:
+        raise RolloutError(f"{rasa_url} falló {errors} de {len(texts)} mensajes de calentamiento")
+    return errors
+
+
+class ModelRollout:
+    """Sigue el modelo activo en la base de datos y lo despliega en las réplicas de Rasa."""
+
+    def __init__(self, router, standby_urls=MODEL_STANDBY_URLS, poll_interval=MODEL_ROLLOUT_POLL_INTERVAL,
+                 drain_timeout=MODEL_DRAIN_TIMEOUT, on_switch=None, tracker_cache_backend=TRACKER_CACHE_BACKEND):
+        self.router = router
+        self.standby_urls = [url for url in standby_urls if url not in router.urls]
+        if (self.standby_urls or len(router.urls) > 1) and tracker_cache_backend != "redis":
+            raise RolloutError(
+                "Con réplicas de reserva (MODEL_STANDBY_URLS) o varias réplicas (RASA_URLS) "
+                "la caché de trackers de Rasa tiene que ser compartida: TRACKER_CACHE_BACKEND=redis"
+            )
+        self.poll_interval = poll_interval
+        self.drain_timeout = drain_timeout
+        # Se llama con las réplicas que pasan a servir tráfico y el modelo que sirven
+        self.on_switch = on_switch
+        self.current = None
+        # Modelo que servían las réplicas al arrancar, ya comunicado a on_switch
+        self.served_path = None
+        self.previous = None
+        self.state = "idle"
+        self.last_rollout = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-rollout", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Comprueba el modelo activo sin esperar al siguiente sondeo."""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning("No se pudo comprobar el modelo activo: %s", e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def sync(self):
+        """Despliega el modelo activo si no es el que se está sirviendo."""
+        with self._lock:
+            # Dentro del bloqueo: una vuelta atrás entre la lectura y el despliegue no se deshace
+            active = fetch_active_model()
+            if self.current is None:
+                # Al arrancar, las réplicas pueden estar sirviendo ya el modelo activo
+                served = self._follow_served_model()
+                if active is not None and served == os.path.basename(active["model_file"]):
+                    self.current = active
+                    return
+            if active is None:
+                return
+            if self.current is not None and self.current["model_id"] == active["model_id"]:
+                return
+            self._rollout(active)
+
+    def _follow_served_model(self):
+        """
+        Avisa a `on_switch` del modelo que sirven ya las réplicas, haya o no
+        un modelo activo en `trained_models`.
+
+        Returns:
+            El nombre del archivo del modelo si todas las réplicas sirven el
+            mismo, o None.
+        """
+        paths = {served_model_path(url) for url in self.router.urls}
+        if len(paths) != 1 or not next(iter(paths)):
+            return None
+        model_path = paths.pop()
+        if model_path != self.served_path:
+            self.served_path = model_path
+            if self.on_switch:
+                self.on_switch(self.router.urls, model_path)
+        return os.path.basename(model_path)
+
+    def _rollout(self, target):
+        metrics = {"started_at": datetime.now().isoformat(), "model_file": target["model_file"]}
+        self.last_rollout = {"model_id": target["model_id"], "status": "running", **metrics}
+        logger.info("Desplegando el modelo %s (%s)", target["model_id"], target["model_file"])
+        try:
+            texts = fetch_warmup_messages()
+            if self.standby_urls:
+                metrics.update(self._blue_green(target, texts))
+            else:
+                metrics.update(self._rolling(target, texts))
+        except Exception as e:
+            logger.error("Despliegue del modelo %s fallido: %s", target["model_id"], e)
+            metrics.update({"status": "failed", "error": str(e)})
+            self.state = "idle"
+            self.last_rollout = {"model_id": target["model_id"], **metrics}
+            self._record(target["model_id"], metrics)
+            # Se vuelve a marcar como activo el modelo que sigue sirviendo Rasa
+            if self.current is not None:
+                set_active_model(self.current["model_id"])
+            return
+
+        self.current = target
+        metrics["status"] = "active"
+        self.state = "idle"
+        self.last_rollout = {"model_id": target["model_id"], **metrics}
+        self._record(target["model_id"], metrics)
+        logger.info("Modelo %s desplegado: %s", target["model_id"], metrics)
+
+    def _load_and_warm(self, urls, model_file, texts):
+        self.state = "loading"
+        start = time.perf_counter()
+        for url in urls:
+            load_model(url, model_file)
+        load_seconds = time.perf_counter() - start
+
+        self.state = "warming"
+        start = time.perf_counter()
+        errors = sum(warm_up(url, texts) for url in urls)
+        return {
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(time.perf_counter() - start, 3),
+            "warmup_messages": len(texts),
+            "warmup_errors": errors,
+        }
+
+    def _blue_green(self, target, texts):
+        old_urls, new_urls = self.router.urls, self.standby_urls
+        metrics = {"mode": "standby", "replicas": new_urls}
+        metrics.update(self._load_and_warm(new_urls, target["model_file"], texts))
+
+        self._switch(new_urls, target["model_file"])
+        self.state = "draining"
+        self.previous = {**self.current, "urls": old_urls} if self.current else None
+        start = time.perf_counter()
+        metrics["drained"] = self.router.wait_drained(old_urls, self.drain_timeout)
+        metrics["drain_seconds"] = round(time.perf_counter() - start, 3)
+        return metrics
+
+    def _rolling(self, target, texts):
+        urls = self.router.urls
+        metrics = {"mode": "rolling", "replicas": urls, "load_seconds": 0.0, "warmup_seconds": 0.0,
+                   "drain_seconds": 0.0, "warmup_messages": len(texts), "warmup_errors": 0}
+        updated = []
+        try:
+            for url in urls:
+                others = [u for u in urls if u != url]
+                if others:
+                    self.state = "draining"
+                    self.router.set_replicas(others)
+                    start = time.perf_counter()
+                    self.router.wait_drained([url], self.drain_timeout)
+                    metrics["drain_seconds"] += time.perf_counter() - start
+                updated.append(url)
+                step = self._load_and_warm([url], target["model_file"], texts)
+                for key in ("load_seconds", "warmup_seconds", "warmup_errors"):
+                    metrics[key] += step[key]
+                self.router.set_replicas(urls)
+        except Exception:
+            # Las réplicas ya actualizadas vuelven al modelo anterior antes de recibir tráfico
+            if self.current is not None:
+                for url in updated:
+                    try:
+                        load_model(url, self.current["model_file"])
+                    except Exception as e:
+                        logger.error("No se pudo restaurar el modelo anterior en %s: %s", url, e)
+            self.router.set_replicas(urls)
+            raise
+        for key in ("load_seconds", "warmup_seconds", "drain_seconds"):
+            metrics[key] = round(metrics[key], 3)
+        # Sin réplicas de reserva no queda ninguna con el modelo anterior cargado
+        self.previous = {**self.current, "urls": None} if self.current else None
+        if self.on_switch:
+            self.on_switch(urls, target["model_file"])
+        return metrics
+
+    def _switch(self, urls, model_file):
+        old_urls = self.router.urls
+        self.router.set_replicas(urls)
+        self.standby_urls = old_urls
+        if self.on_switch:
+            self.on_switch(urls, model_file)
+
+    def rollback(self):
+        """
+        Vuelve al modelo anterior. Con réplicas de reserva es inmediato: el
+        tráfico vuelve a las réplicas que aún lo tienen cargado.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RolloutError("Hay un despliegue en curso")
+        try:
+            if self.previous is None:
+                raise RolloutError("No hay un modelo anterior al que volver")
+            previous, rolled_back = self.previous, self.current
+            start = time.perf_counter()
+            if previous["urls"] is None:
+                # Despliegue por réplicas: hay que volver a cargar el modelo anterior
+                set_active_model(previous["model_id"])
+                self._rollout({"model_id": previous["model_id"], "model_file": previous["model_file"]})
+                if self.current["model_id"] != previous["model_id"]:
+                    raise RolloutError("No se pudo volver al modelo anterior")
+                rollback_seconds, drained = time.perf_counter() - start, True
+            else:
+                self._switch(previous["urls"], previous["model_file"])
+                rollback_seconds = time.perf_counter() - start
+                self.current = {"model_id": previous["model_id"], "model_file": previous["model_file"]}
+                self.previous = {**rolled_back, "urls": self.standby_urls}
+                set_active_model(previous["model_id"])
+                drained = self.router.wait_drained(self.standby_urls, self.drain_timeout)
+
+            metrics = {"status": "rolled_back", "rolled_back_at": datetime.now().isoformat(),
+                       "rollback_seconds": round(rollback_seconds, 6), "drained": drained}
+            self.last_rollout = {"model_id": rolled_back["model_id"], **metrics}
+            self._record(rolled_back["model_id"], metrics)
+            logger.info("Vuelta al modelo %s desde el %s", previous["model_id"], rolled_back["model_id"])
+            return self.status()
+        finally:
+            self._lock.release()
+
+    def _record(self, model_id, metrics):
+        try:
+            record_rollout_metrics(model_id, metrics)
+        except Exception as e:
+            logger.warning("No se pudieron guardar las métricas del despliegue de %s: %s", model_id, e)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "current": self.current,
+            "previous": self.previous,
+            "serving": self.router.urls,
+            "standby": self.standby_urls,
+            "last_rollout": self.last_rollout,
+        }
@@ -0,0 +1,184 @@
+"""
+Agrupación en micro-lotes de las peticiones de análisis NLU.
+
+Las peticiones concurrentes que llegan dentro de una ventana de unos pocos
+milisegundos se agrupan, se envían como un único análisis por lotes y los
+resultados se reparten de vuelta a cada petición.
+
+Con NLU_BATCH_URL, /api/chat también analiza cada mensaje en el micro-lote y
+envía el resultado a Rasa (`parse_data`, ver `rasa/channels.py`), que ya no
+ejecuta el NLU por mensaje. Solo se usa el análisis si el servidor de lotes
+sirve el mismo modelo que las réplicas de Rasa; si no, Rasa analiza el
+mensaje como siempre.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+NLU_BATCH_URL = os.environ.get("NLU_BATCH_URL", "")
+NLU_BATCH_WINDOW_MS = float(os.environ.get("NLU_BATCH_WINDOW_MS", "5"))
+NLU_BATCH_MAX_SIZE = int(os.environ.get("NLU_BATCH_MAX_SIZE", "32"))
+NLU_BATCH_TIMEOUT = float(os.environ.get("NLU_BATCH_TIMEOUT", "10"))
+NLU_BATCH_CHAT = os.environ.get("NLU_BATCH_CHAT", "true").lower() == "true"
+NLU_BATCH_LOAD_TIMEOUT = float(os.environ.get("NLU_BATCH_LOAD_TIMEOUT", "600"))
+
+
+class MicroBatcher:
+    """
+    Agrupa elementos enviados desde varios hilos y los procesa en lotes.
+
+    Args:
+        batch_fn: Función que recibe una lista de elementos y devuelve una
+            lista de resultados en el mismo orden
+        window_ms: Tiempo máximo de espera desde el primer elemento del lote
+        max_batch_size: Tamaño máximo del lote
+    """
+
+    def __init__(self, batch_fn, window_ms=NLU_BATCH_WINDOW_MS, max_batch_size=NLU_BATCH_MAX_SIZE):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="nlu-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Encola un elemento y devuelve un `Future` con su resultado."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def process(self, item, timeout=NLU_BATCH_TIMEOUT):
+        """Encola un elemento y espera su resultado."""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError("El lote devolvió un número distinto de resultados")
+            except Exception as e:
+                logger.error("Error al procesar un lote de %d elementos: %s", len(items), e)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class RasaBatchParser:
+    """
+    Función de lote que analiza textos con Rasa.
+
+    Usa el endpoint `/model/parse_batch` de `rasa/nlu_batch_server.py` si está
+    configurado; si no, reparte el lote en llamadas `/model/parse` paralelas
+    sobre una sesión HTTP compartida.
+
+    `model_file` es el modelo que sirven las réplicas de Rasa (lo fija el
+    despliegue de modelos con `load_model`) y `batch_model` el último con el
+    que respondió el servidor de lotes.
+    """
+
+    def __init__(self, rasa_url, batch_url=NLU_BATCH_URL, timeout=NLU_BATCH_TIMEOUT):
+        self.rasa_url = rasa_url
+        self.batch_url = batch_url
+        self.timeout = timeout
+        self.model_file = None
+        self.model_path = None
+        self.batch_model = None
+        self._reloading = threading.Lock()
+        self.session = requests.Session()
+        self._pool = ThreadPoolExecutor(max_workers=NLU_BATCH_MAX_SIZE, thread_name_prefix="nlu-parse")
+
+    def load_model(self, model_file, timeout=NLU_BATCH_LOAD_TIMEOUT):
+        """Carga en el servidor de lotes el modelo que pasan a servir las réplicas de Rasa."""
+        self.model_file = os.path.basename(model_file)
+        self.model_path = model_file
+        if not self.batch_url:
+            return
+        try:
+            response = requests.put(f"{self.batch_url}/model", json={"model_file": model_file}, timeout=timeout)
+            response.raise_for_status()
+            self.batch_model = self.model_file
+        except requests.RequestException as e:
+            logger.warning("El servidor de lotes no pudo cargar %s: %s", model_file, e)
+
+    def _reload_in_background(self):
+        if not self._reloading.acquire(blocking=False):
+            return
+
+        def reload():
+            try:
+                self.load_model(self.model_path)
+            finally:
+                self._reloading.release()
+
+        threading.Thread(target=reload, name="nlu-batch-reload", daemon=True).start()
+
+    def in_sync(self):
+        """True si el servidor de lotes analiza con el mismo modelo que las réplicas de Rasa."""
+        return bool(self.batch_url) and self.model_file is not None and self.batch_model == self.model_file
+
+    def _parse_one(self, text):
+        response = self.session.post(f"{self.rasa_url}/model/parse", json={"text": text}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def __call__(self, texts):
+        if self.batch_url:
+            response = self.session.post(
+                f"{self.batch_url}/model/parse_batch", json={"texts": texts}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+            self.batch_model = os.path.basename(body.get("model_file") or "")
+            if self.model_path and self.batch_model != self.model_file:
+                # El servidor de lotes se reinició con otro modelo: se vuelve a cargar el de Rasa
+                self._reload_in_background()
+            return body["results"]
+        return list(self._pool.map(self._parse_one, texts))
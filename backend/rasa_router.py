@@ -0,0 +1,202 @@
+"""
+Enrutado de la pasarela entre varias réplicas de Rasa.
+
+Cada usuario se asigna a una réplica con hashing consistente sobre su
+`user_id` (con nodos virtuales para repartir la carga), de modo que su
+conversación se queda en la misma réplica y aprovecha la caché del tracker
+store. Al añadir o quitar una réplica solo cambian de réplica los usuarios
+que le correspondían.
+
+- Salud: el sondeo de la pasarela comprueba cada réplica; una réplica que
+  falla el sondeo o una petición deja de recibir tráfico hasta que vuelve a
+  responder. Sus usuarios pasan a la siguiente réplica sana del anillo.
+- Desbordamiento: si la réplica del usuario tiene RASA_REPLICA_MAX_OUTSTANDING
+  peticiones en curso, la petición va a la réplica sana con menos peticiones
+  en curso.
+- Cambio de réplicas: `set_replicas` reemplaza el conjunto de forma atómica;
+  las réplicas retiradas dejan de recibir peticiones nuevas y se siguen
+  contando hasta que terminan las que tenían en curso (`wait_drained`).
+
+Las réplicas se configuran con RASA_URLS (separadas por comas); si no se
+indica, se usa RASA_URL.
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Configuración del enrutado
+RASA_URLS = [u.strip().rstrip("/") for u in
+             os.environ.get("RASA_URLS", os.environ.get("RASA_URL", "http://rasa:5005")).split(",") if u.strip()]
+RASA_VIRTUAL_NODES = int(os.environ.get("RASA_VIRTUAL_NODES", "100"))
+RASA_REPLICA_MAX_OUTSTANDING = int(os.environ.get("RASA_REPLICA_MAX_OUTSTANDING", "8"))
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class _Replica:
+    __slots__ = ("url", "healthy", "outstanding", "requests", "failures")
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+
+
+class RasaRouter:
+    """Anillo de hashing consistente sobre las réplicas de Rasa, con salud y carga."""
+
+    def __init__(self, urls=None, vnodes=RASA_VIRTUAL_NODES, max_outstanding=RASA_REPLICA_MAX_OUTSTANDING):
+        self.vnodes = vnodes
+        self.max_outstanding = max_outstanding
+        self.spillovers = 0
+        self._lock = threading.Lock()
+        self._replicas = {}
+        self._draining = {}
+        self._ring = []
+        self._ring_urls = []
+        self.set_replicas(urls or RASA_URLS)
+
+    @property
+    def urls(self):
+        return list(self._replicas)
+
+    def set_replicas(self, urls):
+        """Reemplaza el conjunto de réplicas conservando el estado de las que siguen."""
+        with self._lock:
+            previous = {**self._draining, **self._replicas}
+            self._replicas = {url: previous.get(url) or _Replica(url) for url in urls}
+            self._draining = {url: r for url, r in previous.items()
+                              if url not in self._replicas and r.outstanding > 0}
+            ring = sorted((_hash(f"{url}#{i}"), url) for url in urls for i in range(self.vnodes))
+            self._ring = [h for h, _ in ring]
+            self._ring_urls = [url for _, url in ring]
+
+    def owner(self, user_id, healthy_only=True):
+        """Réplica que corresponde al usuario en el anillo (la siguiente sana si la suya no lo está)."""
+        if not self._ring:
+            raise RuntimeError("No hay réplicas de Rasa configuradas")
+        start = bisect.bisect(self._ring, _hash(str(user_id))) % len(self._ring)
+        seen = set()
+        for i in range(len(self._ring)):
+            url = self._ring_urls[(start + i) % len(self._ring)]
+            if url in seen:
+                continue
+            seen.add(url)
+            if not healthy_only or self._replicas[url].healthy:
+                return url
+            if len(seen) == len(self._replicas):
+                break
+        # Ninguna réplica sana: se intenta con la del usuario igualmente
+        return self._ring_urls[start]
+
+    def choose(self, user_id):
+        """Réplica para una petición del usuario, desbordando a la menos ocupada si la suya está saturada."""
+        with self._lock:
+            url = self.owner(user_id)
+            replica = self._replicas[url]
+            if replica.outstanding >= self.max_outstanding:
+                candidates = [r for r in self._replicas.values() if r.healthy] or [replica]
+                least = min(candidates, key=lambda r: r.outstanding)
+                # Si todas están saturadas se mantiene la réplica del usuario
+                if least.outstanding < self.max_outstanding:
+                    self.spillovers += 1
+                    replica = least
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica.url
+
+    def release(self, url, failed=False):
+        with self._lock:
+            replica = self._replicas.get(url) or self._draining.get(url)
+            if replica is None:
+                return
+            replica.outstanding -= 1
+            if url in self._draining and replica.outstanding <= 0:
+                del self._draining[url]
+            if failed:
+                replica.failures += 1
+                if replica.healthy:
+                    logger.warning("Réplica de Rasa marcada como caída: %s", url)
+                replica.healthy = False
+
+    @contextmanager
+    def request(self, user_id):
+        """Contexto que reserva una réplica para el usuario y la libera al terminar."""
+        url = self.choose(user_id)
+        try:
+            yield url
+        except requests.ConnectionError:
+            # Error de conexión: se deja de enviar tráfico hasta el próximo sondeo correcto
+            self.release(url, failed=True)
+            raise
+        except BaseException:
+            self.release(url)
+            raise
+        else:
+            self.release(url)
+
+    def outstanding(self, urls):
+        """Peticiones en curso en las réplicas indicadas, estén en el anillo o retiradas."""
+        with self._lock:
+            replicas = (self._replicas.get(url) or self._draining.get(url) for url in urls)
+            return sum(r.outstanding for r in replicas if r is not None)
+
+    def wait_drained(self, urls, timeout):
+        """Espera a que terminen las peticiones en curso de las réplicas; devuelve si lo hicieron."""
+        deadline = time.monotonic() + timeout
+        while self.outstanding(urls):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def mark(self, url, healthy):
+        with self._lock:
+            replica = self._replicas.get(url)
+            if replica is not None and replica.healthy != healthy:
+                logger.info("Réplica de Rasa %s: %s", url, "sana" if healthy else "caída")
+                replica.healthy = healthy
+
+    def replica_check(self, url, check):
+        """Envuelve una comprobación de salud para que actualice el estado de la réplica."""
+        def wrapped():
+            try:
+                detail = check()
+            except Exception:
+                self.mark(url, False)
+                raise
+            self.mark(url, True)
+            return detail
+        return wrapped
+
+    def check_any(self):
+        """Comprobación agregada: al menos una réplica sana."""
+        healthy = [url for url, r in self._replicas.items() if r.healthy]
+        if not healthy:
+            raise RuntimeError("Ninguna réplica de Rasa disponible")
+        return {"healthy": len(healthy), "replicas": len(self._replicas)}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "spillovers": self.spillovers,
+                "draining": {url: r.outstanding for url, r in self._draining.items()},
+                "replicas": {
+                    url: {"healthy": r.healthy, "outstanding": r.outstanding,
+                          "requests": r.requests, "failures": r.failures}
+                    for url, r in self._replicas.items()
+                },
+            }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Cierre de conversaciones inactivas.
+
+Marca como terminadas (`ended_at`) las conversaciones abiertas cuya última
+actividad es anterior al umbral de inactividad, por lotes, y después
+recalcula las métricas diarias una sola vez por cada fecha afectada.
+
+Las fechas afectadas incluyen también las de las conversaciones terminadas
+por otras vías (el panel las cierra con `ended_at = NOW()`) desde la
+ejecución anterior, cuyo momento se guarda en `batch_job_state`.
+
+Ejecutar este script con: python session_reaper.py --idle-minutes 30
+Para ejecutarlo periódicamente: python session_reaper.py --interval 300
+(en docker-compose lo hace el servicio `session-reaper`)
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuración del cierre de sesiones
+SESSION_IDLE_MINUTES = int(os.environ.get("SESSION_IDLE_MINUTES", "30"))
+SESSION_REAPER_BATCH_SIZE = int(os.environ.get("SESSION_REAPER_BATCH_SIZE", "1000"))
+
+JOB_NAME = "session_reaper"
+# Solape con la ventana anterior, para las transacciones que terminaron una
+# conversación justo antes del punto de control pero se confirmaron después
+CHECKPOINT_OVERLAP_SECONDS = 60
+
+
+def close_idle_batch(cursor, idle_minutes, batch_size):
+    """
+    Cierra un lote de conversaciones inactivas.
+
+    Returns:
+        Tupla (conversaciones cerradas, fechas de inicio afectadas).
+    """
+    cursor.execute(
+        """
+        SELECT id, DATE(started_at)
+        FROM conversations
+        WHERE ended_at IS NULL AND last_activity_at < NOW() - INTERVAL %s MINUTE
+        ORDER BY last_activity_at
+        LIMIT %s
+        """,
+        (idle_minutes, batch_size),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return 0, set()
+
+    ids = [row[0] for row in rows]
+    placeholders = ", ".join(["%s"] * len(ids))
+    # Se repite la condición de inactividad por si llegó un mensaje entre la
+    # lectura y la actualización
+    closed = cursor.execute(
+        f"""
+        UPDATE conversations
+        SET ended_at = last_activity_at
+        WHERE id IN ({placeholders})
+          AND ended_at IS NULL
+          AND last_activity_at < NOW() - INTERVAL %s MINUTE
+        """,
+        ids + [idle_minutes],
+    )
+    return closed, {row[1] for row in rows} if closed else set()
+
+
+def get_checkpoint(cursor):
+    cursor.execute("SELECT checkpoint_at FROM batch_job_state WHERE job = %s", (JOB_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def save_checkpoint(cursor, checkpoint):
+    cursor.execute(
+        """
+        INSERT INTO batch_job_state (job, checkpoint_at) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE checkpoint_at = VALUES(checkpoint_at)
+        """,
+        (JOB_NAME, checkpoint),
+    )
+
+
+def ended_since(cursor, since, until):
+    """
+    Fechas de inicio de las conversaciones terminadas entre el punto de
+    control anterior y `until` (todas si no hay punto de control).
+    """
+    if since is None:
+        cursor.execute(
+            "SELECT DISTINCT DATE(started_at) FROM conversations WHERE ended_at <= %s",
+            (until,),
+        )
+    else:
+        cursor.execute(
+            """
+            SELECT DISTINCT DATE(started_at)
+            FROM conversations
+            WHERE ended_at > %s - INTERVAL %s SECOND AND ended_at <= %s
+            """,
+            (since, CHECKPOINT_OVERLAP_SECONDS, until),
+        )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def reap(idle_minutes=SESSION_IDLE_MINUTES, batch_size=SESSION_REAPER_BATCH_SIZE):
+    """
+    Cierra todas las conversaciones inactivas y actualiza las métricas diarias.
+
+    Returns:
+        Tupla (conversaciones cerradas, fechas recalculadas).
+    """
+    connection = get_connection(autocommit=False)
+    total = 0
+    dates = set()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT NOW()")
+            checkpoint = cursor.fetchone()[0]
+            while True:
+                closed, batch_dates = close_idle_batch(cursor, idle_minutes, batch_size)
+                connection.commit()
+                total += closed
+                dates |= batch_dates
+                if closed < batch_size:
+                    break
+
+            # Las cerradas aquí tienen `ended_at = last_activity_at`, anterior
+            # al punto de control: sus fechas ya están en `dates`
+            dates |= ended_since(cursor, get_checkpoint(cursor), checkpoint)
+            for date in sorted(dates):
+                cursor.callproc("calculate_daily_metrics", (date,))
+                connection.commit()
+            save_checkpoint(cursor, checkpoint)
+            connection.commit()
+    finally:
+        connection.close()
+    return total, sorted(dates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cierre de conversaciones inactivas")
+    parser.add_argument("--idle-minutes", type=int, default=SESSION_IDLE_MINUTES,
+                        help="Minutos sin actividad para cerrar una conversación")
+    parser.add_argument("--batch-size", type=int, default=SESSION_REAPER_BATCH_SIZE,
+                        help="Conversaciones cerradas por transacción")
+    parser.add_argument("--interval", type=int, default=0, help="Repetir cada N segundos (0 = una sola vez)")
+    args = parser.parse_args()
+
+    while True:
+        start = time.time()
+        closed, dates = reap(args.idle_minutes, args.batch_size)
+        print(f"🧹 {closed} conversaciones cerradas, métricas recalculadas para {len(dates)} fechas "
+              f"en {time.time() - start:.1f} s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
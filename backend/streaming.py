@@ -0,0 +1,250 @@
+"""
+Respuestas del chat en streaming con Server-Sent Events.
+
+El cliente abre una conexión persistente por sesión
+(GET /api/chat/stream/<session_id>) y envía cada mensaje con
+POST /api/chat/stream/<session_id>. La pasarela llama al canal REST de Rasa
+con `?stream=true`, que devuelve cada mensaje del bot en cuanto se genera
+(una línea JSON por mensaje), y lo reenvía a todas las conexiones abiertas de
+la sesión como un evento `message`. Al terminar la respuesta se envía un
+evento `done`.
+
+Así la respuesta de la base de conocimiento llega sin esperar a la acción
+más lenta, y no se abre una conexión HTTP nueva por mensaje.
+
+Cada evento lleva un id creciente por sesión; al reconectar, el navegador
+envía Last-Event-ID y se reenvían los eventos recientes que se perdió.
+
+Las sesiones las crea un usuario autenticado con POST /api/chat/stream, que
+devuelve el id de la sesión y un token firmado solo para ella. EventSource no
+permite cabeceras, así que el GET lo recibe en `?token=`; el POST lo acepta
+también en `Authorization: Bearer`.
+
+Estos endpoints son para los clientes de la API de la pasarela, que obtienen
+su token con POST /api/auth/login. El panel web (Next.js) no los usa: habla
+con Rasa a través de sus propias rutas de API y su sesión, y sigue
+recibiendo cada respuesta completa.
+
+Las conexiones abiertas y los eventos recientes viven en la memoria del
+proceso: la pasarela debe ejecutarse en un único proceso (app.py con el
+servidor con hilos de Flask). Con varios procesos o réplicas, el POST y la
+conexión SSE de una sesión podrían caer en procesos distintos y los mensajes
+no llegarían.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+
+import requests
+
+from auth import AuthError, decode_token, issue_token
+
+logger = logging.getLogger(__name__)
+
+# Configuración del streaming
+STREAM_HEARTBEAT_INTERVAL = float(os.environ.get("STREAM_HEARTBEAT_INTERVAL", "15"))
+STREAM_REPLAY_SIZE = int(os.environ.get("STREAM_REPLAY_SIZE", "50"))
+STREAM_SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("STREAM_SUBSCRIBER_QUEUE_SIZE", "100"))
+STREAM_RASA_TIMEOUT = float(os.environ.get("STREAM_RASA_TIMEOUT", "60"))
+STREAM_TOKEN_TTL = int(os.environ.get("STREAM_TOKEN_TTL", "86400"))
+STREAM_IDLE_TTL = float(os.environ.get("STREAM_IDLE_TTL", "600"))
+
+# Valor de `scope` de los tokens de sesión, para no aceptar en su lugar los de inicio de sesión
+STREAM_TOKEN_SCOPE = "chat_stream"
+
+
+def new_stream_session(user_id):
+    """
+    Crea una sesión de chat en streaming para un usuario autenticado.
+
+    Returns:
+        (session_id, token): el id de la sesión y el token firmado que da acceso a ella.
+    """
+    session_id = secrets.token_urlsafe(16)
+    token = issue_token(user_id, expires_in=STREAM_TOKEN_TTL, sid=session_id, scope=STREAM_TOKEN_SCOPE)
+    return session_id, token
+
+
+def verify_stream_token(token, session_id):
+    """
+    Comprueba que el token da acceso a la sesión.
+
+    Returns:
+        El id del usuario dueño de la sesión.
+
+    Raises:
+        AuthError: si falta el token, no es válido o es de otra sesión.
+    """
+    if not token:
+        raise AuthError("Falta el token de la sesión")
+    claims = decode_token(token)
+    if claims.get("scope") != STREAM_TOKEN_SCOPE or claims.get("sid") != session_id:
+        raise AuthError("El token no es de esta sesión")
+    return claims["sub"]
+
+
+def format_event(event, data, event_id=None):
+    """Serializa un evento en el formato de texto de SSE."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class _Subscriber:
+    __slots__ = ("queue", "overflowed")
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class _Session:
+    __slots__ = ("subscribers", "recent", "ids", "idle_since")
+
+    def __init__(self, replay_size):
+        self.subscribers = set()
+        self.recent = deque(maxlen=replay_size)
+        self.ids = itertools.count(1)
+        self.idle_since = time.monotonic()
+
+
+class SessionStreams:
+    """
+    Conexiones SSE abiertas por sesión y eventos recientes para reconexiones.
+    Un hilo en segundo plano descarta las sesiones sin conexiones ni eventos
+    desde hace `idle_ttl` segundos.
+    """
+
+    def __init__(self, replay_size=STREAM_REPLAY_SIZE, queue_size=STREAM_SUBSCRIBER_QUEUE_SIZE,
+                 idle_ttl=STREAM_IDLE_TTL, expire_interval=None):
+        self.replay_size = replay_size
+        self.queue_size = queue_size
+        self.idle_ttl = idle_ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._expire_interval = expire_interval or max(1.0, idle_ttl / 10)
+        self._expirer = threading.Thread(target=self._expire_loop, name="stream-expiry", daemon=True)
+        self._expirer.start()
+
+    def _expire_loop(self):
+        while True:
+            time.sleep(self._expire_interval)
+            try:
+                with self._lock:
+                    self._expire()
+            except Exception as e:
+                logger.error("Error al descartar sesiones de streaming inactivas: %s", e)
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(self.replay_size)
+        return session
+
+    def publish(self, session_id, event, data):
+        """Envía un evento a todas las conexiones de la sesión y lo guarda para reconexiones."""
+        with self._lock:
+            session = self._session(session_id)
+            event_id = next(session.ids)
+            payload = format_event(event, data, event_id)
+            session.recent.append((event_id, payload))
+            subscribers = list(session.subscribers)
+            if not subscribers:
+                # Los eventos recientes se conservan idle_ttl desde el último
+                session.idle_since = time.monotonic()
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(payload)
+            except queue.Full:
+                # Cliente demasiado lento: se cierra su conexión y recuperará
+                # los eventos al reconectar con Last-Event-ID
+                subscriber.overflowed = True
+        return event_id
+
+    def subscribe(self, session_id, last_event_id=None):
+        """Registra una conexión, con los eventos que se perdió ya encolados."""
+        subscriber = _Subscriber(self.queue_size)
+        with self._lock:
+            session = self._session(session_id)
+            if last_event_id is not None:
+                for event_id, payload in session.recent:
+                    if event_id > last_event_id and not subscriber.queue.full():
+                        subscriber.queue.put_nowait(payload)
+            session.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, session_id, subscriber):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.subscribers.discard(subscriber)
+            if not session.subscribers:
+                session.idle_since = time.monotonic()
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self._sessions.items()
+                   if not s.subscribers and now - s.idle_since > self.idle_ttl]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def subscriber_count(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return len(session.subscribers) if session else 0
+
+    def events(self, session_id, last_event_id=None, heartbeat=STREAM_HEARTBEAT_INTERVAL):
+        """Generador del cuerpo de la respuesta SSE para una conexión."""
+        subscriber = self.subscribe(session_id, last_event_id)
+        try:
+            # Reintento sugerido al navegador si se corta la conexión
+            yield "retry: 2000\n\n"
+            while not (subscriber.overflowed and subscriber.queue.empty()):
+                try:
+                    yield subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comentario SSE para que proxies y navegadores no cierren la conexión
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(session_id, subscriber)
+
+
+def webhook_payload(sender, message, metadata=None, parse_data=None):
+    """Cuerpo para el webhook REST de Rasa (`rasa/channels.py`)."""
+    payload = {"sender": sender, "message": message, "metadata": metadata or {}}
+    if parse_data is not None:
+        payload["parse_data"] = parse_data
+    return payload
+
+
+def stream_rasa(rasa_url, sender, message, metadata=None, parse_data=None, timeout=STREAM_RASA_TIMEOUT):
+    """
+    Envía un mensaje al canal REST de Rasa en modo streaming, con el análisis
+    NLU ya hecho por la pasarela si lo hay.
+
+    Yields:
+        Cada mensaje del bot (diccionario) en cuanto Rasa lo produce.
+    """
+    with requests.post(
+        f"{rasa_url}/webhooks/rest/webhook",
+        params={"stream": "true"},
+        json=webhook_payload(sender, message, metadata, parse_data),
+        stream=True,
+        timeout=timeout,
+    ) as response:
+        response.raise_for_status()
+        # chunk_size=None entrega cada fragmento en cuanto llega, sin esperar a llenar un bloque
+        for line in response.iter_lines(chunk_size=None):
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,14 @@
+"""Configuración común de las pruebas de la pasarela."""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Los registros de auditoría y las trazas de las pruebas no deben ensuciar el directorio de trabajo
+os.environ.setdefault("FAST_PATH_AUDIT_FILE", os.path.join(tempfile.gettempdir(), "test_fast_path_audit.jsonl"))
+os.environ.setdefault("TRACE_FILE", os.path.join(tempfile.gettempdir(), "test_gateway_traces.jsonl"))
+
+# Los módulos de la pasarela se importan por nombre, como en backend/app.py
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,164 @@
+"""Pruebas de la limitación de peticiones y el control de admisión."""
+
+import threading
+import time
+
+import pytest
+from flask import Flask, request
+
+import admission
+from admission import (ANONYMOUS_PRIORITY, AdmissionController, AdmissionRejected, LocalTokenBuckets,
+                       PriorityLimiter, RoleResolver)
+from auth import current_user, issue_token
+
+SECRET = "secreto-de-pruebas"
+
+
+class FakeConnection:
+    def __init__(self, roles, calls):
+        self.roles = roles
+        self.calls = calls
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        self.calls.append(params[0])
+        self.row = (self.roles[params[0]],) if params[0] in self.roles else None
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Base de datos de usuarios falsa; `state["down"]` simula que no responde."""
+    state = {"roles": {"7": "teacher", "8": "student"}, "calls": [], "down": False}
+
+    def get_connection():
+        if state["down"]:
+            raise OSError("Can't connect to MySQL server")
+        return FakeConnection(state["roles"], state["calls"])
+
+    monkeypatch.setattr(admission, "get_connection", get_connection)
+    return state
+
+
+def test_token_bucket_allows_burst_then_asks_to_wait():
+    buckets = LocalTokenBuckets()
+    assert [buckets.take("k", rate=1, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("k", rate=1, burst=3) > 0
+
+
+def test_role_comes_from_token_without_querying(database):
+    roles = RoleResolver()
+    assert roles.role({"id": "8", "role": "admin"}) == "admin"
+    assert roles.priority(None) == ANONYMOUS_PRIORITY
+    assert database["calls"] == []
+
+
+def test_role_lookups_are_cached_and_bounded(database):
+    roles = RoleResolver(max_size=2)
+    assert roles.role({"id": "7", "role": None}) == "teacher"
+    assert roles.role({"id": "7", "role": None}) == "teacher"
+    assert database["calls"] == ["7"]
+
+    roles.role({"id": "8", "role": None})
+    roles.role({"id": "9", "role": None})
+    assert len(roles._cache) == 2
+    assert "7" not in roles._cache
+
+
+def test_unknown_user_gets_default_role(database):
+    assert RoleResolver(default_role="student").role({"id": "99", "role": None}) == "student"
+
+
+def test_database_failure_is_cached_with_default_role(database):
+    database["down"] = True
+    roles = RoleResolver(default_role="student", failure_ttl=60)
+    assert roles.role({"id": "7", "role": None}) == "student"
+    database["down"] = False
+
+    # Durante failure_ttl no se vuelve a consultar, ni para este usuario ni para otros
+    assert roles.role({"id": "7", "role": None}) == "student"
+    assert roles.role({"id": "8", "role": None}) == "student"
+    assert database["calls"] == []
+
+
+def test_limiter_sheds_lowest_priority_when_queue_is_full():
+    limiter = PriorityLimiter(max_concurrency=1, queue_size=1, queue_timeout=5)
+    limiter.acquire(priority=0)
+    results = {}
+
+    def wait(name, priority):
+        try:
+            limiter.acquire(priority)
+            results[name] = "admitted"
+            limiter.release(0.1)
+        except AdmissionRejected:
+            results[name] = "rejected"
+
+    student = threading.Thread(target=wait, args=("student", 1))
+    student.start()
+    while not limiter._waiting:
+        time.sleep(0.001)
+    teacher = threading.Thread(target=wait, args=("teacher", 0))
+    teacher.start()
+    student.join()
+    limiter.release(0.1)
+    teacher.join()
+
+    assert results == {"student": "rejected", "teacher": "admitted"}
+    assert limiter.stats() == {"active": 0, "queued": 0, "max_concurrency": 1, "admitted": 2, "shed": 1}
+
+
+@pytest.fixture
+def gateway(monkeypatch, database):
+    """Aplicación mínima que admite peticiones como /api/chat."""
+    monkeypatch.setattr("auth.JWT_SECRET", SECRET)
+    controller = AdmissionController(limiter=PriorityLimiter(max_concurrency=4, queue_timeout=0.01))
+    app = Flask(__name__)
+    seen = []
+
+    @app.route("/chat", methods=["POST"])
+    def chat():
+        try:
+            controller.check_rate(current_user(), request.remote_addr)
+        except AdmissionRejected as e:
+            return {"error": e.reason}, 429
+        seen.append(controller.roles.priority(current_user()))
+        return {"ok": True}
+
+    return app.test_client(), seen
+
+
+def test_identity_and_priority_ignore_the_request_body(gateway, monkeypatch):
+    client, seen = gateway
+    monkeypatch.setattr(admission, "RATE_LIMIT_USER_BURST", 2)
+    monkeypatch.setattr(admission, "RATE_LIMIT_USER_RATE", 0.001)
+    headers = {"Authorization": f"Bearer {issue_token('8', secret=SECRET)}"}
+
+    # Cambiar user_id en el cuerpo no da fichas nuevas ni más prioridad
+    statuses = [client.post("/chat", json={"user_id": f"7-{i}", "message": "hola"}, headers=headers).status_code
+                for i in range(3)]
+    assert statuses == [200, 200, 429]
+    assert seen == [1, 1]
+
+
+def test_anonymous_requests_are_limited_by_ip(gateway, monkeypatch):
+    client, seen = gateway
+    monkeypatch.setattr(admission, "RATE_LIMIT_IP_BURST", 1)
+    monkeypatch.setattr(admission, "RATE_LIMIT_IP_RATE", 0.001)
+
+    assert client.post("/chat", json={"user_id": "7"}).status_code == 200
+    assert client.post("/chat", json={"user_id": "8"}).status_code == 429
+    assert seen == [ANONYMOUS_PRIORITY]
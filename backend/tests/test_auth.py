@@ -0,0 +1,59 @@
+"""Pruebas de la autenticación: roles y comprobación de contraseñas."""
+
+import pytest
+from flask import Flask, jsonify
+
+from auth import check_password, issue_token, require_role
+
+SECRET = "secreto-de-pruebas"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr("auth.JWT_SECRET", SECRET)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/admin", methods=["POST"])
+    @require_role("admin")
+    def admin_only():
+        return jsonify({"ok": True})
+
+    return app.test_client()
+
+
+def bearer(**claims):
+    return {"Authorization": f"Bearer {issue_token('3', **claims)}"}
+
+
+def test_require_role_rejects_anonymous_requests(client):
+    response = client.post("/admin")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_require_role_rejects_other_roles(client):
+    assert client.post("/admin", headers=bearer(role="student")).status_code == 403
+    assert client.post("/admin", headers=bearer()).status_code == 403
+
+
+def test_require_role_accepts_allowed_role(client):
+    assert client.post("/admin", headers=bearer(role="admin")).status_code == 200
+
+
+def test_scoped_tokens_do_not_grant_roles(client):
+    headers = bearer(role="admin", scope="chat_stream")
+    assert client.post("/admin", headers=headers).status_code == 401
+
+
+def test_check_password_accepts_php_bcrypt_hashes():
+    bcrypt = pytest.importorskip("bcrypt")
+    password_hash = bcrypt.hashpw(b"secreta", bcrypt.gensalt(rounds=4)).decode()
+    php_hash = "$2y$" + password_hash[4:]
+
+    assert check_password("secreta", php_hash)
+    assert not check_password("otra", php_hash)
+    assert not check_password("secreta", None)
@@ -0,0 +1,112 @@
+"""Pruebas de la agrupación de preguntas sin respuesta."""
+
+from datetime import datetime
+
+import numpy as np
+
+from fallback_clusters import FallbackClusterer, SubjectMatcher, minhash, normalize, save_changes, similarity
+
+
+class FakeCursor:
+    """Cursor que guarda las sentencias y devuelve las filas indicadas."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def executemany(self, query, rows):
+        self.executed.append((query, list(rows)))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_normalize_strips_accents_punctuation_and_case():
+    assert normalize("¿Cuándo es el  EXAMEN de Física?") == "cuando es el examen de fisica"
+
+
+def test_minhash_estimates_similarity():
+    question = minhash(normalize("¿Cuándo es el examen final de cálculo?"))
+    typo = minhash(normalize("cuando es el examen final de calculo"))
+    unrelated = minhash(normalize("¿Dónde está la biblioteca central?"))
+
+    assert question.dtype == np.uint32
+    assert similarity(question, typo) == 1.0
+    assert similarity(question, minhash(normalize("cuando es el exmen final de calculo"))) >= 0.5
+    assert similarity(question, unrelated) < 0.2
+
+
+def test_near_duplicates_join_the_same_cluster():
+    clusterer = FallbackClusterer(threshold=0.5)
+    first = clusterer.add(1, "¿Cuándo es el examen final de cálculo?", datetime(2024, 5, 1))
+    second = clusterer.add(1, "cuando es el exmen final de calculo", datetime(2024, 5, 3))
+    other = clusterer.add(1, "¿Dónde está la biblioteca central?", datetime(2024, 5, 2))
+
+    assert second is first
+    assert other is not first
+    assert first.count == 2
+    assert first.question == "¿Cuándo es el examen final de cálculo?"
+    assert first.last_asked == datetime(2024, 5, 3)
+
+
+def test_clusters_are_separated_by_subject():
+    clusterer = FallbackClusterer()
+    math = clusterer.add(1, "¿Cuándo es el examen final?", None)
+    physics = clusterer.add(2, "¿Cuándo es el examen final?", None)
+
+    assert math is not physics
+    assert len(clusterer.clusters) == 2
+
+
+def test_empty_questions_are_ignored():
+    clusterer = FallbackClusterer()
+    assert clusterer.add(1, "¿¿??", None) is None
+    assert not clusterer.clusters
+
+
+def test_take_changes_returns_increments_since_last_save():
+    clusterer = FallbackClusterer()
+    cluster = clusterer.add(1, "¿Cuándo es el examen final?", datetime(2024, 5, 1))
+    clusterer.add(1, "cuando es el examen final", datetime(2024, 5, 2))
+
+    rows = clusterer.take_changes()
+    assert [(r[0], r[2], r[3], r[4]) for r in rows] == [(1, 2, datetime(2024, 5, 2), cluster.key)]
+    assert clusterer.take_changes() == []
+
+    clusterer.add(1, "cuando es el examen final", datetime(2024, 5, 4))
+    assert clusterer.take_changes()[0][2] == 1
+
+
+def test_load_continues_saved_clusters():
+    saved = FallbackClusterer()
+    cluster = saved.add(1, "¿Cuándo es el examen final?", None)
+    cursor = FakeCursor([(cluster.key, 1, cluster.question, cluster.signature.tobytes())])
+
+    clusterer = FallbackClusterer()
+    clusterer.load(cursor)
+    assert clusterer.add(1, "cuando es el examen final", None).key == cluster.key
+
+
+def test_save_changes_adds_counts_and_checkpoint_in_one_go():
+    clusterer = FallbackClusterer()
+    clusterer.add(1, "¿Cuándo es el examen final?", datetime(2024, 5, 1))
+    cursor = FakeCursor()
+
+    assert save_changes(cursor, clusterer, 42) == 1
+    (insert, rows), (checkpoint, params) = cursor.executed
+    assert "fallback_count = fallback_count + VALUES(fallback_count)" in insert
+    assert len(rows) == 1
+    assert "batch_job_state" in checkpoint
+    assert params == ("fallback_clusters", 42)
+
+
+def test_subject_matcher_finds_name_or_code():
+    matcher = SubjectMatcher([(1, "Cálculo Diferencial", "MAT101"), (2, "Física", None)])
+
+    assert matcher.match("tengo dudas de calculo diferencial") == 1
+    assert matcher.match("¿Qué entra en el examen de mat101?") == 1
+    assert matcher.match("FÍSICA, ¿cuándo es?") == 2
+    assert matcher.match("¿Dónde está la biblioteca?") is None
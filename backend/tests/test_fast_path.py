@@ -0,0 +1,53 @@
+"""Pruebas de la ruta rápida para intenciones triviales."""
+
+import pytest
+
+from fast_path import FastPathRouter, normalize
+
+
+@pytest.fixture(scope="module")
+def router():
+    return FastPathRouter()
+
+
+def test_normalize_strips_accents_punctuation_and_case():
+    assert normalize("¡Adiós,  Hasta LUEGO!") == "adios hasta luego"
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("hola", "saludo"),
+    ("Buenas tardes, ¿qué tal?", "saludo"),
+    ("Holaaa!", "saludo"),
+    ("muchas gracias", "agradecimiento"),
+    ("adiós, hasta luego", "despedida"),
+])
+def test_trivial_messages_are_answered_locally(router, message, intent):
+    decision = router.classify(message)
+    assert decision is not None
+    assert decision[0] == intent
+
+
+@pytest.mark.parametrize("message", [
+    "hola, quiero saber mis notas",
+    "hola profe",
+    "gracias, ¿y el horario de mañana?",
+    "adiós, mañana tengo examen",
+])
+def test_mixed_intent_messages_go_to_rasa(router, message):
+    assert router.classify(message) is None
+
+
+@pytest.mark.parametrize("message", ["no gracias", "gracias pero no", "nada, gracias"])
+def test_negations_go_to_rasa(router, message):
+    assert router.classify(message) is None
+
+
+def test_long_messages_go_to_rasa(router):
+    assert router.classify("hola hola hola hola hola hola") is None
+
+
+def test_respond_uses_domain_response(router):
+    responses = router.respond("user-1", "hola", trace_id="abc")
+    assert responses and responses[0]["recipient_id"] == "user-1"
+    assert responses[0]["text"] in router.responses["saludo"]
+    assert router.respond("user-1", "hola, quiero saber mis notas") is None
@@ -0,0 +1,158 @@
+"""Pruebas de las peticiones idempotentes."""
+
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+from idempotency import IdempotencyStore, idempotent
+
+
+@pytest.fixture
+def gateway():
+    """Aplicación mínima con un endpoint idempotente que cuenta sus ejecuciones."""
+    store = IdempotencyStore(ttl=60, max_entries=100, wait_timeout=2)
+    state = {"calls": 0, "status": 200, "started": threading.Event(), "release": None}
+    app = Flask(__name__)
+
+    @app.route("/chat", methods=["POST"])
+    @idempotent(store, scope=lambda: str((request.get_json(silent=True) or {}).get("user_id", "")))
+    def chat():
+        state["calls"] += 1
+        state["started"].set()
+        if state["release"] is not None:
+            state["release"].wait(5)
+        if state["status"] == "raise":
+            raise RuntimeError("Rasa no responde")
+        return jsonify([{"text": f"respuesta {state['calls']}"}]), state["status"]
+
+    return app, store, state
+
+
+def post(client, body, key="clave-1"):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post("/chat", json=body, headers=headers)
+
+
+def test_retry_returns_stored_response_without_calling_rasa(gateway):
+    app, store, state = gateway
+    client = app.test_client()
+    first = post(client, {"user_id": "7", "message": "hola"})
+    retry = post(client, {"user_id": "7", "message": "hola"})
+
+    assert state["calls"] == 1
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert store.stats() == {"entries": 1, "replays": 1}
+
+
+def test_request_id_in_body_is_an_idempotency_key(gateway):
+    app, _, state = gateway
+    client = app.test_client()
+    body = {"user_id": "7", "message": "hola", "request_id": "r1"}
+    post(client, body, key=None)
+    post(client, body, key=None)
+    assert state["calls"] == 1
+
+
+def test_requests_without_key_are_not_deduplicated(gateway):
+    app, _, state = gateway
+    client = app.test_client()
+    post(client, {"message": "hola"}, key=None)
+    post(client, {"message": "hola"}, key=None)
+    assert state["calls"] == 2
+
+
+def test_key_reused_with_different_body_is_rejected(gateway):
+    app, _, state = gateway
+    client = app.test_client()
+    post(client, {"user_id": "7", "message": "hola"})
+    response = post(client, {"user_id": "7", "message": "adiós"})
+    assert response.status_code == 422
+    assert state["calls"] == 1
+
+
+def test_keys_are_scoped(gateway):
+    app, _, state = gateway
+    client = app.test_client()
+    post(client, {"user_id": "7", "message": "hola"})
+    response = post(client, {"user_id": "8", "message": "hola"})
+    assert state["calls"] == 2
+    assert "Idempotent-Replayed" not in response.headers
+
+
+@pytest.mark.parametrize("status", [500, 429, "raise"])
+def test_retryable_failures_are_not_stored(gateway, status):
+    app, store, state = gateway
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    client = app.test_client()
+    state["status"] = status
+    post(client, {"user_id": "7", "message": "hola"})
+    state["status"] = 200
+    response = post(client, {"user_id": "7", "message": "hola"})
+
+    assert response.status_code == 200
+    assert state["calls"] == 2
+    assert store.stats()["replays"] == 0
+
+
+def test_concurrent_retry_waits_for_the_original_request(gateway):
+    app, _, state = gateway
+    state["release"] = threading.Event()
+    results = {}
+
+    def original():
+        results["original"] = post(app.test_client(), {"user_id": "7", "message": "hola"}).get_json()
+
+    thread = threading.Thread(target=original)
+    thread.start()
+    state["started"].wait(2)
+    threading.Timer(0.05, state["release"].set).start()
+    retry = post(app.test_client(), {"user_id": "7", "message": "hola"})
+    thread.join()
+
+    assert state["calls"] == 1
+    assert retry.get_json() == results["original"]
+
+
+def test_store_expires_and_bounds_entries():
+    store = IdempotencyStore(ttl=0, max_entries=2)
+    entry, is_new = store.begin("a", "f")
+    store.complete("a", entry, (200, b"{}", {}))
+    # Caducada: la misma clave vuelve a procesarse
+    assert store.begin("a", "f")[1] is True
+
+    store = IdempotencyStore(ttl=60, max_entries=2)
+    for key in "abc":
+        entry, _ = store.begin(key, "f")
+        store.complete(key, entry, (200, b"{}", {}))
+    store.begin("d", "f")
+    assert store.stats()["entries"] == 2
+    assert store.begin("a", "f")[1] is True
+
+
+def test_in_flight_entries_do_not_block_eviction():
+    store = IdempotencyStore(ttl=60, max_entries=3)
+    in_flight, _ = store.begin("lenta", "f")
+    for key in "abcd":
+        entry, _ = store.begin(key, "f")
+        store.complete(key, entry, (200, b"{}", {}))
+        assert store.stats()["entries"] <= 3
+
+    # Se descartan las terminadas más antiguas, no la petición en curso
+    assert store.begin("lenta", "f") == (in_flight, False)
+    assert store.begin("d", "f")[1] is False
+    assert store.begin("b", "f")[1] is True
+
+
+def test_full_store_of_in_flight_requests_does_not_grow():
+    store = IdempotencyStore(ttl=60, max_entries=2)
+    store.begin("a", "f")
+    store.begin("b", "f")
+
+    entry, is_new = store.begin("c", "f")
+    assert is_new
+    assert store.stats()["entries"] == 2
+    # Se procesa sin guardarse: completarla no la añade
+    store.complete("c", entry, (200, b"{}", {}))
+    assert store.begin("c", "f")[1] is True
@@ -0,0 +1,69 @@
+"""Pruebas de los requisitos del despliegue de modelos."""
+
+import pytest
+
+from model_rollout import ModelRollout, RolloutError
+from rasa_router import RasaRouter
+
+
+@pytest.mark.parametrize("urls, standby", [
+    (["http://rasa:5005"], ["http://rasa-standby:5005"]),
+    (["http://rasa-1:5005", "http://rasa-2:5005"], []),
+])
+def test_multiple_replicas_require_shared_tracker_cache(urls, standby):
+    with pytest.raises(RolloutError):
+        ModelRollout(RasaRouter(urls), standby_urls=standby, tracker_cache_backend="local")
+    assert ModelRollout(RasaRouter(urls), standby_urls=standby, tracker_cache_backend="redis")
+
+
+def test_single_replica_can_use_local_tracker_cache():
+    rollout = ModelRollout(RasaRouter(["http://rasa:5005"]), standby_urls=[], tracker_cache_backend="local")
+    assert rollout.standby_urls == []
+
+
+@pytest.mark.parametrize("active", [None, {"model_id": 3, "model_file": "models/20240101-nlu.tar.gz"}])
+def test_startup_reports_served_model_with_or_without_active_row(monkeypatch, active):
+    switches = []
+    monkeypatch.setattr("model_rollout.fetch_active_model", lambda: active)
+    monkeypatch.setattr("model_rollout.served_model_path", lambda url: "/app/models/20240101-nlu.tar.gz")
+    rollout = ModelRollout(RasaRouter(["http://rasa:5005"]), standby_urls=[],
+                           on_switch=lambda urls, model_file: switches.append((urls, model_file)),
+                           tracker_cache_backend="local")
+
+    rollout.sync()
+    rollout.sync()
+
+    assert switches == [(["http://rasa:5005"], "/app/models/20240101-nlu.tar.gz")]
+    assert rollout.current == active
+
+
+def test_startup_ignores_replicas_serving_different_models(monkeypatch):
+    switches = []
+    models = {"http://rasa-1:5005": "models/a.tar.gz", "http://rasa-2:5005": "models/b.tar.gz"}
+    monkeypatch.setattr("model_rollout.fetch_active_model", lambda: None)
+    monkeypatch.setattr("model_rollout.served_model_path", models.get)
+    rollout = ModelRollout(RasaRouter(list(models)), standby_urls=[],
+                           on_switch=lambda urls, model_file: switches.append(model_file),
+                           tracker_cache_backend="redis")
+
+    rollout.sync()
+
+    assert switches == []
+
+
+def test_sync_reads_active_model_while_holding_the_lock(monkeypatch):
+    rollout = ModelRollout(RasaRouter(["http://rasa:5005"]), standby_urls=[], tracker_cache_backend="local")
+    rollout.current = {"model_id": 3, "model_file": "models/20240101-nlu.tar.gz"}
+    locked = []
+
+    def fetch_active_model():
+        locked.append(rollout._lock.locked())
+        # Una vuelta atrás que llega mientras se lee el modelo activo no se intercala
+        with pytest.raises(RolloutError):
+            rollout.rollback()
+        return rollout.current
+
+    monkeypatch.setattr("model_rollout.fetch_active_model", fetch_active_model)
+    rollout.sync()
+
+    assert locked == [True]
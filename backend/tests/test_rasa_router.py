@@ -0,0 +1,111 @@
+"""Pruebas del enrutado entre réplicas de Rasa."""
+
+import pytest
+import requests
+
+from rasa_router import RasaRouter
+
+URLS = ["http://rasa-1:5005", "http://rasa-2:5005", "http://rasa-3:5005"]
+USERS = [f"usuario-{i}" for i in range(300)]
+
+
+@pytest.fixture
+def router():
+    return RasaRouter(URLS, vnodes=50, max_outstanding=2)
+
+
+def test_users_stick_to_one_replica_and_load_is_spread(router):
+    owners = {user: router.owner(user) for user in USERS}
+    assert all(router.owner(user) == url for user, url in owners.items())
+    counts = {url: list(owners.values()).count(url) for url in URLS}
+    assert min(counts.values()) > len(USERS) / len(URLS) / 2
+
+
+def test_removing_a_replica_only_moves_its_users(router):
+    before = {user: router.owner(user) for user in USERS}
+    router.set_replicas(URLS[:2])
+    after = {user: router.owner(user) for user in USERS}
+
+    moved = [user for user in USERS if before[user] != after[user]]
+    assert moved
+    assert all(before[user] == URLS[2] for user in moved)
+
+
+def test_unhealthy_replica_users_go_to_the_next_healthy_one(router):
+    user = next(u for u in USERS if router.owner(u) == URLS[0])
+    router.mark(URLS[0], False)
+    assert router.owner(user) != URLS[0]
+    assert router.owner(user, healthy_only=False) == URLS[0]
+
+    router.mark(URLS[0], True)
+    assert router.owner(user) == URLS[0]
+
+
+def test_no_healthy_replica_falls_back_to_the_owner(router):
+    for url in URLS:
+        router.mark(url, False)
+    with pytest.raises(RuntimeError):
+        router.check_any()
+    assert router.owner("usuario-1") == router.owner("usuario-1", healthy_only=False)
+
+
+def test_saturated_replica_spills_over_to_the_least_busy(router):
+    user = USERS[0]
+    owner = router.owner(user)
+    assert [router.choose(user) for _ in range(2)] == [owner, owner]
+
+    spilled = router.choose(user)
+    assert spilled != owner
+    assert router.spillovers == 1
+    assert router.stats()["replicas"][spilled]["outstanding"] == 1
+
+
+def test_all_saturated_keeps_the_owner(router):
+    for url in URLS:
+        for _ in range(2):
+            router._replicas[url].outstanding += 1
+    assert router.choose(USERS[0]) == router.owner(USERS[0])
+    assert router.spillovers == 0
+
+
+def test_request_releases_and_marks_connection_errors(router):
+    user = USERS[0]
+    with router.request(user) as url:
+        assert router.outstanding([url]) == 1
+    assert router.outstanding([url]) == 0
+
+    with pytest.raises(requests.ConnectionError):
+        with router.request(user) as url:
+            raise requests.ConnectionError("conexión rechazada")
+    assert router.stats()["replicas"][url] == {"healthy": False, "outstanding": 0, "requests": 2, "failures": 1}
+
+    # Otros errores no marcan la réplica como caída
+    router.mark(url, True)
+    with pytest.raises(ValueError):
+        with router.request(user):
+            raise ValueError("respuesta inválida")
+    assert router.stats()["replicas"][url]["healthy"] is True
+
+
+def test_removed_replica_drains_in_flight_requests(router):
+    user = next(u for u in USERS if router.owner(u) == URLS[2])
+    url = router.choose(user)
+    router.set_replicas(URLS[:2])
+
+    assert router.stats()["draining"] == {url: 1}
+    assert router.wait_drained([url], timeout=0.05) is False
+    assert router.choose(user) != url
+    router.release(url)
+    assert router.wait_drained([url], timeout=0.05) is True
+    assert router.stats()["draining"] == {}
+
+
+def test_replica_check_updates_health(router):
+    def failing():
+        raise requests.ConnectionError("sin respuesta")
+
+    with pytest.raises(requests.ConnectionError):
+        router.replica_check(URLS[1], failing)()
+    assert router.stats()["replicas"][URLS[1]]["healthy"] is False
+    assert router.replica_check(URLS[1], lambda: {"status": "ok"})() == {"status": "ok"}
+    assert router.stats()["replicas"][URLS[1]]["healthy"] is True
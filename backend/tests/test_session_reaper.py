@@ -0,0 +1,97 @@
+"""Pruebas del cierre de conversaciones inactivas y el recálculo de métricas."""
+
+from datetime import date, datetime
+
+import session_reaper
+
+NOW = datetime(2024, 3, 5, 12, 0)
+
+
+class FakeCursor:
+    """Cursor que responde a cada consulta del reaper según su texto."""
+
+    def __init__(self, idle=(), ended=(), checkpoint=None):
+        self.idle = list(idle)
+        self.ended = list(ended)
+        self.checkpoint = checkpoint
+        self.executed = []
+        self.procedures = []
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        if "SELECT NOW()" in query:
+            self._result = [(NOW,)]
+        elif "FROM batch_job_state" in query:
+            self._result = [(self.checkpoint,)] if self.checkpoint else []
+        elif "INSERT INTO batch_job_state" in query:
+            self.checkpoint = params[1]
+        elif "SELECT id, DATE(started_at)" in query:
+            self._result, self.idle = self.idle, []
+        elif "UPDATE conversations" in query:
+            return len(params) - 1
+        elif "SELECT DISTINCT DATE(started_at)" in query:
+            self._result = self.ended
+        return 0
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def callproc(self, name, args):
+        self.procedures.append((name, args))
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def run_reap(monkeypatch, cursor):
+    monkeypatch.setattr(session_reaper, "get_connection", lambda **kwargs: FakeConnection(cursor))
+    return session_reaper.reap(idle_minutes=30, batch_size=10)
+
+
+def test_reap_recalculates_dates_of_conversations_ended_elsewhere(monkeypatch):
+    cursor = FakeCursor(
+        idle=[(1, date(2024, 3, 4))],
+        ended=[(date(2024, 3, 1),), (date(2024, 3, 4),)],
+        checkpoint=datetime(2024, 3, 5, 11, 55),
+    )
+
+    closed, dates = run_reap(monkeypatch, cursor)
+
+    assert closed == 1
+    assert dates == [date(2024, 3, 1), date(2024, 3, 4)]
+    assert [args for _, args in cursor.procedures] == [(date(2024, 3, 1),), (date(2024, 3, 4),)]
+    window = next(params for query, params in cursor.executed if "ended_at >" in query)
+    assert window == (datetime(2024, 3, 5, 11, 55), session_reaper.CHECKPOINT_OVERLAP_SECONDS, NOW)
+    assert cursor.checkpoint == NOW
+
+
+def test_first_run_covers_every_ended_conversation(monkeypatch):
+    cursor = FakeCursor(ended=[(date(2024, 2, 28),)])
+
+    closed, dates = run_reap(monkeypatch, cursor)
+
+    assert closed == 0
+    assert dates == [date(2024, 2, 28)]
+    assert any("WHERE ended_at <= %s" in query for query, _ in cursor.executed)
+    assert cursor.checkpoint == NOW
@@ -0,0 +1,74 @@
+"""Pruebas del chat en streaming: tokens de sesión y caducidad de sesiones."""
+
+import time
+
+import pytest
+from flask import Flask
+
+import streaming
+from auth import AuthError, current_user, issue_token
+from streaming import SessionStreams, new_stream_session, verify_stream_token
+
+SECRET = "secreto-de-pruebas"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr("auth.JWT_SECRET", SECRET)
+
+
+def test_stream_token_only_opens_its_own_session():
+    session_id, token = new_stream_session("7")
+    other_session, _ = new_stream_session("8")
+
+    assert verify_stream_token(token, session_id) == "7"
+    with pytest.raises(AuthError):
+        verify_stream_token(token, other_session)
+    with pytest.raises(AuthError):
+        verify_stream_token(None, session_id)
+
+
+def test_login_token_does_not_open_streams():
+    session_id, _ = new_stream_session("7")
+    with pytest.raises(AuthError):
+        verify_stream_token(issue_token("7"), session_id)
+
+
+def test_stream_token_is_not_a_login_token():
+    _, token = new_stream_session("7")
+    app = Flask(__name__)
+    with app.test_request_context(headers={"Authorization": f"Bearer {token}"}):
+        assert current_user() is None
+    with app.test_request_context(headers={"Authorization": f"Bearer {issue_token('7')}"}):
+        assert current_user() == {"id": "7", "role": None}
+
+
+def test_reconnection_replays_missed_events():
+    streams = SessionStreams(idle_ttl=60)
+    streams.publish("s", "message", {"text": "uno"})
+    second = streams.publish("s", "message", {"text": "dos"})
+
+    subscriber = streams.subscribe("s", last_event_id=second - 1)
+    assert subscriber.queue.qsize() == 1
+    assert '"dos"' in subscriber.queue.get_nowait()
+
+
+def test_idle_sessions_expire_without_new_subscriptions():
+    streams = SessionStreams(idle_ttl=0.05, expire_interval=0.02)
+    streams.publish("abandonada", "message", {"text": "hola"})
+    subscriber = streams.subscribe("activa")
+
+    deadline = time.monotonic() + 2
+    while "abandonada" in streams._sessions and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "abandonada" not in streams._sessions
+    # Las sesiones con conexiones abiertas no caducan
+    assert streams.subscriber_count("activa") == 1
+    streams.unsubscribe("activa", subscriber)
+
+
+def test_stream_token_lifetime_is_configurable(monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_TOKEN_TTL", -1)
+    session_id, token = new_stream_session("7")
+    with pytest.raises(AuthError):
+        verify_stream_token(token, session_id)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Trazas distribuidas ligeras para la pasarela de EduAssistAI.
+
+Genera identificadores de traza por petición, registra spans en un colector
+en proceso que los vuelca a un archivo JSONL local y ofrece una CLI para
+mostrar las trazas más lentas. No depende de ningún servicio externo.
+
+Ejecutar la CLI con: python tracing.py --slowest 10 traces.jsonl actions_traces.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Configuración
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "gateway")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id():
+    """Genera un identificador de traza de 32 caracteres hexadecimales."""
+    return uuid.uuid4().hex
+
+
+def new_span_id():
+    """Genera un identificador de span de 16 caracteres hexadecimales."""
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """Unidad de trabajo medida dentro de una traza."""
+
+    def __init__(self, name, trace_id, parent_id=None, service=SERVICE_NAME, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.service = service
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration_ms = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)
+
+    def end(self):
+        self.duration_ms = (time.perf_counter() - self._start_perf) * 1000
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.service,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class JsonLinesWriter:
+    """Colector en proceso que escribe registros JSONL en segundo plano."""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, record):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Nunca bloquear la petición por culpa de la escritura
+            self.dropped += 1
+
+    def export(self, span):
+        self.write(span.to_dict())
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in batch:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            except OSError:
+                self.dropped += len(batch)
+
+
+collector = JsonLinesWriter(TRACE_FILE)
+
+
+@contextmanager
+def start_span(name, trace_id=None, parent_id=None, **attributes):
+    """
+    Abre un span hijo del span actual (o raíz si no hay ninguno).
+
+    Args:
+        name: Nombre de la operación
+        trace_id: Identificador de traza explícito (por defecto el del span actual)
+        parent_id: Identificador del span padre explícito
+        attributes: Atributos adicionales del span
+    """
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_trace_id()
+    if parent_id is None and parent is not None:
+        parent_id = parent.span_id
+
+    span = Span(name, trace_id, parent_id, attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_error(e)
+        raise
+    finally:
+        span.end()
+        _current_span.reset(token)
+        if TRACING_ENABLED:
+            collector.export(span)
+
+
+def current_span():
+    """Devuelve el span activo en el contexto actual, si existe."""
+    return _current_span.get()
+
+
+def trace_metadata():
+    """Devuelve el contexto de traza a propagar como metadata hacia Rasa."""
+    span = _current_span.get()
+    if span is None:
+        return {}
+    return {"trace_id": span.trace_id, "parent_span_id": span.span_id}
+
+
+# ---------------------------------------------------------------------------
+# CLI para visualizar las trazas más lentas
+# ---------------------------------------------------------------------------
+
+def load_traces(paths):
+    """Agrupa los spans de uno o varios archivos JSONL por traza."""
+    traces = defaultdict(list)
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"⚠️ Archivo de trazas no encontrado: {path}")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def trace_duration(spans):
+    """Duración total de la traza en milisegundos."""
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["duration_ms"] / 1000 for s in spans)
+    return (end - start) * 1000
+
+
+def render_trace(trace_id, spans):
+    """Dibuja el árbol de spans de una traza con su tiempo propio."""
+    children = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    roots = []
+    for span in sorted(spans, key=lambda s: s["start"]):
+        if span["parent_id"] and span["parent_id"] in ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+
+    lines = [f"Traza {trace_id} — {trace_duration(spans):.1f} ms"]
+
+    def walk(span, depth):
+        child_time = sum(c["duration_ms"] for c in children[span["span_id"]])
+        self_time = max(span["duration_ms"] - child_time, 0.0)
+        marker = " ❌" if span["status"] == "error" else ""
+        lines.append(
+            f"{'  ' * (depth + 1)}[{span['service']}] {span['name']}: "
+            f"{span['duration_ms']:.1f} ms (propio {self_time:.1f} ms){marker}"
+        )
+        for child in children[span["span_id"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra las trazas más lentas registradas")
+    parser.add_argument("files", nargs="*", default=[TRACE_FILE], help="Archivos JSONL de spans")
+    parser.add_argument("--slowest", type=int, default=10, help="Número de trazas a mostrar")
+    args = parser.parse_args()
+
+    traces = load_traces(args.files)
+    if not traces:
+        print("No se encontraron trazas.")
+        return
+
+    ranked = sorted(traces.items(), key=lambda item: trace_duration(item[1]), reverse=True)
+    for trace_id, spans in ranked[:args.slowest]:
+        print(render_trace(trace_id, spans))
+        print()
+
+
+if __name__ == "__main__":
+    main()
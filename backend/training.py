@@ -0,0 +1,354 @@
+"""
+Gestor de trabajos de entrenamiento de Rasa.
+
+Los entrenamientos se ejecutan de uno en uno en un hilo en segundo plano.
+Las peticiones que llegan mientras ya hay un trabajo en cola se agrupan en
+ese mismo trabajo, y cada trabajo expone su estado y un progreso estimado.
+Los modelos resultantes se registran en la tabla `trained_models`.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import requests
+import yaml
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+RASA_PROJECT_DIR = os.environ.get(
+    "RASA_PROJECT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rasa")
+)
+TRAINING_TIMEOUT = float(os.environ.get("TRAINING_TIMEOUT", "3600"))
+TRAINING_DEFAULT_DURATION = float(os.environ.get("TRAINING_DEFAULT_DURATION", "600"))
+TRAINING_JOBS_HISTORY = int(os.environ.get("TRAINING_JOBS_HISTORY", "50"))
+# Datos NLU con los que se evalúa cada modelo nuevo (por defecto, los de entrenamiento)
+TRAINING_EVAL_DATA = os.environ.get("TRAINING_EVAL_DATA", "")
+TRAINING_EVAL_TIMEOUT = float(os.environ.get("TRAINING_EVAL_TIMEOUT", "600"))
+
+# Claves de los archivos de datos que se concatenan en lugar de sobrescribirse
+LIST_KEYS = ("nlu", "stories", "rules", "pipeline", "policies")
+
+
+class TrainingJob:
+    """Estado de un trabajo de entrenamiento."""
+
+    def __init__(self, requested_by):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "queued"
+        self.phase = "queued"
+        self.progress = 0.0
+        self.requested_by = requested_by
+        self.requests = 1
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.model_file = None
+        self.model_id = None
+        self.metrics = {}
+        self.error = None
+
+    def to_dict(self):
+        timestamp = lambda t: datetime.fromtimestamp(t).isoformat() if t else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "progress": round(self.progress, 3),
+            "requested_by": self.requested_by,
+            "requests": self.requests,
+            "created_at": timestamp(self.created_at),
+            "started_at": timestamp(self.started_at),
+            "finished_at": timestamp(self.finished_at),
+            "model_file": self.model_file,
+            "model_id": self.model_id,
+            "metrics": self.metrics,
+            "error": self.error,
+        }
+
+
+def build_training_payload(project_dir=RASA_PROJECT_DIR):
+    """
+    Combina config, dominio y datos del proyecto Rasa en un único YAML,
+    que es el formato que acepta `POST /model/train`.
+    """
+    files = [os.path.join(project_dir, "config.yml"), os.path.join(project_dir, "domain.yml")]
+    files += sorted(glob.glob(os.path.join(project_dir, "data", "*.yml")))
+
+    combined = {}
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            content = yaml.safe_load(f) or {}
+        for key, value in content.items():
+            if key in LIST_KEYS and isinstance(value, list):
+                combined.setdefault(key, []).extend(value)
+            elif isinstance(value, dict) and isinstance(combined.get(key), dict):
+                combined[key].update(value)
+            else:
+                combined[key] = value
+    return yaml.safe_dump(combined, allow_unicode=True, sort_keys=False)
+
+
+def evaluation_data_path(project_dir=RASA_PROJECT_DIR):
+    """Archivo NLU para evaluar los modelos: TRAINING_EVAL_DATA o el nlu.yml del proyecto."""
+    return TRAINING_EVAL_DATA or os.path.join(project_dir, "data", "nlu.yml")
+
+
+def summarize_evaluation(result, worst=5):
+    """
+    Resume la respuesta de `POST /model/test/intents` en las métricas de
+    calidad que se guardan con el modelo: exactitud, F1 y precisión de las
+    intenciones, F1 por extractor de entidades y las intenciones con peor F1.
+    """
+    summary = {}
+    intents = result.get("intent_evaluation") or {}
+    for key in ("accuracy", "f1_score", "precision"):
+        if intents.get(key) is not None:
+            summary[f"intent_{key}"] = round(float(intents[key]), 4)
+
+    report = intents.get("report")
+    if isinstance(report, dict):
+        per_intent = [(name, values.get("f1-score")) for name, values in report.items()
+                      if isinstance(values, dict) and "support" in values
+                      and name not in ("micro avg", "macro avg", "weighted avg")]
+        per_intent = [(name, f1) for name, f1 in per_intent if f1 is not None]
+        summary["intent_worst_f1"] = {name: round(float(f1), 4)
+                                      for name, f1 in sorted(per_intent, key=lambda item: item[1])[:worst]}
+
+    entities = {}
+    for extractor, values in (result.get("entity_evaluation") or {}).items():
+        if isinstance(values, dict) and values.get("f1_score") is not None:
+            entities[extractor] = round(float(values["f1_score"]), 4)
+    if entities:
+        summary["entity_f1_score"] = entities
+    return summary
+
+
+class TrainingJobManager:
+    """Cola de entrenamientos con un único trabajo activo a la vez."""
+
+    def __init__(self, rasa_url):
+        self.rasa_url = rasa_url
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = deque()
+        self._jobs = OrderedDict()
+        self._active = None
+        self._last_duration = TRAINING_DEFAULT_DURATION
+        self._last_trained = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="training-worker", daemon=True)
+            self._thread.start()
+
+    def submit(self, requested_by):
+        """
+        Encola un entrenamiento o se une al que ya está en cola.
+
+        Returns:
+            Una tupla (trabajo, agrupado) donde `agrupado` indica si la petición
+            se unió a un trabajo existente.
+        """
+        self.start()
+        with self._lock:
+            # Un trabajo en cola todavía no ha leído los datos, así que
+            # cualquier petición nueva obtendría el mismo modelo.
+            if self._queue:
+                job = self._queue[-1]
+                job.requests += 1
+                return job, True
+
+            job = TrainingJob(requested_by)
+            self._queue.append(job)
+            self._jobs[job.id] = job
+            while len(self._jobs) > TRAINING_JOBS_HISTORY:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.status in ("queued", "running"):
+                    break
+                del self._jobs[oldest_id]
+            self._wakeup.notify()
+            return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == "running":
+                self._update_progress(job)
+            return job
+
+    def list_jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _update_progress(self, job):
+        # Rasa no informa del progreso; se estima con la duración del último entrenamiento
+        if job.phase == "training":
+            elapsed = time.time() - job.metrics.get("training_started_at", job.started_at)
+            job.progress = min(0.1 + 0.85 * elapsed / max(self._last_duration, 1.0), 0.95)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                job = self._queue.popleft()
+                self._active = job
+                job.status = "running"
+                job.started_at = time.time()
+            try:
+                self._execute(job)
+                job.status = "succeeded"
+                job.progress = 1.0
+                job.phase = "done"
+            except Exception as e:
+                logger.error("Error en el trabajo de entrenamiento %s: %s", job.id, e)
+                job.status = "failed"
+                job.phase = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._active = None
+
+    def _execute(self, job):
+        job.phase = "preparing"
+        payload = build_training_payload()
+        payload_fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        job.progress = 0.1
+
+        # Si los datos no cambiaron desde el último entrenamiento se reutiliza el modelo
+        last = self._last_trained
+        if last is not None and last["fingerprint"] == payload_fingerprint:
+            job.model_file = last["model_file"]
+            job.model_id = last["model_id"]
+            job.metrics.update({
+                "skipped": True,
+                "reason": "training data unchanged",
+                "time_saved_seconds": round(self._last_duration, 2),
+                "job_id": job.id,
+            })
+            logger.info("Entrenamiento %s omitido: los datos no cambiaron", job.id)
+            return
+
+        job.phase = "training"
+        job.metrics["training_started_at"] = time.time()
+        response = requests.post(
+            f"{self.rasa_url}/model/train",
+            data=payload.encode("utf-8"),
+            headers={"Content-Type": "application/yaml"},
+            params={"save_to_default_model_directory": "true"},
+            timeout=TRAINING_TIMEOUT
+        )
+        if not response.ok:
+            raise RuntimeError(f"Rasa training error: {response.status_code}")
+
+        training_seconds = time.time() - job.metrics.pop("training_started_at")
+        self._last_duration = training_seconds
+        filename = response.headers.get("filename")
+        if not filename:
+            raise RuntimeError("Rasa no devolvió el nombre del modelo entrenado")
+        job.model_file = f"models/{filename}"
+        job.metrics.update({
+            "training_seconds": round(training_seconds, 2),
+            "model_size_bytes": len(response.content),
+            "fingerprint": payload_fingerprint,
+            "job_id": job.id,
+        })
+
+        job.phase = "evaluating"
+        job.progress = 0.95
+        self._evaluate(job)
+
+        job.phase = "recording"
+        job.progress = 0.97
+        job.model_id = record_trained_model(job)
+        self._last_trained = {
+            "fingerprint": payload_fingerprint,
+            "model_file": job.model_file,
+            "model_id": job.model_id,
+        }
+        logger.info("Modelo %s registrado con id %s", job.model_file, job.model_id)
+
+    def _evaluate(self, job):
+        """
+        Evalúa el modelo nuevo con los datos NLU de evaluación y añade las
+        métricas de calidad. Un fallo de la evaluación no invalida el modelo:
+        se registra el error en las métricas.
+        """
+        path = evaluation_data_path()
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            start = time.time()
+            response = requests.post(
+                f"{self.rasa_url}/model/test/intents",
+                data=data,
+                headers={"Content-Type": "application/x-yaml"},
+                params={"model": job.model_file},
+                timeout=TRAINING_EVAL_TIMEOUT
+            )
+            if not response.ok:
+                raise RuntimeError(f"Rasa evaluation error: {response.status_code}")
+            job.metrics.update(summarize_evaluation(response.json()))
+            job.metrics["evaluation_data"] = os.path.basename(path)
+            job.metrics["evaluation_seconds"] = round(time.time() - start, 2)
+        except (OSError, ValueError, RuntimeError, requests.RequestException) as e:
+            logger.warning("No se pudo evaluar el modelo %s: %s", job.model_file, e)
+            job.metrics["evaluation_error"] = str(e)
+
+    def activate(self, job_id):
+        """Marca como activo en `trained_models` el modelo de un trabajo terminado."""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.status != "succeeded":
+            raise ValueError(f"El trabajo {job_id} no ha terminado correctamente")
+        set_active_model(job.model_id)
+        return job
+
+
+def record_trained_model(job):
+    """Inserta el modelo entrenado en `trained_models` y devuelve su id."""
+    version = os.path.splitext(os.path.basename(job.model_file))[0].replace(".tar", "")
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO trained_models (version, file_path, trained_by, performance_metrics, is_active)
+                VALUES (%s, %s, %s, %s, FALSE)
+                """,
+                (version, job.model_file, job.requested_by, json.dumps(job.metrics))
+            )
+            model_id = cursor.lastrowid
+        connection.commit()
+        return model_id
+    finally:
+        connection.close()
+
+
+def set_active_model(model_id):
+    """
+    Marca el modelo como el único activo en `trained_models`. El controlador
+    de despliegue (`model_rollout.py`) detecta el cambio y lo carga en Rasa
+    sin cortar el chat.
+    """
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE trained_models SET is_active = (id = %s)", (model_id,))
+        connection.commit()
+    finally:
+        connection.close()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escalado del servidor de acciones con varios trabajadores.
+
+Arranca `rasa_assistant/start_action_server.py` con distinto número de
+trabajadores y envía peticiones concurrentes a /webhook para una acción que
+usa el analizador de sentimiento, midiendo el rendimiento de cada caso.
+Ejecutar con: python benchmarks/bench_action_workers.py --workers 1,2,4,8 --requests 4000
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "rasa_assistant", "start_action_server.py")
+
+MESSAGES = [
+    "estoy muy preocupado por el examen de matemáticas",
+    "gracias, me siento mucho mejor ahora",
+    "no entiendo nada y estoy frustrado con la inscripción",
+    "¿dónde está la biblioteca?",
+]
+
+
+def webhook_payload(action, text, i):
+    return {
+        "next_action": action,
+        "sender_id": f"bench_{i}",
+        "tracker": {
+            "sender_id": f"bench_{i}",
+            "slots": {},
+            "latest_message": {"text": text, "intent": {"name": "expresar_emocion", "confidence": 0.9},
+                               "entities": []},
+            "events": [],
+            "paused": False,
+            "followup_action": None,
+            "active_loop": {},
+            "latest_action_name": "action_listen",
+        },
+        "domain": {},
+        "version": "3.6.0",
+    }
+
+
+def wait_until_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run_load(url, action, total, concurrency):
+    errors = [0]
+    lock = threading.Lock()
+    per_client = total // concurrency
+
+    def client(offset):
+        session = requests.Session()
+        for i in range(per_client):
+            n = offset * per_client + i
+            response = session.post(f"{url}/webhook", json=webhook_payload(action, MESSAGES[n % len(MESSAGES)], n),
+                                    timeout=30)
+            if not response.ok:
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return per_client * concurrency / (time.perf_counter() - start), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de trabajadores del servidor de acciones")
+    parser.add_argument("--workers", default="1,2,4", help="Números de trabajadores a probar")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=5155)
+    parser.add_argument("--action", default="action_detect_and_respond_to_emotion")
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        # Con un solo trabajador se usa `rasa run actions`, la referencia actual
+        process = subprocess.Popen([sys.executable, SERVER, "--port", str(args.port), "--workers", str(workers)],
+                                   stdout=subprocess.DEVNULL, start_new_session=True)
+        try:
+            if not wait_until_ready(url):
+                print(f"❌ El servidor con {workers} trabajadores no arrancó")
+                continue
+            run_load(url, args.action, args.concurrency * 5, args.concurrency)  # calentamiento
+            throughput, errors = run_load(url, args.action, args.requests, args.concurrency)
+            baseline = baseline or throughput
+            print(f"{workers:>3} trabajadores: {throughput:8.1f} peticiones/s  "
+                  f"(x{throughput / baseline:.2f})  errores={errors}")
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks de las acciones personalizadas.
+
+Ejecuta directamente `run()` de cada acción de `rasa/actions/actions.py` y de
+`rasa_assistant/actions/actions.py` con trackers sintéticos (mensajes de los
+datos NLU de cada proyecto) y un `CollectingDispatcher`, y mide por acción:
+
+- distribución de latencia (p50, p90, p99, máximo) y rendimiento,
+- memoria asignada por ejecución (pico y retenida, con tracemalloc).
+
+La base de datos se simula por defecto (`--db mock`, con latencia opcional);
+con `--db local` las acciones usan la base configurada en DB_HOST y demás.
+Los resultados se guardan en benchmarks/results/actions-<commit>.json y se
+pueden comparar con los de otro commit.
+
+Ejecutar con:
+    python benchmarks/bench_actions.py --iterations 2000
+    python benchmarks/bench_actions.py --compare benchmarks/results/actions-abc1234.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Las trazas de las acciones no deben ensuciar el directorio de trabajo
+os.environ.setdefault("ACTIONS_TRACE_FILE", os.path.join(tempfile.gettempdir(), "bench_actions_traces.jsonl"))
+
+from fast_path import load_nlu_examples  # noqa: E402
+
+ACTION_PACKAGES = {
+    "rasa": os.path.join(ROOT, "rasa", "actions"),
+    "rasa_assistant": os.path.join(ROOT, "rasa_assistant", "actions"),
+}
+
+
+class FakeCursor:
+    """Cursor aiomysql simulado con respuestas fijas según la tabla consultada.
+
+    Con `blocking=True` la latencia se simula con time.sleep, bloqueando el
+    bucle de eventos como lo hacía el conector síncrono anterior.
+    """
+
+    def __init__(self, latency_ms, dictionary=False, blocking=False):
+        self.latency_ms = latency_ms
+        self.dictionary = dictionary
+        self.blocking = blocking
+        self.lastrowid = 0
+        self._row = None
+
+    async def _wait(self):
+        if not self.latency_ms:
+            return
+        if self.blocking:
+            time.sleep(self.latency_ms / 1000)
+        else:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    async def execute(self, query, params=None):
+        await self._wait()
+        self.lastrowid += 1
+        if "knowledge_base" in query:
+            answer = "Las inscripciones están abiertas hasta el viernes."
+            self._row = {"answer": answer} if self.dictionary else (answer,)
+        elif query.lstrip().upper().startswith("SELECT"):
+            self._row = {"id": 1} if self.dictionary else (1,)
+        else:
+            self._row = None
+        return 1
+
+    async def executemany(self, query, rows):
+        await self._wait()
+        self.lastrowid += len(rows)
+        return len(rows)
+
+    async def fetchone(self):
+        return self._row
+
+    async def fetchall(self):
+        return [self._row] if self._row else []
+
+    async def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, latency_ms, blocking=False):
+        self.latency_ms = latency_ms
+        self.blocking = blocking
+
+    async def cursor(self, cursor_class=None):
+        dictionary = cursor_class is not None and "Dict" in cursor_class.__name__
+        return FakeCursor(self.latency_ms, dictionary, self.blocking)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """Pool simulado con la interfaz de aiomysql.Pool que usan las acciones."""
+
+    def __init__(self, latency_ms, blocking=False):
+        self.latency_ms = latency_ms
+        self.blocking = blocking
+
+    async def acquire(self):
+        return FakeConnection(self.latency_ms, self.blocking)
+
+    def release(self, connection):
+        pass
+
+
+def install_db_mock(package, latency_ms, blocking=False):
+    """Sustituye el pool de conexiones del paquete de acciones por uno simulado."""
+    db = sys.modules.get(f"{package.__name__}.db")
+    if db is None:
+        # El paquete no usa base de datos
+        return
+    pool = FakePool(latency_ms, blocking)
+
+    async def get_pool():
+        return pool
+
+    db.get_pool = get_pool
+
+
+def load_actions(project, path):
+    """Importa el paquete de acciones de un proyecto y devuelve sus clases de acción."""
+    from rasa_sdk import Action
+
+    package_name = f"bench_{project}_actions"
+    spec = importlib.util.spec_from_file_location(package_name, os.path.join(path, "__init__.py"),
+                                                  submodule_search_locations=[path])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[package_name] = package
+    spec.loader.exec_module(package)
+    module = importlib.import_module(f"{package_name}.actions")
+    actions = [
+        obj for obj in vars(module).values()
+        if inspect.isclass(obj) and issubclass(obj, Action) and obj.__module__ == module.__name__
+    ]
+    return package, actions
+
+
+def build_tracker(examples, history, rng):
+    """Tracker sintético con un mensaje real de los datos NLU y un historial de eventos."""
+    from rasa_sdk import Tracker
+
+    intent, text = rng.choice(examples)
+    latest_message = {
+        "text": text,
+        "intent": {"name": intent, "confidence": round(rng.uniform(0.5, 1.0), 3)},
+        "entities": [
+            {"entity": "curso", "value": "matemáticas", "confidence": 0.92},
+            {"entity": "rating", "value": str(rng.randint(1, 5)), "confidence": 0.99},
+        ],
+        "metadata": {},
+    }
+    events = []
+    for i in range(history):
+        _, past = rng.choice(examples)
+        events.append({"event": "user", "timestamp": i, "text": past,
+                       "parse_data": {"intent": {"name": intent, "confidence": 0.9}, "entities": []}})
+        events.append({"event": "bot", "timestamp": i + 0.5, "text": "Respuesta"})
+    return Tracker.from_dict({
+        "sender_id": f"bench_{rng.randint(1, 1000)}",
+        "slots": {"last_message_id": 1, "user_name": "Ana", "curso": "matemáticas"},
+        "latest_message": latest_message,
+        "events": events,
+        "paused": False,
+        "followup_action": None,
+        "active_loop": {},
+        "latest_action_name": "action_listen",
+    })
+
+
+def invoke(action, tracker, loop):
+    """Ejecuta run() de la acción, esperando el resultado si es una corrutina."""
+    from rasa_sdk.executor import CollectingDispatcher
+
+    result = action.run(CollectingDispatcher(), tracker, {})
+    if inspect.isawaitable(result):
+        result = loop.run_until_complete(result)
+    return result
+
+
+def bench_action(action, trackers, iterations, warmup, alloc_iterations, loop):
+    for i in range(warmup):
+        invoke(action, trackers[i % len(trackers)], loop)
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter_ns()
+        invoke(action, trackers[i % len(trackers)], loop)
+        latencies.append((time.perf_counter_ns() - call_start) / 1e6)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    # La medición de memoria va aparte porque tracemalloc ralentiza la ejecución
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    for i in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        invoke(action, trackers[i % len(trackers)], loop)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+    tracemalloc.stop()
+
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    return {
+        "iterations": iterations,
+        "throughput_per_s": round(iterations / elapsed, 1),
+        "mean_ms": round(statistics.mean(latencies), 4),
+        "p50_ms": round(p(0.5), 4),
+        "p90_ms": round(p(0.9), 4),
+        "p99_ms": round(p(0.99), 4),
+        "max_ms": round(latencies[-1], 4),
+        "alloc_peak_kb": round(statistics.mean(peaks) / 1024, 2) if peaks else None,
+        "alloc_retained_bytes": round(statistics.mean(retained), 1) if retained else None,
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=ROOT) != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline_path, threshold):
+    """Muestra la variación frente a otra ejecución y devuelve las regresiones."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nComparación con {baseline['commit']} ({os.path.basename(baseline_path)})")
+    print(f"{'acción':<55} {'p50 antes':>10} {'p50 ahora':>10} {'Δ':>8} {'mem Δ KB':>9}")
+    for name, result in current["actions"].items():
+        previous = baseline["actions"].get(name)
+        if not previous:
+            print(f"{name:<55} {'-':>10} {result['p50_ms']:>10.4f}      nueva")
+            continue
+        change = (result["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] if previous["p50_ms"] else 0.0
+        memory = (result["alloc_peak_kb"] or 0) - (previous["alloc_peak_kb"] or 0)
+        flag = " ⚠️" if change > threshold else ""
+        print(f"{name:<55} {previous['p50_ms']:>10.4f} {result['p50_ms']:>10.4f} {change:>+7.1%} {memory:>+9.2f}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de las acciones personalizadas")
+    parser.add_argument("--project", choices=sorted(ACTION_PACKAGES), action="append",
+                        help="Proyecto a medir (por defecto ambos)")
+    parser.add_argument("--action", help="Medir solo las acciones cuyo nombre contenga este texto")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-iterations", type=int, default=100)
+    parser.add_argument("--history", type=int, default=10, help="Turnos previos en cada tracker")
+    parser.add_argument("--db", choices=["mock", "local"], default="mock")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Latencia simulada por consulta")
+    parser.add_argument("--output", help="Archivo de resultados (por defecto benchmarks/results/actions-<commit>.json)")
+    parser.add_argument("--compare", help="Resultados de otro commit con los que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento de p50 considerado regresión")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    loop = asyncio.new_event_loop()
+    commit = current_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "db": args.db,
+        "db_latency_ms": args.db_latency_ms,
+        "iterations": args.iterations,
+        "actions": {},
+    }
+
+    for project in args.project or sorted(ACTION_PACKAGES):
+        path = ACTION_PACKAGES[project]
+        examples = load_nlu_examples(os.path.join(os.path.dirname(path), "data", "nlu.yml"))
+        trackers = [build_tracker(examples, args.history, rng) for _ in range(200)]
+        package, action_classes = load_actions(project, path)
+        if args.db == "mock":
+            install_db_mock(package, args.db_latency_ms)
+        for action_class in action_classes:
+            action = action_class()
+            name = f"{project}:{action.name()}"
+            if args.action and args.action not in name:
+                continue
+            result = bench_action(action, trackers, args.iterations, args.warmup, args.alloc_iterations, loop)
+            results["actions"][name] = result
+            print(f"{name:<55} {result['throughput_per_s']:>10.1f}/s  p50={result['p50_ms']:.4f} ms  "
+                  f"p99={result['p99_ms']:.4f} ms  pico={result['alloc_peak_kb']} KB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"actions-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados guardados en {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} acciones empeoran más de un {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
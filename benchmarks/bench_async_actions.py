@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia de las acciones con base de datos.
+
+Ejecuta muchas acciones a la vez en un mismo bucle de eventos, como hace el
+servidor de acciones, con una latencia de base de datos simulada. Compara:
+
+- async: el pool aiomysql simulado espera con asyncio.sleep, de modo que
+  otras acciones avanzan mientras una consulta está en curso,
+- blocking: la misma latencia con time.sleep, equivalente al conector
+  síncrono anterior, que detenía el bucle en cada consulta.
+
+La columna "KB ahorradas" indica cuántas consultas a knowledge_base evitó la
+agrupación de preguntas idénticas (rasa/actions/singleflight.py).
+
+Ejecutar con: python benchmarks/bench_async_actions.py --concurrency 1,16,64 --db-latency-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from bench_actions import ACTION_PACKAGES, build_tracker, install_db_mock, load_actions
+
+from fast_path import load_nlu_examples
+
+DB_ACTIONS = ["action_consulta_knowledge_base", "action_registrar_feedback", "action_guardar_mensaje"]
+
+
+async def run_concurrent(actions, trackers, total, concurrency):
+    """Ejecuta `total` acciones con `concurrency` en curso a la vez; devuelve rendimiento y latencias."""
+    from rasa_sdk.executor import CollectingDispatcher
+
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            action = actions[i % len(actions)]
+            start = time.perf_counter()
+            await action.run(CollectingDispatcher(), trackers[i % len(trackers)], {})
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia de las acciones con base de datos")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Acciones simultáneas a probar")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Latencia simulada por consulta")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = ACTION_PACKAGES["rasa"]
+    package, action_classes = load_actions("rasa", path)
+    actions = [cls() for cls in action_classes if cls().name() in DB_ACTIONS]
+    rng = random.Random(args.seed)
+    examples = load_nlu_examples(os.path.join(os.path.dirname(path), "data", "nlu.yml"))
+    trackers = [build_tracker(examples, 5, rng) for _ in range(200)]
+
+    print(f"Acciones: {', '.join(a.name() for a in actions)}  latencia simulada: {args.db_latency_ms} ms/consulta")
+    print(f"{'concurrencia':>12} {'modo':>9} {'acciones/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'KB ahorradas':>13}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        throughputs = {}
+        for mode in ("blocking", "async"):
+            install_db_mock(package, args.db_latency_ms, blocking=(mode == "blocking"))
+            lookups = package.singleflight.SingleFlight("knowledge_base")
+            package.actions.knowledge_base_lookups = lookups
+            # Con el modo bloqueante se limitan las peticiones para no alargar la prueba
+            total = min(args.requests, max(concurrency * 4, 200)) if mode == "blocking" else args.requests
+            throughput, p50, p99 = asyncio.run(run_concurrent(actions, trackers, total, concurrency))
+            throughputs[mode] = throughput
+            saved = lookups.stats()
+            print(f"{concurrency:>12} {mode:>9} {throughput:>11.1f} {p50:>8.2f} {p99:>8.2f} "
+                  f"{saved['db_calls_saved']:>6}/{saved['calls']:<6}")
+        print(f"{'':>12} {'mejora':>9} {'x' + format(throughputs['async'] / throughputs['blocking'], '.2f'):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la agrupación de fallbacks de `backend/fallback_clusters.py`.
+
+Genera preguntas sin respuesta sintéticas (variaciones de un conjunto de
+preguntas base: faltas de ortografía, mayúsculas, signos y palabras de
+relleno) repartidas entre varias materias, las agrupa con MinHash/LSH sin
+base de datos y mide el rendimiento y la calidad de los grupos:
+
+- pureza: fracción de mensajes cuyo grupo corresponde a su pregunta base,
+- fragmentación: grupos creados por cada pregunta base.
+
+Ejecutar con: python benchmarks/bench_fallback_clusters.py --messages 500000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from fallback_clusters import FallbackClusterer  # noqa: E402
+
+TOPICS = [
+    "ecuación diferencial de segundo orden", "teorema de Gödel", "dualidad onda partícula",
+    "colapso del Imperio Romano", "final de Cien años de soledad", "aprendizaje profundo desde cero",
+    "integral por partes", "ley de Ohm en paralelo", "revolución industrial", "fotosíntesis en plantas C4",
+    "derivada implícita", "entropía en termodinámica", "guerra fría", "metáfora y metonimia",
+    "recursividad en Python", "matriz inversa", "efecto Doppler", "independencia de México",
+    "realismo mágico", "árboles binarios de búsqueda",
+]
+FORMS = [
+    "¿Cómo se explica {t}?", "¿Qué es {t}?", "No entiendo {t}", "¿Me puedes ayudar con {t}?",
+    "Tengo dudas sobre {t} para el examen",
+]
+FILLERS = ["por favor", "profe", "urgente", "otra vez", "gracias"]
+
+
+def typo(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i] + text[i:]
+
+
+def variant(text, rng):
+    if rng.random() < 0.3:
+        text = text.lower()
+    if rng.random() < 0.3:
+        text = text.replace("¿", "").replace("?", "")
+    if rng.random() < 0.3:
+        text = typo(text, rng)
+    if rng.random() < 0.2:
+        text = f"{text} {rng.choice(FILLERS)}"
+    return text
+
+
+def generate(messages, subjects, rng):
+    bases = [(topic, form) for topic in TOPICS for form in FORMS]
+    for _ in range(messages):
+        topic, form = rng.choice(bases)
+        subject_id = TOPICS.index(topic) % subjects + 1
+        yield (topic, form), subject_id, variant(form.format(t=topic), rng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la agrupación de fallbacks")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--similarity", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = list(generate(args.messages, args.subjects, rng))
+    clusterer = FallbackClusterer(args.similarity)
+
+    assignments = []
+    start = time.perf_counter()
+    for base, subject_id, text in corpus:
+        cluster = clusterer.add(subject_id, text, None)
+        assignments.append((base, cluster.key))
+    elapsed = time.perf_counter() - start
+
+    # Pureza: cada grupo se etiqueta con su pregunta base mayoritaria
+    by_cluster = defaultdict(Counter)
+    clusters_per_base = defaultdict(set)
+    for base, key in assignments:
+        by_cluster[key][base] += 1
+        clusters_per_base[base].add(key)
+    purity = sum(c.most_common(1)[0][1] for c in by_cluster.values()) / len(assignments)
+    fragmentation = sum(len(keys) for keys in clusters_per_base.values()) / len(clusters_per_base)
+
+    print(f"{len(corpus)} mensajes en {elapsed:.1f} s ({len(corpus) / elapsed:.0f} mensajes/s)")
+    print(f"{len(clusterer.clusters)} grupos para {len(clusters_per_base)} preguntas base  "
+          f"pureza={purity:.1%}  grupos por pregunta={fragmentation:.2f}")
+    print(f"Un año a 2000 fallbacks/día ({365 * 2000} mensajes): ~{365 * 2000 / (len(corpus) / elapsed) / 60:.1f} min")
+
+
+if __name__ == "__main__":
+    main()
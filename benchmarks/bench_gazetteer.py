@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark del diccionario de cursos y profesores con catálogos grandes.
+
+Construye el diccionario de `rasa/actions/gazetteer.py` con catálogos
+sintéticos de asignaturas y profesores de distintos tamaños y extrae
+entidades de mensajes que los mencionan de tres formas: tal cual, sin
+acentos ni mayúsculas y con un error de escritura. Los mensajes sin
+entidades son de `loadtest/generator.py`. Para cada tamaño mide:
+
+- tiempo de construcción, memoria y actualización incremental por entrada,
+- mensajes por segundo,
+- exhaustividad por variante y porcentaje de mensajes del generador con
+  alguna entidad (incluye menciones reales como "curso de historia" y
+  falsos positivos),
+- y, hasta --baseline-max entradas, la búsqueda ingenua (cada frase del
+  catálogo contra el mensaje) como referencia.
+
+Ejecutar con: python benchmarks/bench_gazetteer.py --catalog 1000,10000,100000 --messages 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from bench_actions import ACTION_PACKAGES, load_actions  # noqa: E402
+from generator import ConversationGenerator, strip_accents  # noqa: E402
+
+AREAS = ["Cálculo", "Álgebra", "Física", "Química", "Biología", "Programación", "Estadística", "Economía",
+         "Historia", "Filosofía", "Literatura", "Geografía", "Contabilidad", "Derecho", "Psicología",
+         "Sociología", "Electrónica", "Termodinámica", "Bioquímica", "Mecánica", "Redes", "Robótica"]
+QUALIFIERS = ["", "Aplicada", "Avanzada", "Computacional", "Teórica", "Experimental", "Numérica",
+              "Industrial", "Cuántica", "Clásica", "Moderna", "Ambiental"]
+LEVELS = ["", "I", "II", "III", "IV"]
+FIRST_NAMES = ["María", "José", "Juan", "Ana", "Luis", "Carmen", "Pedro", "Lucía", "Javier", "Elena",
+               "Andrés", "Sofía", "Miguel", "Valentina", "Ricardo", "Camila", "Fernando", "Isabel",
+               "Tomás", "Gabriela", "Héctor", "Patricia", "Álvaro", "Natalia"]
+SURNAMES = ["García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez", "Pérez",
+            "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez",
+            "Romero", "Alonso", "Gutiérrez", "Navarro", "Torres", "Domínguez", "Vázquez", "Ramos",
+            "Gil", "Ramírez", "Serrano", "Blanco", "Molina", "Morales", "Suárez", "Ortega", "Delgado",
+            "Castro", "Ortiz", "Rubio", "Marín", "Sanz", "Núñez", "Iglesias", "Medina", "Garrido"]
+TEMPLATES = {
+    "curso": ["¿A qué hora es la clase de {}?", "Quiero información sobre el curso de {}",
+              "¿Dónde se imparte {} este semestre?", "necesito los apuntes de {}"],
+    "profesor": ["¿Cuál es el correo del profesor {}?", "Quiero hablar con {} sobre el examen",
+                 "¿En qué horario atiende {}?", "la profesora {} no vino hoy"],
+}
+
+
+def build_catalog(size, rng):
+    """Nombres sintéticos sin repetir de asignaturas y de profesores (dos conjuntos)."""
+    subjects, teachers = set(), set()
+    while len(subjects) < size // 2:
+        parts = [rng.choice(AREAS), rng.choice(QUALIFIERS), rng.choice(LEVELS)]
+        if len(subjects) > len(AREAS) * len(QUALIFIERS) * len(LEVELS) // 2:
+            parts.append(str(rng.randint(1, 999)))
+        subjects.add(" ".join(p for p in parts if p))
+    while len(teachers) < size - size // 2:
+        teachers.add(" ".join([rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES + [""]),
+                               rng.choice(SURNAMES), rng.choice(SURNAMES)]).replace("  ", " "))
+    return subjects, teachers
+
+
+def typo(text, rng):
+    """Introduce un error de una edición en una palabra larga del texto."""
+    words = text.split()
+    long_words = [i for i, w in enumerate(words) if len(w) >= 6]
+    if not long_words:
+        return text
+    i = rng.choice(long_words)
+    word = words[i]
+    pos = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(["delete", "swap", "replace", "insert"])
+    if kind == "delete":
+        word = word[:pos] + word[pos + 1:]
+    elif kind == "swap":
+        word = word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+    elif kind == "replace":
+        word = word[:pos] + rng.choice("aeioulnrst") + word[pos + 1:]
+    else:
+        word = word[:pos] + rng.choice("aeioulnrst") + word[pos:]
+    words[i] = word
+    return " ".join(words)
+
+
+def build_messages(subjects, teachers, count, background, rng):
+    """Mensajes con una mención por variante y mensajes sin entidades."""
+    catalog = {"curso": sorted(subjects), "profesor": sorted(teachers)}
+    messages = []
+    for _ in range(count):
+        entity = rng.choice(["curso", "profesor"])
+        value = rng.choice(catalog[entity])
+        mention = value
+        variant = rng.choice(["exacta", "sin acentos", "con errata"])
+        if variant == "sin acentos":
+            mention = strip_accents(value).lower()
+        elif variant == "con errata":
+            mention = typo(value, rng)
+        messages.append((variant, rng.choice(TEMPLATES[entity]).format(mention), entity, value))
+    messages += [("sin entidades", text, None, None) for text in background]
+    rng.shuffle(messages)
+    return messages
+
+
+def naive_extract(gazetteer, phrases, text):
+    """Referencia: busca cada frase del catálogo en el mensaje normalizado."""
+    normalized = " " + " ".join(token for token, _, _ in gazetteer.tokenize(text)) + " "
+    return [value for phrase, value in phrases if phrase in normalized]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del diccionario de cursos y profesores")
+    parser.add_argument("--catalog", default="1000,10000,100000", help="Tamaños del catálogo a probar")
+    parser.add_argument("--messages", type=int, default=5000, help="Mensajes con menciones por tamaño")
+    parser.add_argument("--background", type=int, default=2000, help="Mensajes sin entidades")
+    parser.add_argument("--baseline-max", type=int, default=10000,
+                        help="Tamaño máximo para medir la búsqueda ingenua")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    package, _ = load_actions("rasa", ACTION_PACKAGES["rasa"])
+    gazetteer = sys.modules[f"{package.__name__}.gazetteer"]
+
+    generator = ConversationGenerator(seed=args.seed)
+    background = []
+    while len(background) < args.background:
+        background.extend(text for _, text in generator.conversation())
+    background = background[:args.background]
+
+    print(f"{'entradas':>9} {'construir s':>11} {'memoria MB':>10} {'actualizar µs':>13} "
+          f"{'mensajes/s':>11} {'ingenua/s':>10} {'exacta':>7} {'sin acentos':>11} {'con errata':>10} "
+          f"{'otros':>7}")
+    for size in (int(s) for s in args.catalog.split(",")):
+        rng = random.Random(args.seed)
+        subjects, teachers = build_catalog(size, rng)
+        entries = [(f"subject:{i}", "curso", name, gazetteer.subject_phrases(name, f"C{i:06d}"))
+                   for i, name in enumerate(sorted(subjects))]
+        entries += [(f"user:{i}", "profesor", name, gazetteer.teacher_phrases(name))
+                    for i, name in enumerate(sorted(teachers))]
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = gazetteer.Gazetteer()
+        for key, entity, value, phrases in entries:
+            index.add(key, entity, value, phrases)
+        build_seconds = time.perf_counter() - start
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        # Actualización incremental: se reemplaza el 1% de las entradas
+        changed = rng.sample(entries, max(1, len(entries) // 100))
+        start = time.perf_counter()
+        for key, entity, value, phrases in changed:
+            index.add(key, entity, value, phrases)
+        update_us = (time.perf_counter() - start) / len(changed) * 1e6
+
+        messages = build_messages(subjects, teachers, args.messages, background, rng)
+        hits, totals, other_matches = {}, {}, 0
+        start = time.perf_counter()
+        results = [index.extract(text) for _, text, _, _ in messages]
+        throughput = len(messages) / (time.perf_counter() - start)
+        for (variant, _, entity, value), found in zip(messages, results):
+            if entity is None:
+                other_matches += bool(found)
+                continue
+            totals[variant] = totals.get(variant, 0) + 1
+            hits[variant] = hits.get(variant, 0) + any(
+                e["entity"] == entity and e["value"] == value for e in found)
+
+        baseline = "-"
+        if size <= args.baseline_max:
+            phrases = [(" " + " ".join(tokens) + " ", value)
+                       for _, (_, value, normalized) in index._entries.items() for tokens in normalized]
+            sample = messages[:500]
+            start = time.perf_counter()
+            for _, text, _, _ in sample:
+                naive_extract(gazetteer, phrases, text)
+            baseline = f"{len(sample) / (time.perf_counter() - start):.0f}"
+
+        recall = {v: 100 * hits.get(v, 0) / max(1, totals.get(v, 0)) for v in ("exacta", "sin acentos", "con errata")}
+        print(f"{len(index):>9} {build_seconds:>11.2f} {memory_mb:>10.1f} {update_us:>13.1f} "
+              f"{throughput:>11.0f} {baseline:>10} {recall['exacta']:>6.1f}% {recall['sin acentos']:>10.1f}% "
+              f"{recall['con errata']:>9.1f}% {100 * other_matches / max(1, len(background)):>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
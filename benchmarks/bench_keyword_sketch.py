@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Precisión del recuento aproximado de palabras clave.
+
+Cuenta las palabras clave de un corpus con el resumen Space-Saving de
+`rasa/actions/keyword_stats.py` y con un recuento exacto, y compara para
+cada capacidad del resumen:
+
+- precisión y exhaustividad del top-N estimado frente al exacto,
+- error relativo medio y máximo de las cuentas del top-N exacto,
+- mensajes por segundo y contadores usados.
+
+El corpus es un archivo con un mensaje por línea (--corpus) o, por defecto,
+mensajes sintéticos de `loadtest/generator.py`.
+Ejecutar con: python benchmarks/bench_keyword_sketch.py --messages 50000 --capacity 50,200,1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from bench_actions import ACTION_PACKAGES, load_actions  # noqa: E402
+from generator import ConversationGenerator  # noqa: E402
+
+
+def load_corpus(path, messages, seed):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    generator = ConversationGenerator(seed=seed)
+    corpus = []
+    while len(corpus) < messages:
+        corpus.extend(text for _, text in generator.conversation())
+    return corpus[:messages]
+
+
+def evaluate(keyword_stats, corpus, exact, capacity, top_n):
+    sketch = keyword_stats.SpaceSaving(capacity)
+    start = time.perf_counter()
+    for text in corpus:
+        for key, surface in keyword_stats.extract_keywords(text):
+            sketch.add(key, surface)
+    elapsed = time.perf_counter() - start
+
+    true_top = sorted(exact, key=exact.get, reverse=True)[:top_n]
+    estimated = {key: count for key, _, count, _ in sketch.top(top_n)}
+    hits = len(set(true_top) & set(estimated))
+    errors = []
+    for key in true_top:
+        counter = sketch.counters.get(key)
+        errors.append(abs((counter[0] if counter else 0) - exact[key]) / exact[key])
+    return {
+        "precision": hits / len(estimated) if estimated else 0.0,
+        "recall": hits / len(true_top) if true_top else 0.0,
+        "mean_error": sum(errors) / len(errors) if errors else 0.0,
+        "max_error": max(errors) if errors else 0.0,
+        "throughput": len(corpus) / elapsed,
+        "counters": len(sketch),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión del recuento aproximado de palabras clave")
+    parser.add_argument("--corpus", help="Archivo con un mensaje por línea")
+    parser.add_argument("--messages", type=int, default=20000, help="Mensajes sintéticos si no hay corpus")
+    parser.add_argument("--capacity", default="25,50,100,500", help="Capacidades del resumen a probar")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    package, _ = load_actions("rasa", ACTION_PACKAGES["rasa"])
+    keyword_stats = sys.modules[f"{package.__name__}.keyword_stats"]
+
+    corpus = load_corpus(args.corpus, args.messages, args.seed)
+    start = time.perf_counter()
+    exact = keyword_stats.exact_counts(corpus)
+    exact_throughput = len(corpus) / (time.perf_counter() - start)
+    print(f"{len(corpus)} mensajes, {sum(exact.values())} palabras clave, {len(exact)} raíces distintas "
+          f"(NLTK: {'sí' if keyword_stats.NLTK_AVAILABLE else 'no'}); exacto: {exact_throughput:.0f} mensajes/s")
+
+    print(f"{'capacidad':>10} {'precisión':>10} {'exhaust.':>9} {'err. medio':>11} {'err. máx':>9} "
+          f"{'mensajes/s':>11} {'contadores':>11}")
+    for capacity in (int(c) for c in args.capacity.split(",")):
+        result = evaluate(keyword_stats, corpus, exact, capacity, args.top_n)
+        print(f"{capacity:>10} {result['precision']:>10.1%} {result['recall']:>9.1%} {result['mean_error']:>11.2%} "
+              f"{result['max_error']:>9.2%} {result['throughput']:>11.0f} {result['counters']:>11}")
+
+
+if __name__ == "__main__":
+    main()
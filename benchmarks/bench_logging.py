@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de peticiones bajo un volumen alto de logs.
+
+Compara la configuración síncrona anterior (`FileHandler` + `StreamHandler`
+en el hilo de la petición) con la configuración basada en cola de
+`backend/logging_config.py`.
+Ejecutar con: python benchmarks/bench_logging.py --requests 2000 --logs-per-request 50
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+
+def simulated_request(logger, logs_per_request, work_us):
+    """Simula un handler que hace algo de trabajo y registra muchos mensajes."""
+    start = time.perf_counter()
+    deadline = start + work_us / 1_000_000
+    while time.perf_counter() < deadline:
+        pass
+    for i in range(logs_per_request):
+        logger.info("Procesando paso %d de la petición", i)
+    logger.error("Error simulado en la petición: %s", "timeout")
+    return (time.perf_counter() - start) * 1000
+
+
+def run(logger, args):
+    latencies = []
+    lock = threading.Lock()
+    per_thread = args.requests // args.threads
+
+    def worker():
+        local = [simulated_request(logger, args.logs_per_request, args.work_us) for _ in range(per_thread)]
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def report(name, latencies, elapsed):
+    latencies.sort()
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    print(f"{name:<12} p50={p(0.50):7.3f} ms  p95={p(0.95):7.3f} ms  p99={p(0.99):7.3f} ms  "
+          f"media={statistics.mean(latencies):7.3f} ms  rendimiento={len(latencies) / elapsed:8.0f} req/s")
+
+
+def configure_sync(log_path):
+    root = logging.getLogger()
+    root.handlers = [logging.FileHandler(log_path), logging.StreamHandler()]
+    for handler in root.handlers:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    root.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de logging síncrono vs. en cola")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logs-per-request", type=int, default=50)
+    parser.add_argument("--work-us", type=int, default=200, help="Trabajo simulado por petición (µs)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_logging_")
+    # Los StreamHandler escriben en stderr; se redirige para no medir la terminal
+    real_stderr = sys.stderr
+    sys.stderr = open(os.devnull, "w")
+    logger = logging.getLogger("bench")
+
+    try:
+        logging.getLogger().setLevel(logging.CRITICAL + 1)
+        baseline = run(logger, args)
+
+        configure_sync(os.path.join(tmpdir, "sync.log"))
+        sync_result = run(logger, args)
+
+        os.environ["LOG_FILE"] = os.path.join(tmpdir, "queue.log")
+        import logging_config
+        logging_config.LOG_FILE = os.environ["LOG_FILE"]
+        logging_config.setup_logging()
+        queue_result = run(logger, args)
+        logging_config.shutdown_logging()
+    finally:
+        sys.stderr.close()
+        sys.stderr = real_stderr
+
+    print(f"{args.requests} peticiones, {args.threads} hilos, {args.logs_per_request + 1} logs por petición")
+    report("sin logs", *baseline)
+    report("síncrono", *sync_result)
+    report("en cola", *queue_result)
+
+
+if __name__ == "__main__":
+    main()
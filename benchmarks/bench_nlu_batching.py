@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark de análisis NLU individual frente a micro-lotes.
+
+Necesita un Rasa con la API habilitada (`rasa run --enable-api`) y el
+servidor de lotes `rasa/nlu_batch_server.py` con el mismo modelo local.
+Ejecutar con:
+    python benchmarks/bench_nlu_batching.py --rasa-url http://localhost:5005 \
+        --batch-url http://localhost:5006 --concurrency 32 --windows 0,2,5,10
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from fast_path import load_nlu_examples  # noqa: E402
+from nlu_batcher import MicroBatcher, RasaBatchParser  # noqa: E402
+
+
+def run_clients(call, texts, concurrency, total):
+    latencies = []
+    lock = threading.Lock()
+    per_client = total // concurrency
+
+    def client():
+        session_latencies = []
+        for _ in range(per_client):
+            text = random.choice(texts)
+            start = time.perf_counter()
+            call(text)
+            session_latencies.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(session_latencies)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(latencies), time.perf_counter() - start
+
+
+def report(name, latencies, elapsed, extra=""):
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    print(f"{name:<22} {len(latencies) / elapsed:8.1f} msg/s  p50={p(0.5):8.2f} ms  "
+          f"p99={p(0.99):8.2f} ms {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de micro-lotes NLU")
+    parser.add_argument("--rasa-url", default="http://localhost:5005")
+    parser.add_argument("--batch-url", default="http://localhost:5006")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--windows", default="0,2,5,10", help="Ventanas de agrupación en ms")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = [text for _, text in load_nlu_examples(os.path.join(ROOT, "rasa", "data", "nlu.yml"))]
+    session = requests.Session()
+
+    def direct(text):
+        session.post(f"{args.rasa_url}/model/parse", json={"text": text}, timeout=30).raise_for_status()
+
+    print(f"{args.requests} mensajes, {args.concurrency} clientes concurrentes")
+    report("individual", *run_clients(direct, texts, args.concurrency, args.requests))
+
+    for window in (float(w) for w in args.windows.split(",")):
+        batcher = MicroBatcher(RasaBatchParser(args.rasa_url, args.batch_url),
+                               window_ms=window, max_batch_size=args.max_batch_size)
+        latencies, elapsed = run_clients(batcher.process, texts, args.concurrency, args.requests)
+        report(f"lotes ventana={window:g} ms", latencies, elapsed,
+               f"lote medio={batcher.stats()['avg_batch_size']}")
+
+
+if __name__ == "__main__":
+    main()
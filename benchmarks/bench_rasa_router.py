@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark del enrutado de la pasarela entre réplicas de Rasa.
+
+Arranca varias réplicas simuladas de Rasa (`loadtest/stubs.py`) y envía
+mensajes de muchos usuarios a través de `backend/rasa_router.py`, como hace
+la pasarela. Mide:
+
+- afinidad: usuarios atendidos siempre por la misma réplica,
+- reparto: peticiones por réplica y desbordamientos por saturación,
+- caída: se detiene una réplica; sus usuarios pasan a otra y el resto no
+  cambia de réplica,
+- recuperación: la réplica vuelve, el sondeo la marca como sana y sus
+  usuarios regresan,
+- cambio de réplicas: usuarios que cambian de réplica al añadir una más.
+
+Ejecutar con:
+    python benchmarks/bench_rasa_router.py --replicas 4 --users 500 --concurrency 16
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from rasa_router import RasaRouter  # noqa: E402
+from stubs import start_rasa_stub  # noqa: E402
+
+
+def run_clients(router, session, users, total, concurrency, rng):
+    """Envía `total` mensajes de usuarios al azar; devuelve réplicas por usuario, errores y rendimiento."""
+    served = defaultdict(Counter)
+    errors = Counter()
+    lock = threading.Lock()
+    picks = iter([rng.choice(users) for _ in range(total)])
+
+    def client():
+        for user_id in picks:
+            try:
+                with router.request(user_id) as rasa_url:
+                    response = session.post(f"{rasa_url}/webhooks/rest/webhook",
+                                            json={"sender": user_id, "message": "hola"}, timeout=5)
+                    response.raise_for_status()
+                    replica = response.json()[0]["replica"]
+                with lock:
+                    served[user_id][replica] += 1
+            except requests.RequestException as e:
+                with lock:
+                    errors[type(e).__name__] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return served, errors, total / (time.perf_counter() - start)
+
+
+def probe(router, session):
+    """Equivalente al sondeo de salud de la pasarela sobre cada réplica."""
+    for url in router.urls:
+        check = router.replica_check(url, lambda url=url: session.get(f"{url}/status", timeout=1).raise_for_status())
+        try:
+            check()
+        except requests.RequestException:
+            pass
+
+
+def new_session(concurrency):
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency * 2))
+    return session
+
+
+def report(name, router, served, errors, throughput):
+    sticky = sum(1 for replicas in served.values() if len(replicas) == 1)
+    per_replica = Counter()
+    for replicas in served.values():
+        per_replica.update(replicas)
+    stats = router.stats()
+    print(f"\n📊 {name}: {throughput:.1f} mensajes/s, errores {dict(errors) or 0}, "
+          f"desbordamientos {stats['spillovers']}")
+    print(f"   afinidad: {sticky}/{len(served)} usuarios en una sola réplica ({100 * sticky / max(1, len(served)):.1f}%)")
+    for url, replica in stats["replicas"].items():
+        port = int(url.rsplit(":", 1)[1])
+        print(f"   {url:<26} {'sana' if replica['healthy'] else 'caída':<6} "
+              f"peticiones {per_replica[port]:>6}  fallos {replica['failures']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del enrutado entre réplicas de Rasa")
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--base-port", type=int, default=15005)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-outstanding", type=int, default=8,
+                        help="Peticiones en curso por réplica antes de desbordar")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ports = list(range(args.base_port, args.base_port + args.replicas))
+    servers = {port: start_rasa_stub(port, args.latency_ms, args.jitter_ms, host="127.0.0.1") for port in ports}
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    users = [f"user-{i}" for i in range(args.users)]
+    print(f"🚀 {args.replicas} réplicas simuladas ({args.latency_ms:g} ± {args.jitter_ms:g} ms), "
+          f"{args.users} usuarios, concurrencia {args.concurrency}")
+
+    session = new_session(args.concurrency)
+    router = RasaRouter(urls, max_outstanding=args.max_outstanding)
+
+    served, errors, throughput = run_clients(router, session, users, args.requests, args.concurrency, rng)
+    report("Reparto", router, served, errors, throughput)
+    owners = {user_id: router.owner(user_id) for user_id in users}
+
+    # Caída de una réplica: falla una petición, se marca caída y sus usuarios pasan a otra
+    down_port = ports[0]
+    servers[down_port].shutdown()
+    servers[down_port].server_close()
+    # Sesión nueva: las conexiones persistentes abiertas seguirían atendidas por la réplica detenida
+    session = new_session(args.concurrency)
+    router = RasaRouter(urls, max_outstanding=args.max_outstanding)
+    served, errors, throughput = run_clients(router, session, users, args.requests, args.concurrency, rng)
+    report(f"Caída de la réplica {down_port}", router, served, errors, throughput)
+    moved = [u for u in users if router.owner(u) != owners[u]]
+    orphaned = [u for u in users if owners[u].endswith(f":{down_port}")]
+    print(f"   usuarios reasignados: {len(moved)} (tenía la réplica caída: {len(orphaned)}, "
+          f"otros movidos: {len(set(moved) - set(orphaned))})")
+
+    # Recuperación: el sondeo vuelve a marcarla como sana
+    servers[down_port] = start_rasa_stub(down_port, args.latency_ms, args.jitter_ms, host="127.0.0.1")
+    probe(router, session)
+    back = sum(1 for u in users if router.owner(u) == owners[u])
+    print(f"\n🔄 Recuperación: {back}/{len(users)} usuarios vuelven a su réplica original")
+
+    # Añadir una réplica: solo cambia la parte del anillo que le corresponde
+    extra = f"http://127.0.0.1:{args.base_port + args.replicas}"
+    router.set_replicas(urls + [extra])
+    moved = sum(1 for u in users if router.owner(u) != owners[u])
+    print(f"➕ Réplica añadida: {moved}/{len(users)} usuarios cambian de réplica "
+          f"({100 * moved / len(users):.1f}%, ideal {100 / (args.replicas + 1):.1f}%)")
+
+    for server in servers.values():
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de carga del tracker frente a la longitud de la sesión.
+
+Crea conversaciones de distinta longitud en un tracker store SQL de Rasa
+(SQLite local), mide `retrieve()` antes y después de compactarlas con
+`rasa/compact_trackers.py` y muestra la mediana por longitud.
+Ejecutar con: python benchmarks/bench_tracker_retrieval.py --lengths 100,1000,5000,20000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "rasa"))
+
+import sqlalchemy as sa  # noqa: E402
+from rasa.core.tracker_store import SQLTrackerStore  # noqa: E402
+from rasa.shared.core.domain import Domain  # noqa: E402
+from rasa.shared.core.events import ActionExecuted, BotUttered, SessionStarted, SlotSet, UserUttered  # noqa: E402
+from rasa.shared.core.trackers import DialogueStateTracker  # noqa: E402
+
+import compact_trackers  # noqa: E402
+
+
+def build_tracker(sender_id, events_count, domain):
+    """Conversación sintética de una sola sesión con turnos de 4 eventos."""
+    tracker = DialogueStateTracker(sender_id, domain.slots)
+    tracker.update(ActionExecuted("action_session_start"))
+    tracker.update(SessionStarted())
+    tracker.update(ActionExecuted("action_listen"))
+    for i in range(events_count // 4):
+        tracker.update(UserUttered("¿Cuál es el horario de matemáticas?",
+                                   intent={"name": "consulta_horarios", "confidence": 0.93}))
+        tracker.update(SlotSet("curso", f"curso {i}"))
+        tracker.update(BotUttered("Los horarios de atención generales son de lunes a viernes."))
+        tracker.update(ActionExecuted("action_listen"))
+    return tracker
+
+
+async def measure(store, sender_id, repetitions):
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        await store.retrieve(sender_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def main_async(args):
+    domain = Domain.load(os.path.join(ROOT, "rasa", "domain.yml"))
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_tracker_"), "tracker.db")
+    store = SQLTrackerStore(domain, dialect="sqlite", db=db_path)
+    lengths = [int(n) for n in args.lengths.split(",")]
+
+    for length in lengths:
+        await store.save(build_tracker(f"sesion_{length}", length, domain))
+
+    before = {length: await measure(store, f"sesion_{length}", args.repetitions) for length in lengths}
+
+    engine = sa.create_engine(f"sqlite:///{db_path}")
+    compact_trackers.compact_all(engine, max_events=args.keep_events, keep_events=args.keep_events,
+                                 idle_seconds=-1, limit=len(lengths),
+                                 archive_dir=os.path.join(os.path.dirname(db_path), "archive"))
+
+    after = {length: await measure(store, f"sesion_{length}", args.repetitions) for length in lengths}
+
+    print(f"{'eventos':>10} {'sin compactar':>15} {'compactado':>12}")
+    for length in lengths:
+        print(f"{length:>10} {before[length]:>12.2f} ms {after[length]:>9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga del tracker")
+    parser.add_argument("--lengths", default="100,1000,5000,20000", help="Eventos por conversación")
+    parser.add_argument("--keep-events", type=int, default=100)
+    parser.add_argument("--repetitions", type=int, default=20)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -135,17 +135,10 @@ BEGIN
 END //
 DELIMITER ;
 
--- Trigger para actualizar métricas cuando termina una conversación
-DELIMITER //
-CREATE TRIGGER after_conversation_end
-AFTER UPDATE ON conversations
-FOR EACH ROW
-BEGIN
-    IF NEW.ended_at IS NOT NULL AND OLD.ended_at IS NULL THEN
-        CALL calculate_daily_metrics(DATE(NEW.started_at));
-    END IF;
-END //
-DELIMITER ;
+-- Las métricas diarias se recalculan desde backend/session_reaper.py, una vez
+-- por fecha afectada y no por cada fila: las de las conversaciones inactivas
+-- que cierra y las de las terminadas desde el panel desde su última ejecución
+-- (ver scripts/migrations/001_session_reaper.sql)
 
 -- Insertar algunos datos de ejemplo para pruebas
 INSERT INTO conversation_metrics_daily 
@@ -180,14 +180,28 @@ export async function logMessage(
   confidence?: number,
 ) {
   try {
-    const query = `
-      INSERT INTO messages 
-        (conversation_id, sender, message, intent, confidence)
-      VALUES 
-        (?, ?, ?, ?, ?)
-    `
+    const queries = [
+      {
+        query: `
+          INSERT INTO messages 
+            (conversation_id, sender, message, intent, confidence)
+          VALUES 
+            (?, ?, ?, ?, ?)
+        `,
+        params: [conversationId, sender, message, intent || null, confidence || null],
+      },
+      {
+        // Registrar actividad para que session_reaper no cierre la conversación
+        query: `
+          UPDATE conversations
+          SET last_activity_at = CURRENT_TIMESTAMP
+          WHERE id = ?
+        `,
+        params: [conversationId],
+      },
+    ]
 
-    await executeQuery(query, [conversationId, sender, message, intent || null, confidence || null])
+    await executeTransaction(queries)
     return { success: true }
   } catch (error) {
     return handleServerActionError("logMessage", error)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga en lazo abierto contra /api/chat.
+
+Las conversaciones llegan según un proceso de Poisson cuya tasa sigue una
+curva de llegadas, con independencia de lo rápido que responda el sistema.
+Dentro de una conversación cada turno espera la respuesta anterior y un
+tiempo de reflexión, como haría un estudiante. La latencia se mide desde el
+instante en que el turno debía enviarse, de modo que la espera en cola del
+propio cliente también cuenta (evita la omisión coordinada).
+
+Curvas de llegadas (conversaciones por segundo):
+    constant:5              tasa fija
+    ramp:1:20               rampa lineal durante toda la prueba
+    step:2,10,2             tramos de igual duración
+    spike:2:30:60:15        tasa base 2, pico de 30 a los 60 s durante 15 s
+
+Ejecutar este script con:
+    python driver.py --url http://localhost:5000 --curve ramp:1:20 --duration 120 --concurrency 200
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from generator import ConversationGenerator
+
+
+def parse_curve(spec, duration):
+    """Convierte la especificación de la curva en una función t -> tasa."""
+    kind, _, rest = spec.partition(":")
+    values = [float(v) for v in rest.replace(",", ":").split(":") if v]
+    if kind == "constant":
+        return lambda t: values[0]
+    if kind == "ramp":
+        start, end = values
+        return lambda t: start + (end - start) * min(t / duration, 1.0)
+    if kind == "step":
+        return lambda t: values[min(int(t / duration * len(values)), len(values) - 1)]
+    if kind == "spike":
+        base, peak, at, length = values
+        return lambda t: peak if at <= t < at + length else base
+    raise ValueError(f"Curva de llegadas desconocida: {spec}")
+
+
+def arrival_times(rate, duration, seed=None):
+    """Instantes de llegada de un proceso de Poisson no homogéneo (por adelgazamiento)."""
+    rng = random.Random(seed)
+    max_rate = max(rate(t) for t in [duration * i / 1000 for i in range(1001)])
+    t = 0.0
+    times = []
+    while max_rate > 0:
+        t += rng.expovariate(max_rate)
+        if t >= duration:
+            break
+        if rng.random() < rate(t) / max_rate:
+            times.append(t)
+    return times
+
+
+def percentile(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] if values else None
+
+
+class Stats:
+    """Latencias, errores y volumen por intención."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+
+    def record(self, intent, latency_ms, error=None):
+        with self.lock:
+            self.latencies[intent].append(latency_ms)
+            if error:
+                self.errors[intent] += 1
+                self.error_kinds[error] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        everything = []
+        for intent, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            everything.extend(values)
+            rows[intent] = self._row(values, self.errors[intent], elapsed)
+        rows["TOTAL"] = self._row(sorted(everything), sum(self.errors.values()), elapsed)
+        return {"elapsed_seconds": round(elapsed, 2), "intents": rows, "errors": dict(self.error_kinds)}
+
+    @staticmethod
+    def _row(values, errors, elapsed):
+        return {
+            "requests": len(values),
+            "errors": errors,
+            "error_rate": round(errors / len(values), 4) if values else 0.0,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+            "p50_ms": round(percentile(values, 0.5), 2) if values else None,
+            "p90_ms": round(percentile(values, 0.9), 2) if values else None,
+            "p99_ms": round(percentile(values, 0.99), 2) if values else None,
+            "max_ms": round(values[-1], 2) if values else None,
+        }
+
+
+class LoadDriver:
+    """Planifica los turnos de las conversaciones y los envía con un grupo de hilos."""
+
+    def __init__(self, url, generator, concurrency, think_time, timeout):
+        self.url = url.rstrip("/") + "/api/chat"
+        self.generator = generator
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.think_time = think_time
+        self.timeout = timeout
+        self.stats = Stats()
+        self.local = threading.local()
+        self.queue = []
+        self.queue_lock = threading.Condition()
+        self.counter = itertools.count()
+        self.pending = 0
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def schedule(self, due, conversation_id, turns):
+        with self.queue_lock:
+            heapq.heappush(self.queue, (due, next(self.counter), conversation_id, turns))
+            self.queue_lock.notify()
+
+    def send(self, due, conversation_id, turns):
+        intent, text = turns[0]
+        error = None
+        try:
+            response = self.session().post(self.url, json={"user_id": conversation_id, "message": text},
+                                           timeout=self.timeout)
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        now = time.monotonic()
+        self.stats.record(intent, (now - due) * 1000, error)
+
+        if len(turns) > 1:
+            self.schedule(now + random.expovariate(1 / self.think_time) if self.think_time else now,
+                          conversation_id, turns[1:])
+        with self.queue_lock:
+            self.pending -= 1
+            self.queue_lock.notify()
+
+    def run(self, arrivals, run_id):
+        start = time.monotonic()
+        with self.queue_lock:
+            for i, offset in enumerate(arrivals):
+                self.queue.append((start + offset, next(self.counter), f"carga_{run_id}_{i}", None))
+            heapq.heapify(self.queue)
+
+        while True:
+            with self.queue_lock:
+                while True:
+                    if not self.queue and self.pending == 0:
+                        return time.monotonic() - start
+                    if self.queue and self.queue[0][0] <= time.monotonic():
+                        due, _, conversation_id, turns = heapq.heappop(self.queue)
+                        self.pending += 1
+                        break
+                    wait = self.queue[0][0] - time.monotonic() if self.queue else None
+                    self.queue_lock.wait(wait)
+            if turns is None:
+                turns = self.generator.conversation()
+            self.executor.submit(self.send, due, conversation_id, turns)
+
+
+def print_summary(summary):
+    print(f"\n{'intención':<22} {'peticiones':>10} {'errores':>8} {'rps':>8} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for intent, row in summary["intents"].items():
+        print(f"{intent:<22} {row['requests']:>10} {row['errors']:>8} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p90_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    if summary["errors"]:
+        print("Errores:", ", ".join(f"{kind}: {count}" for kind, count in summary["errors"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga en lazo abierto de /api/chat")
+    parser.add_argument("--url", default="http://localhost:5000", help="URL base de la pasarela")
+    parser.add_argument("--curve", default="constant:5", help="Curva de llegadas de conversaciones por segundo")
+    parser.add_argument("--duration", type=float, default=60, help="Duración de las llegadas en segundos")
+    parser.add_argument("--concurrency", type=int, default=100, help="Peticiones simultáneas máximas del cliente")
+    parser.add_argument("--think-time", type=float, default=3.0, help="Tiempo medio entre turnos en segundos")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report", help="Archivo JSON donde guardar el resumen")
+    args = parser.parse_args()
+
+    arrivals = arrival_times(parse_curve(args.curve, args.duration), args.duration, args.seed)
+    generator = ConversationGenerator(seed=args.seed)
+    driver = LoadDriver(args.url, generator, args.concurrency, args.think_time, args.timeout)
+    print(f"🚀 {len(arrivals)} conversaciones en {args.duration:g} s con la curva {args.curve}")
+
+    elapsed = driver.run(arrivals, run_id=int(time.time()))
+    driver.executor.shutdown()
+    summary = driver.stats.summary(elapsed)
+    summary.update({"curve": args.curve, "conversations": len(arrivals), "concurrency": args.concurrency})
+    print_summary(summary)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"Resumen guardado en {args.report}")
+
+
+if __name__ == "__main__":
+    main()
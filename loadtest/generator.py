@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Generador de conversaciones sintéticas de estudiantes.
+
+Las conversaciones siguen las secuencias de intenciones de
+`rasa/data/stories.yml` y cada turno se redacta con un ejemplo de
+`rasa/data/nlu.yml`. Las plantillas que terminan en una preposición
+("¿tienen cursos de?") se completan con un valor de la entidad que el
+dominio asocia a la intención, y una parte de los mensajes se escribe
+como lo hacen los estudiantes con prisa (sin tildes ni signos de apertura,
+en minúsculas).
+
+Ejecutar este script con: python generator.py --count 5
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import unicodedata
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RASA_DIR = os.path.join(ROOT, "rasa")
+
+ENTITY_ANNOTATION = re.compile(r"\[([^\]]+)\](?:\([^)]+\)|\{[^}]+\})")
+OPEN_TEMPLATE = re.compile(r"\b(de|del|sobre|para|en)\s*\?$")
+
+# Valores de ejemplo para las entidades del dominio
+ENTITY_VALUES = {
+    "curso": ["matemáticas", "física", "química", "historia", "programación", "inglés",
+              "cálculo", "estadística", "biología", "literatura"],
+    "profesor": ["García", "Martínez", "López", "Rodríguez", "Fernández", "Sánchez"],
+    "ubicacion": ["la biblioteca", "el aula 101", "el laboratorio de química", "la secretaría",
+                  "la cafetería", "el edificio B"],
+    "evento": ["la feria de ciencias", "la semana cultural", "la graduación", "el congreso de ingeniería"],
+    "tramite": ["inscripción", "certificado de estudios", "cambio de carrera", "beca",
+                "convalidación de materias", "baja temporal"],
+    "fecha": ["mañana", "el lunes", "la próxima semana", "el 15 de diciembre", "hoy"],
+}
+
+# Intenciones cuyo nombre no contiene la entidad que suelen mencionar
+INTENT_ENTITIES = {
+    "consulta_horarios": "curso",
+    "consulta_contacto": "profesor",
+}
+
+
+def load_templates(path=os.path.join(RASA_DIR, "data", "nlu.yml")):
+    """Devuelve {intención: [plantillas]} a partir del archivo NLU."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = yaml.safe_load(f) or {}
+    templates = {}
+    for item in content.get("nlu", []):
+        intent = item.get("intent")
+        if not intent:
+            continue
+        for line in (item.get("examples") or "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                templates.setdefault(intent, []).append(ENTITY_ANNOTATION.sub(r"\1", line[2:]))
+    return templates
+
+
+def load_stories(path=os.path.join(RASA_DIR, "data", "stories.yml")):
+    """Devuelve las secuencias de intenciones de cada historia."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = yaml.safe_load(f) or {}
+    stories = []
+    for story in content.get("stories", []):
+        intents = [step["intent"] for step in story.get("steps", []) if "intent" in step]
+        if intents:
+            stories.append(intents)
+    return stories
+
+
+def load_entity_map(path=os.path.join(RASA_DIR, "domain.yml")):
+    """Asocia cada intención con la entidad del dominio cuyo nombre contiene."""
+    with open(path, "r", encoding="utf-8") as f:
+        domain = yaml.safe_load(f) or {}
+    entities = domain.get("entities", [])
+    mapping = {}
+    for intent in domain.get("intents", []):
+        intent = intent if isinstance(intent, str) else next(iter(intent))
+        for entity in entities:
+            if entity in intent:
+                mapping[intent] = entity
+        if intent not in mapping and INTENT_ENTITIES.get(intent) in entities:
+            mapping[intent] = INTENT_ENTITIES[intent]
+    return mapping
+
+
+def strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+class ConversationGenerator:
+    """Genera conversaciones como listas de turnos (intención, texto)."""
+
+    def __init__(self, templates=None, stories=None, entity_map=None, entity_values=None,
+                 casual_rate=0.3, seed=None):
+        self.templates = templates or load_templates()
+        self.stories = [s for s in (stories or load_stories()) if all(i in self.templates for i in s)]
+        self.entity_map = entity_map if entity_map is not None else load_entity_map()
+        self.entity_values = entity_values or ENTITY_VALUES
+        self.casual_rate = casual_rate
+        self.random = random.Random(seed)
+
+    def message(self, intent):
+        """Redacta un mensaje para la intención, con la entidad rellenada si procede."""
+        text = self.random.choice(self.templates[intent])
+        entity = self.entity_map.get(intent)
+        if entity and entity in self.entity_values and OPEN_TEMPLATE.search(text):
+            text = text[:-1].rstrip() + " " + self.random.choice(self.entity_values[entity]) + "?"
+        if self.random.random() < self.casual_rate:
+            text = strip_accents(text).lower().replace("¿", "").replace("¡", "")
+        return text
+
+    def conversation(self):
+        intents = self.random.choice(self.stories)
+        return [(intent, self.message(intent)) for intent in intents]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de conversaciones sintéticas")
+    parser.add_argument("--count", type=int, default=5, help="Conversaciones a generar")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    generator = ConversationGenerator(seed=args.seed)
+    for _ in range(args.count):
+        print(json.dumps(generator.conversation(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
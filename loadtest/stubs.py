@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Servidores sustitutos de Rasa y MySQL para pruebas de carga de la pasarela.
+
+- Rasa: responde a /status, /webhooks/rest/webhook, /model/parse y
+  /model/parse_batch con una latencia configurable (media + variación) y una
+  tasa de errores opcional, sin cargar ningún modelo. PUT /model cambia el
+  modelo que indican /status y las respuestas, tras `model_load_ms`.
+- MySQL: implementa lo mínimo del protocolo cliente/servidor (saludo,
+  autenticación aceptando cualquier credencial, COM_QUERY, COM_PING,
+  COM_INIT_DB, COM_QUIT). Las consultas SELECT devuelven una fila con el
+  valor 1 y el resto un OK, lo que basta para el sondeo de salud.
+
+Ejecutar este script con:
+    python stubs.py --rasa-port 5005 --mysql-port 3306 --latency-ms 80 --jitter-ms 40
+y arrancar la pasarela con RASA_URL=http://localhost:5005 DB_HOST=127.0.0.1.
+Con --rasa-replicas N se arrancan N réplicas en puertos consecutivos para
+probar el enrutado de `backend/rasa_router.py` (RASA_URLS); cada respuesta
+indica en `replica` el puerto que la atendió.
+"""
+
+import argparse
+import json
+import random
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RasaStubHandler(BaseHTTPRequestHandler):
+    """Imita los endpoints de Rasa que usa la pasarela."""
+
+    latency_ms = 50.0
+    jitter_ms = 20.0
+    error_rate = 0.0
+    model_load_ms = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self):
+        time.sleep(max(random.gauss(self.latency_ms, self.jitter_ms), 0) / 1000)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, messages):
+        """Respuesta del canal REST con ?stream=true: una línea JSON por mensaje, por trozos."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for message in messages:
+            line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path in ("/", "/status", "/health"):
+            self._send_json({"model_file": self._model_file(), "num_active_training_jobs": 0, "status": "ok"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _model_file(self):
+        return getattr(self.server, "model_file", "stub.tar.gz")
+
+    def do_PUT(self):
+        data = self._read_json()
+        if self.path.split("?")[0] == "/model" and data.get("model_file"):
+            time.sleep(self.model_load_ms / 1000)
+            self.server.model_file = data["model_file"].rsplit("/", 1)[-1]
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._send_json({"error": "bad request"}, 400)
+
+    def do_POST(self):
+        data = self._read_json()
+        self._delay()
+        if random.random() < self.error_rate:
+            self._send_json({"error": "stub error"}, 500)
+            return
+
+        path = self.path.split("?")[0]
+        if path == "/webhooks/rest/webhook":
+            messages = [{"recipient_id": data.get("sender", "default"),
+                         "text": f"Respuesta simulada a: {data.get('message', '')}",
+                         "replica": self.server.server_address[1], "model": self._model_file(),
+                         "preparsed": "parse_data" in data}]
+            if "stream=true" in self.path:
+                self._send_stream(messages)
+            else:
+                self._send_json(messages)
+        elif path == "/model/parse":
+            self._send_json(parse_result(data.get("text", "")))
+        elif path == "/model/parse_batch":
+            texts = data.get("texts", [])
+            self._send_json({"results": [parse_result(text) for text in texts],
+                             "model_file": self._model_file(), "batch_size": len(texts)})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+def parse_result(text):
+    return {"text": text, "intent": {"name": "consulta_general", "confidence": 0.9},
+            "entities": [], "intent_ranking": []}
+
+
+def start_rasa_stub(port, latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, host="0.0.0.0", model_load_ms=0.0):
+    """Arranca el sustituto de Rasa en un hilo y devuelve el servidor."""
+    handler = type("ConfiguredRasaStubHandler", (RasaStubHandler,), {
+        "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate,
+        "model_load_ms": model_load_ms,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Protocolo MySQL
+CLIENT_LONG_PASSWORD = 0x1
+CLIENT_PROTOCOL_41 = 0x200
+CLIENT_SECURE_CONNECTION = 0x8000
+CLIENT_PLUGIN_AUTH = 0x80000
+CLIENT_CONNECT_WITH_DB = 0x8
+CLIENT_TRANSACTIONS = 0x2000
+SERVER_CAPABILITIES = (CLIENT_LONG_PASSWORD | CLIENT_CONNECT_WITH_DB | CLIENT_PROTOCOL_41
+                       | CLIENT_TRANSACTIONS | CLIENT_SECURE_CONNECTION | CLIENT_PLUGIN_AUTH)
+
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0E
+
+
+def lenenc(value):
+    data = value.encode("utf-8") if isinstance(value, str) else value
+    if len(data) < 251:
+        return bytes([len(data)]) + data
+    return b"\xfc" + struct.pack("<H", len(data)) + data
+
+
+class MySQLStubHandler(socketserver.BaseRequestHandler):
+    """Atiende una conexión de cliente con el mínimo del protocolo MySQL."""
+
+    def send(self, sequence, payload):
+        self.request.sendall(struct.pack("<I", len(payload))[:3] + bytes([sequence & 0xFF]) + payload)
+
+    def receive(self):
+        header = self._read_exact(4)
+        if header is None:
+            return None, None
+        length = header[0] | header[1] << 8 | header[2] << 16
+        return header[3], self._read_exact(length)
+
+    def _read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def ok(self, sequence):
+        self.send(sequence, b"\x00\x00\x00\x02\x00\x00\x00")
+
+    def eof(self, sequence):
+        self.send(sequence, b"\xfe\x00\x00\x02\x00")
+
+    def result_one(self, sequence):
+        """Conjunto de resultados de una columna y una fila con el valor 1."""
+        column = (lenenc("def") + lenenc("") + lenenc("") + lenenc("") + lenenc("1") + lenenc("")
+                  + b"\x0c" + struct.pack("<HIBHB", 63, 1, 0x08, 0x81, 0) + b"\x00\x00")
+        self.send(sequence, b"\x01")
+        self.send(sequence + 1, column)
+        self.eof(sequence + 2)
+        self.send(sequence + 3, lenenc("1"))
+        self.eof(sequence + 4)
+
+    def handle(self):
+        salt = bytes(random.randint(33, 126) for _ in range(20))
+        handshake = (
+            b"\x0a" + b"8.0.0-stub\x00" + struct.pack("<I", threading.get_ident() & 0xFFFFFFFF)
+            + salt[:8] + b"\x00" + struct.pack("<H", SERVER_CAPABILITIES & 0xFFFF)
+            + b"\x21" + struct.pack("<H", 0x0002) + struct.pack("<H", SERVER_CAPABILITIES >> 16)
+            + bytes([21]) + b"\x00" * 10 + salt[8:] + b"\x00" + b"mysql_native_password\x00"
+        )
+        self.send(0, handshake)
+        sequence, _ = self.receive()
+        if sequence is None:
+            return
+        # Se acepta cualquier credencial
+        self.ok(sequence + 1)
+
+        while True:
+            _, packet = self.receive()
+            if not packet:
+                return
+            command = packet[0]
+            if command == COM_QUIT:
+                return
+            if command == COM_QUERY and packet[1:].lstrip().upper().startswith((b"SELECT", b"SHOW")):
+                self.result_one(1)
+            else:
+                self.ok(1)
+
+
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_mysql_stub(port, host="0.0.0.0"):
+    """Arranca el sustituto de MySQL en un hilo y devuelve el servidor."""
+    server = ThreadingTCPServer((host, port), MySQLStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustitutos de Rasa y MySQL para pruebas de carga")
+    parser.add_argument("--rasa-port", type=int, default=5005, help="0 para no arrancarlo")
+    parser.add_argument("--rasa-replicas", type=int, default=1,
+                        help="Réplicas de Rasa en puertos consecutivos desde --rasa-port")
+    parser.add_argument("--actions-port", type=int, default=0, help="Sustituto del servidor de acciones (/health)")
+    parser.add_argument("--mysql-port", type=int, default=3306, help="0 para no arrancarlo")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia media de Rasa")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Desviación típica de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de respuestas 500")
+    args = parser.parse_args()
+
+    if args.rasa_port:
+        ports = range(args.rasa_port, args.rasa_port + args.rasa_replicas)
+        for port in ports:
+            start_rasa_stub(port, args.latency_ms, args.jitter_ms, args.error_rate)
+        print(f"🚀 Rasa simulado en los puertos {', '.join(map(str, ports))} "
+              f"({args.latency_ms:g} ± {args.jitter_ms:g} ms)")
+        if args.rasa_replicas > 1:
+            print(f"   RASA_URLS={','.join(f'http://localhost:{port}' for port in ports)}")
+    if args.actions_port:
+        start_rasa_stub(args.actions_port)
+        print(f"🚀 Servidor de acciones simulado en el puerto {args.actions_port}")
+    if args.mysql_port:
+        start_mysql_stub(args.mysql_port)
+        print(f"🚀 MySQL simulado en el puerto {args.mysql_port}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
-import os
 import logging
-import mysql.connector
-from mysql.connector import Error
 from dotenv import load_dotenv
 
+from .db import DatabaseError, execute, executemany, transaction
+from .singleflight import knowledge_base_lookups, normalize_query
+from .tracing import traced_action, db_span
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -15,39 +16,22 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configuración de la base de datos
-DB_HOST = os.getenv("DB_HOST", "db")
-DB_PORT = os.getenv("DB_PORT", "3306")
-DB_DATABASE = os.getenv("DB_DATABASE", "eduassistai")
-DB_USERNAME = os.getenv("DB_USERNAME", "eduassistai")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
-
 class ActionConsultaKnowledgeBase(Action):
     """Acción para consultar la base de conocimiento."""
 
     def name(self) -> Text:
         return "action_consulta_knowledge_base"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @traced_action
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Obtener la consulta del usuario
         user_message = tracker.latest_message.get("text", "")
         
-        try:
-            # Conectar a la base de datos
-            connection = mysql.connector.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_DATABASE,
-                user=DB_USERNAME,
-                password=DB_PASSWORD
-            )
-            
-            if connection.is_connected():
-                cursor = connection.cursor(dictionary=True)
-                
+        async def buscar_respuesta():
+            async with transaction(dictionary=True) as cursor:
                 # Consultar la base de conocimiento
                 query = """
                 SELECT answer
@@ -56,21 +40,23 @@ class ActionConsultaKnowledgeBase(Action):
                 ORDER BY MATCH(question) AGAINST(%s IN NATURAL LANGUAGE MODE) DESC
                 LIMIT 1
                 """
-                cursor.execute(query, (user_message, user_message))
-                result = cursor.fetchone()
-                
-                if result:
-                    # Responder con la información encontrada
-                    dispatcher.utter_message(text=result["answer"])
-                else:
-                    # No se encontró información en la base de conocimiento
-                    dispatcher.utter_message(text="Lo siento, no tengo información específica sobre eso en mi base de conocimiento. ¿Hay algo más en lo que pueda ayudarte?")
-                
-                cursor.close()
-                connection.close()
-                
-        except Error as e:
-            logger.error(f"Error al conectar a la base de datos: {e}")
+                with db_span("select_knowledge_base"):
+                    await execute(cursor, query, (user_message, user_message))
+                    return await cursor.fetchone()
+        
+        try:
+            # Las preguntas idénticas simultáneas comparten una sola consulta
+            result = await knowledge_base_lookups.do(normalize_query(user_message), buscar_respuesta)
+            
+            if result:
+                # Responder con la información encontrada
+                dispatcher.utter_message(text=result["answer"])
+            else:
+                # No se encontró información en la base de conocimiento
+                dispatcher.utter_message(text="Lo siento, no tengo información específica sobre eso en mi base de conocimiento. ¿Hay algo más en lo que pueda ayudarte?")
+        
+        except DatabaseError as e:
+            logger.error(f"Error al consultar la base de datos: {e!r}")
             dispatcher.utter_message(text="Lo siento, ha ocurrido un error al consultar la información. Por favor, inténtalo de nuevo más tarde.")
         
         return []
@@ -81,9 +67,10 @@ class ActionRegistrarFeedback(Action):
     def name(self) -> Text:
         return "action_registrar_feedback"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @traced_action
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Obtener el rating del usuario (si existe)
         rating = next(tracker.get_latest_entity_values("rating"), None)
@@ -99,33 +86,19 @@ class ActionRegistrarFeedback(Action):
             return []
         
         try:
-            # Conectar a la base de datos
-            connection = mysql.connector.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_DATABASE,
-                user=DB_USERNAME,
-                password=DB_PASSWORD
-            )
-            
-            if connection.is_connected():
-                cursor = connection.cursor()
-                
+            async with transaction() as cursor:
                 # Registrar el feedback
                 query = """
                 INSERT INTO feedback (message_id, rating, comment)
                 VALUES (%s, %s, %s)
                 """
-                cursor.execute(query, (message_id, rating, user_message))
-                connection.commit()
-                
-                cursor.close()
-                connection.close()
-                
-                dispatcher.utter_message(text=f"¡Gracias por tu feedback! Has calificado con {rating} estrellas.")
-                
-        except Error as e:
-            logger.error(f"Error al conectar a la base de datos: {e}")
+                with db_span("insert_feedback"):
+                    await execute(cursor, query, (message_id, rating, user_message))
+            
+            dispatcher.utter_message(text=f"¡Gracias por tu feedback! Has calificado con {rating} estrellas.")
+        
+        except DatabaseError as e:
+            logger.error(f"Error al registrar el feedback en la base de datos: {e!r}")
             dispatcher.utter_message(text="Lo siento, ha ocurrido un error al registrar tu feedback. Por favor, inténtalo de nuevo más tarde.")
         
         # Limpiar el slot
@@ -137,9 +110,10 @@ class ActionGuardarMensaje(Action):
     def name(self) -> Text:
         return "action_guardar_mensaje"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @traced_action
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Obtener información del mensaje
         user_message = tracker.latest_message.get("text", "")
@@ -147,19 +121,12 @@ class ActionGuardarMensaje(Action):
         confidence = tracker.latest_message.get("intent", {}).get("confidence", 0.0)
         sender_id = tracker.sender_id
         
+        # Incluye los cursos y profesores del catálogo (gazetteer_extractor.py en el NLU)
+        entities = tracker.latest_message.get("entities", [])
+        
         try:
-            # Conectar a la base de datos
-            connection = mysql.connector.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_DATABASE,
-                user=DB_USERNAME,
-                password=DB_PASSWORD
-            )
-            
-            if connection.is_connected():
-                cursor = connection.cursor()
-                
+            # La conversación, el mensaje y sus entidades se guardan en una sola transacción
+            async with transaction() as cursor:
                 # Verificar si existe una conversación activa para este usuario
                 query = """
                 SELECT id FROM conversations
@@ -167,19 +134,27 @@ class ActionGuardarMensaje(Action):
                 ORDER BY started_at DESC
                 LIMIT 1
                 """
-                cursor.execute(query, (sender_id,))
-                result = cursor.fetchone()
+                with db_span("select_conversation"):
+                    await execute(cursor, query, (sender_id,))
+                    result = await cursor.fetchone()
                 
                 if result:
                     conversation_id = result[0]
+                    # Registrar actividad para que session_reaper no la cierre
+                    query = """
+                    UPDATE conversations SET last_activity_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                    """
+                    with db_span("touch_conversation"):
+                        await execute(cursor, query, (conversation_id,))
                 else:
                     # Crear una nueva conversación
                     query = """
                     INSERT INTO conversations (session_id)
                     VALUES (%s)
                     """
-                    cursor.execute(query, (sender_id,))
-                    connection.commit()
+                    with db_span("insert_conversation"):
+                        await execute(cursor, query, (sender_id,))
                     conversation_id = cursor.lastrowid
                 
                 # Guardar el mensaje
@@ -187,26 +162,26 @@ class ActionGuardarMensaje(Action):
                 INSERT INTO messages (conversation_id, sender, message, intent, confidence)
                 VALUES (%s, %s, %s, %s, %s)
                 """
-                cursor.execute(query, (conversation_id, "user", user_message, intent, confidence))
-                connection.commit()
+                with db_span("insert_message"):
+                    await execute(cursor, query, (conversation_id, "user", user_message, intent, confidence))
                 message_id = cursor.lastrowid
                 
                 # Guardar entidades
-                for entity in tracker.latest_message.get("entities", []):
+                if entities:
                     query = """
                     INSERT INTO entities (message_id, entity_name, entity_value, confidence)
                     VALUES (%s, %s, %s, %s)
                     """
-                    cursor.execute(query, (message_id, entity.get("entity"), entity.get("value"), entity.get("confidence", 0.0)))
-                    connection.commit()
-                
-                cursor.close()
-                connection.close()
-                
-                # Establecer el ID del último mensaje para posible feedback
-                return [SlotSet("last_message_id", message_id)]
-                
-        except Error as e:
-            logger.error(f"Error al conectar a la base de datos: {e}")
+                    rows = [(message_id, entity.get("entity"), entity.get("value"),
+                             entity.get("confidence_entity", entity.get("confidence", 0.0)))
+                            for entity in entities]
+                    with db_span("insert_entities", count=len(rows)):
+                        await executemany(cursor, query, rows)
+            
+            # Establecer el ID del último mensaje para posible feedback
+            return [SlotSet("last_message_id", message_id)]
+        
+        except DatabaseError as e:
+            logger.error(f"Error al guardar el mensaje en la base de datos: {e!r}")
         
         return []
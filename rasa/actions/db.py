@@ -0,0 +1,103 @@
+"""
+Acceso asíncrono a MySQL para las acciones.
+
+Las acciones comparten un pool de conexiones aiomysql creado en el bucle de
+eventos del servidor de acciones, de modo que mientras una consulta espera a
+la base de datos el servidor puede atender otras acciones. Cada consulta
+tiene un tiempo máximo; si se agota, la conexión se cierra en lugar de
+devolverse al pool, porque queda en un estado desconocido.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Sequence, Text
+
+import aiomysql
+from dotenv import load_dotenv
+
+from .tracing import db_span
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración de la base de datos
+DB_HOST = os.getenv("DB_HOST", "db")
+DB_PORT = int(os.getenv("DB_PORT", "3306"))
+DB_DATABASE = os.getenv("DB_DATABASE", "eduassistai")
+DB_USERNAME = os.getenv("DB_USERNAME", "eduassistai")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "5"))
+
+# Errores de base de datos que las acciones deben capturar
+DatabaseError = (aiomysql.Error, asyncio.TimeoutError)
+
+_pool: Optional[aiomysql.Pool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_pool() -> aiomysql.Pool:
+    """Devuelve el pool del bucle de eventos actual, creándolo la primera vez."""
+    global _pool, _pool_loop, _pool_lock
+    loop = asyncio.get_running_loop()
+    if _pool is not None and _pool_loop is loop:
+        return _pool
+    if _pool_lock is None or _pool_loop is not loop:
+        _pool_lock = asyncio.Lock()
+        _pool_loop = loop
+        _pool = None
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncio.wait_for(aiomysql.create_pool(
+                host=DB_HOST,
+                port=DB_PORT,
+                db=DB_DATABASE,
+                user=DB_USERNAME,
+                password=DB_PASSWORD,
+                minsize=DB_POOL_MIN_SIZE,
+                maxsize=DB_POOL_MAX_SIZE,
+                charset="utf8mb4",
+                autocommit=False,
+                connect_timeout=DB_QUERY_TIMEOUT,
+                pool_recycle=3600,
+            ), DB_QUERY_TIMEOUT)
+    return _pool
+
+
+@asynccontextmanager
+async def transaction(dictionary: bool = False) -> AsyncIterator[Any]:
+    """
+    Cursor sobre una conexión del pool que se confirma al salir sin errores.
+
+    Args:
+        dictionary: Si es True, las filas se devuelven como diccionarios.
+    """
+    with db_span("acquire"):
+        pool = await get_pool()
+        connection = await asyncio.wait_for(pool.acquire(), DB_QUERY_TIMEOUT)
+    try:
+        cursor = await connection.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor)
+        try:
+            yield cursor
+            await asyncio.wait_for(connection.commit(), DB_QUERY_TIMEOUT)
+        finally:
+            await cursor.close()
+    except BaseException:
+        # Tras un error o un tiempo agotado no se reutiliza la conexión
+        connection.close()
+        raise
+    finally:
+        pool.release(connection)
+
+
+async def execute(cursor: Any, query: Text, params: Optional[Sequence[Any]] = None) -> int:
+    """Ejecuta una consulta con el tiempo máximo configurado."""
+    return await asyncio.wait_for(cursor.execute(query, params), DB_QUERY_TIMEOUT)
+
+
+async def executemany(cursor: Any, query: Text, rows: Sequence[Sequence[Any]]) -> int:
+    """Ejecuta una inserción de varias filas en una sola sentencia, con tiempo máximo."""
+    return await asyncio.wait_for(cursor.executemany(query, rows), DB_QUERY_TIMEOUT)
@@ -0,0 +1,395 @@
+"""
+Extracción de cursos y profesores con un diccionario construido desde la base de datos.
+
+DIET aprende las entidades `curso` y `profesor` de unos pocos ejemplos,
+mientras que los nombres reales están en `subjects` y en `users` (rol
+`teacher`). Este módulo los compila en un trie de palabras normalizadas (sin
+acentos ni mayúsculas) y busca en cada mensaje la coincidencia más larga
+desde cada palabra, de modo que el coste depende de la longitud del mensaje
+y no del tamaño del catálogo.
+
+- Cursos: nombre y código de la asignatura.
+- Profesores: nombre completo, nombre y primer apellido, y primer apellido
+  solo. Si un alias corresponde a varios profesores no se extrae. Muchos
+  apellidos son también palabras corrientes ("blanco", "flores", "campos"),
+  así que el apellido solo se acepta detrás de un tratamiento ("profe",
+  "profesora", "maestro", "dr"...) o escrito con mayúscula.
+- Errores de escritura: una palabra de al menos GAZETTEER_FUZZY_MIN_LENGTH
+  letras que no está en el diccionario se acepta con una edición de
+  diferencia (sustitución, inserción, borrado o trasposición), salvo que sea
+  una palabra corriente del español (COMMON_WORDS): "electrónico" no es una
+  errata de "Electrónica". Los candidatos salen de un índice de borrados
+  (cada palabra del diccionario con una letra menos), sin recorrer el
+  vocabulario.
+
+El diccionario lo usa el componente de NLU `CatalogGazetteerExtractor`
+(rasa/gazetteer_extractor.py), que lo carga al arrancar y lo actualiza en
+segundo plano cada GAZETTEER_REFRESH_INTERVAL segundos leyendo solo las
+filas con `updated_at` posterior a la última carga. Las filas borradas no
+aparecen así, de modo que en cada actualización se leen también los
+identificadores vigentes y se quitan las entradas que ya no están.
+
+`ubicacion` no tiene tabla de origen y sigue dependiendo de DIET.
+
+El rendimiento con catálogos grandes se mide con
+`benchmarks/bench_gazetteer.py`.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Text, Tuple
+
+from .db import execute, transaction
+from .keyword_stats import SPANISH_STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Configuración del diccionario de entidades
+GAZETTEER_REFRESH_INTERVAL = float(os.getenv("GAZETTEER_REFRESH_INTERVAL", "60"))
+GAZETTEER_FUZZY_MIN_LENGTH = int(os.getenv("GAZETTEER_FUZZY_MIN_LENGTH", "5"))
+
+# Confianza de las coincidencias exactas y con errores de escritura
+EXACT_CONFIDENCE = 1.0
+FUZZY_CONFIDENCE = 0.85
+
+# Alias de una sola palabra más cortos que esto se descartan (p. ej. "de", "la")
+MIN_ALIAS_LENGTH = 4
+
+EXTRACTOR_NAME = "Gazetteer"
+
+# Tratamientos que preceden al apellido de un profesor (sin acentos)
+TEACHER_TITLES = frozenset("""
+profe profes profesor profesora maestro maestra docente dr dra doctor doctora lic licenciado licenciada
+ing ingeniero ingeniera don dona sr sra senor senora
+""".split())
+
+# Palabras corrientes (sin acentos) que no se corrigen como errores de
+# escritura: se parecen a apellidos o a nombres de asignaturas sin serlo
+COMMON_WORDS = frozenset("""
+blanco blanca blancos blancas negro negra negros negras moreno morena morenos rubio rubia rubios calvo calva
+delgado delgada serrano serrana bravo brava campo campos flores florez rosas ramos torres iglesias morales
+cruces castillo castillos prado prados vegas montes fuentes puentes navarro santos reyes leones lobos pastor
+herrero herrera molino molinos rios playa playas sierra sierras valle valles mayor mayores nuevo nueva nuevos
+nuevas grande grandes largo larga corto corta alto alta altos bajo baja bajos mejor mejores peor primero
+primera segundo segunda tercero tercera ultimo ultima ultimos ultimas general especial normal simple
+electronico electronica electronicos correo correos mensaje mensajes pagina paginas numero numeros
+telefono telefonos horario horarios examen examenes clase clases curso cursos materia materias nota notas
+tarea tareas trabajo trabajos grupo grupos salon salones aula aulas edificio edificios oficina oficinas
+biblioteca semestre semana semanas manana tarde noche lunes martes miercoles jueves viernes sabado domingo
+enero febrero marzo abril mayo junio julio agosto septiembre octubre noviembre diciembre tiempo momento
+problema problemas pregunta preguntas respuesta respuestas informacion ayuda gracias favor persona personas
+estudiante estudiantes alumno alumna alumnos alumnas profesor profesora profesores profesoras maestro
+maestra maestros maestras director directora escuela colegio universidad facultad carrera carreras
+programa programas proyecto proyectos practica practicas teoria laboratorio documento documentos archivo
+archivos certificado certificados tramite tramites pago pagos dinero precio precios cuenta cuentas
+sistema sistemas campus centro ciudad calle casa casas puerta puertas mundo forma formas parte partes
+lugar lugares cosas ejemplo ejemplos verdad bueno buena buenos buenas malo mala malos malas claro clara
+cierto cierta rapido rapida lento lenta facil dificil posible importante necesario necesaria
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=50000)
+def normalize_token(token: Text) -> Text:
+    """Palabra en minúsculas y sin acentos."""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: Text) -> List[Tuple[Text, int, int]]:
+    """Palabras normalizadas del texto con su posición en el original."""
+    return [(normalize_token(m.group()), m.start(), m.end()) for m in _TOKEN_RE.finditer(text or "")]
+
+
+def _deletions(token: Text) -> Set[Text]:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def within_one_edit(a: Text, b: Text) -> bool:
+    """Si `a` y `b` difieren en como mucho una edición (incluida la trasposición de dos letras)."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diffs = [i for i in range(la) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if la > lb:
+        a, b = b, a
+    # b tiene una letra más: debe coincidir con a al quitarle una
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: Dict[Text, "_Node"] = {}
+        # clave -> (entidad, valor, necesita contexto)
+        self.values: Dict[Text, Tuple[Text, Text, bool]] = {}
+
+
+class GuardedPhrase(str):
+    """Alias que solo se acepta detrás de un tratamiento o escrito con mayúscula."""
+
+
+def subject_phrases(name: Text, code: Optional[Text]) -> List[Text]:
+    return [phrase for phrase in (name, code) if phrase]
+
+
+def teacher_phrases(name: Text) -> List[Text]:
+    """Nombre completo, nombre y primer apellido, y primer apellido solo (con contexto)."""
+    words = (name or "").split()
+    if len(words) < 2:
+        return words
+    # Con dos apellidos el primero es la penúltima palabra ("María José García López")
+    surname = words[-2] if len(words) >= 3 else words[-1]
+    if len(surname) < MIN_ALIAS_LENGTH or normalize_token(surname) in SPANISH_STOPWORDS:
+        return [" ".join(words)]
+    return [" ".join(words), f"{words[0]} {surname}", GuardedPhrase(surname)]
+
+
+class Gazetteer:
+    """Trie de frases del catálogo con búsqueda exacta y tolerante a una edición por palabra."""
+
+    def __init__(self, fuzzy_min_length: int = GAZETTEER_FUZZY_MIN_LENGTH) -> None:
+        self.fuzzy_min_length = fuzzy_min_length
+        self._root = _Node()
+        # clave -> (entidad, valor, frases normalizadas)
+        self._entries: Dict[Text, Tuple[Text, Text, List[Tuple[Text, ...]]]] = {}
+        self._vocabulary: Counter = Counter()
+        self._deletes: Dict[Text, Set[Text]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Text) -> bool:
+        return key in self._entries
+
+    def add(self, key: Text, entity: Text, value: Text, phrases: Iterable[Text]) -> None:
+        """Añade o reemplaza una entrada; `key` la identifica en actualizaciones posteriores."""
+        self.remove(key)
+        normalized = []
+        for phrase in phrases:
+            tokens = tuple(token for token, _, _ in tokenize(phrase))
+            # Los alias de una palabra muy corta o vacía darían falsos positivos
+            if not tokens or (len(tokens) == 1 and (len(tokens[0]) < MIN_ALIAS_LENGTH
+                                                    or tokens[0] in SPANISH_STOPWORDS)):
+                continue
+            if tokens in normalized:
+                continue
+            normalized.append(tokens)
+            node = self._root
+            for token in tokens:
+                node = node.children.setdefault(token, _Node())
+                self._add_word(token)
+            node.values[key] = (entity, value, isinstance(phrase, GuardedPhrase))
+        if normalized:
+            self._entries[key] = (entity, value, normalized)
+
+    def remove(self, key: Text) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tokens in entry[2]:
+            path = [self._root]
+            for token in tokens:
+                path.append(path[-1].children[token])
+                self._remove_word(token)
+            path[-1].values.pop(key, None)
+            # Se podan los nodos que quedaron vacíos
+            for depth in range(len(tokens), 0, -1):
+                node = path[depth]
+                if node.values or node.children:
+                    break
+                del path[depth - 1].children[tokens[depth - 1]]
+
+    def _add_word(self, token: Text) -> None:
+        self._vocabulary[token] += 1
+        if self._vocabulary[token] == 1 and len(token) >= self.fuzzy_min_length:
+            for deletion in _deletions(token):
+                self._deletes[deletion].add(token)
+
+    def _remove_word(self, token: Text) -> None:
+        self._vocabulary[token] -= 1
+        if self._vocabulary[token] > 0:
+            return
+        del self._vocabulary[token]
+        if len(token) >= self.fuzzy_min_length:
+            for deletion in _deletions(token):
+                words = self._deletes.get(deletion)
+                if words is not None:
+                    words.discard(token)
+                    if not words:
+                        del self._deletes[deletion]
+
+    def similar_words(self, token: Text) -> Set[Text]:
+        """Palabras del diccionario a una edición de `token` (sin incluirla)."""
+        if len(token) < self.fuzzy_min_length or token in COMMON_WORDS or token in SPANISH_STOPWORDS:
+            return set()
+        # Mismo índice para los tres casos: borrado en el diccionario (token),
+        # borrado en el mensaje (deletions ∈ vocabulario) y sustitución o
+        # trasposición (borrados en ambos lados)
+        candidates = set(self._deletes.get(token, ()))
+        for deletion in _deletions(token):
+            if deletion in self._vocabulary:
+                candidates.add(deletion)
+            candidates.update(self._deletes.get(deletion, ()))
+        candidates.discard(token)
+        return {word for word in candidates if within_one_edit(token, word)}
+
+    def extract(self, text: Text) -> List[Dict[Text, Any]]:
+        """
+        Entidades del catálogo en el texto, en el formato de Rasa.
+
+        Se toma la coincidencia más larga desde cada palabra y se continúa
+        después de ella; las coincidencias ambiguas (el mismo alias para dos
+        valores de la misma entidad) se descartan, y los alias con contexto
+        (GuardedPhrase) solo cuentan detrás de un tratamiento o con mayúscula.
+        """
+        tokens = tokenize(text)
+        similar: Dict[Text, Set[Text]] = {}
+        entities = []
+        i = 0
+        while i < len(tokens):
+            node, j, fuzzy = self._root, i, False
+            best = None
+            while j < len(tokens):
+                token = tokens[j][0]
+                child = node.children.get(token)
+                if child is None and token not in self._vocabulary:
+                    if token not in similar:
+                        similar[token] = self.similar_words(token)
+                    for word in similar[token]:
+                        child = node.children.get(word)
+                        if child is not None:
+                            fuzzy = True
+                            break
+                if child is None:
+                    break
+                node, j = child, j + 1
+                if node.values:
+                    values = [(entity, value) for entity, value, guarded in node.values.values()
+                              if not guarded or self._in_context(text, tokens, i)]
+                    if values:
+                        best = (j, values, fuzzy)
+            if best is None:
+                i += 1
+                continue
+
+            end, values, fuzzy = best
+            by_entity = defaultdict(set)
+            for entity, value in values:
+                by_entity[entity].add(value)
+            for entity, found in by_entity.items():
+                if len(found) != 1:
+                    continue
+                entities.append({
+                    "entity": entity,
+                    "value": found.pop(),
+                    "start": tokens[i][1],
+                    "end": tokens[end - 1][2],
+                    "confidence_entity": FUZZY_CONFIDENCE if fuzzy else EXACT_CONFIDENCE,
+                    "extractor": EXTRACTOR_NAME,
+                })
+            i = end
+        return entities
+
+
+    @staticmethod
+    def _in_context(text: Text, tokens: List[Tuple[Text, int, int]], i: int) -> bool:
+        """Si la palabra `i` va detrás de un tratamiento o está escrita con mayúscula."""
+        if i > 0 and tokens[i - 1][0] in TEACHER_TITLES:
+            return True
+        return text[tokens[i][1]].isupper()
+
+
+def merge_entities(entities: List[Dict[Text, Any]], found: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+    """Entidades del diccionario de tipos que el modelo no extrajo."""
+    extracted = {entity.get("entity") for entity in entities}
+    return [entity for entity in found if entity["entity"] not in extracted]
+
+
+class CatalogGazetteer(Gazetteer):
+    """
+    Diccionario de `subjects` y profesores de `users`, actualizado por `updated_at`.
+
+    `refresh` y `extract` pueden llamarse desde hilos distintos.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._since: Dict[Text, Optional[datetime]] = {"subjects": None, "users": None}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def refresh(self, full: bool = False) -> None:
+        """Aplica las filas cambiadas desde la última carga (o todas con `full`) y quita las borradas."""
+        since = {"subjects": None, "users": None} if full else dict(self._since)
+        async with transaction() as cursor:
+            await execute(cursor, "SELECT id, name, code, updated_at FROM subjects" + self._changed(since, "subjects"),
+                          self._params(since, "subjects"))
+            subjects = await cursor.fetchall()
+            await execute(cursor, "SELECT id, name, role, updated_at FROM users" + self._changed(since, "users"),
+                          self._params(since, "users"))
+            users = await cursor.fetchall()
+            # Después de las filas cambiadas: una fila nueva leída arriba está en estos identificadores
+            await execute(cursor, "SELECT id FROM subjects")
+            current = {f"subject:{row[0]}" for row in await cursor.fetchall()}
+            await execute(cursor, "SELECT id FROM users WHERE role = 'teacher'")
+            current.update(f"user:{row[0]}" for row in await cursor.fetchall())
+
+        with self._lock:
+            if full:
+                self._root = _Node()
+                self._entries.clear()
+                self._vocabulary.clear()
+                self._deletes.clear()
+            for subject_id, name, code, updated_at in subjects:
+                self.add(f"subject:{subject_id}", "curso", name, subject_phrases(name, code))
+                since["subjects"] = max(since["subjects"] or updated_at, updated_at)
+            for user_id, name, role, updated_at in users:
+                if role == "teacher":
+                    self.add(f"user:{user_id}", "profesor", name, teacher_phrases(name))
+                else:
+                    self.remove(f"user:{user_id}")
+                since["users"] = max(since["users"] or updated_at, updated_at)
+            removed = [key for key in self._entries if key not in current]
+            for key in removed:
+                self.remove(key)
+            self._since = since
+            self._loaded_at = time.monotonic()
+        logger.debug("Diccionario de entidades: %d entradas (%d cursos y %d profesores nuevos o cambiados, "
+                     "%d borrados)", len(self), len(subjects), len(users), len(removed))
+
+    @staticmethod
+    def _changed(since: Dict[Text, Optional[datetime]], table: Text) -> Text:
+        # Con >= se releen las filas del último segundo, que pudieron confirmarse después de leerlo
+        return " WHERE updated_at >= %s" if since[table] is not None else ""
+
+    @staticmethod
+    def _params(since: Dict[Text, Optional[datetime]], table: Text) -> Tuple[Any, ...]:
+        return (since[table],) if since[table] is not None else ()
+
+    def extract(self, text: Text) -> List[Dict[Text, Any]]:
+        with self._lock:
+            return super().extract(text)
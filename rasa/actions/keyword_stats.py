@@ -0,0 +1,389 @@
+"""
+Palabras clave más frecuentes de los mensajes, con memoria acotada.
+
+Un proceso periódico (`python -m actions.keyword_stats --interval 60`, el
+servicio `keyword-stats` de docker-compose) lee de `messages` los mensajes
+de usuario posteriores al último procesado, que se guarda en
+`batch_job_state`, los haya guardado el panel (`logMessage`) o
+`ActionGuardarMensaje`. Cada mensaje se divide en palabras, se eliminan las
+palabras vacías del español y se reduce cada palabra a su raíz
+(SnowballStemmer de NLTK si está instalado), de modo que "inscripción" e
+"inscripciones" cuentan juntas. Las raíces se cuentan con un resumen
+Space-Saving por día: guarda como mucho `capacity` contadores y garantiza
+que toda palabra con frecuencia mayor que N/capacity está entre ellos, con
+un error máximo conocido por contador.
+
+Se mantiene un único resumen por día. Tras cada lote de mensajes se suma a
+`keyword_frequency`, con un único INSERT, lo que ha crecido desde el
+volcado anterior la cuenta garantizada (cuenta - error) de las `top_n`
+palabras del día y de las ya volcadas, en la misma transacción que el
+último mensaje procesado. Como solo se suman apariciones garantizadas y
+nunca dos veces, la tabla es una cota inferior del recuento real; tras un
+reinicio se pierde lo que no se había volcado, pero no se cuenta dos veces.
+La palabra guardada es la forma más habitual con la que apareció la raíz la
+primera vez que se volcó, no la raíz misma. Los resúmenes de días pasados
+se descartan tras su último volcado.
+
+La precisión frente a un recuento exacto se mide con
+`benchmarks/bench_keyword_sketch.py`.
+"""
+
+import argparse
+import asyncio
+import atexit
+import heapq
+import logging
+import os
+import re
+import time
+import unicodedata
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Text, Tuple
+
+from .db import DatabaseError, execute, executemany, transaction
+
+logger = logging.getLogger(__name__)
+
+try:
+    from nltk.stem.snowball import SnowballStemmer
+    _stemmer = SnowballStemmer("spanish")
+    NLTK_AVAILABLE = True
+except ImportError:
+    _stemmer = None
+    NLTK_AVAILABLE = False
+
+# Configuración del recuento de palabras clave
+KEYWORD_SKETCH_CAPACITY = int(os.getenv("KEYWORD_SKETCH_CAPACITY", "2000"))
+KEYWORD_TOP_N = int(os.getenv("KEYWORD_TOP_N", "100"))
+KEYWORD_FLUSH_INTERVAL = float(os.getenv("KEYWORD_FLUSH_INTERVAL", "60"))
+KEYWORD_MIN_LENGTH = int(os.getenv("KEYWORD_MIN_LENGTH", "3"))
+KEYWORD_BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", "1000"))
+
+# Punto de control en batch_job_state
+JOB_NAME = "keyword_stats"
+
+# Palabras vacías del español (sin acentos; se comparan con la palabra sin acentos)
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun aunque bien cada como con contra cual
+cuales cuando cuanto de del desde donde dos el ella ellas ello ellos en entre era erais eran eras eres es esa
+esas ese eso esos esta estaba estado estais estamos estan estar estas este esto estos estoy fue fueron fui
+fuimos ha habia haber hace hacer hago han has hasta hay he la las le les lo los mas me mi mis mucho muchos muy
+nada ni no nos nosotros o os otra otras otro otros para pero poco por porque puede puedo pues que quien quienes
+se sea ser si sido siempre sin sobre sois solo somos son soy su sus tambien tanto te tener tengo ti tiene
+tienen toda todas todo todos tu tus un una uno unos usted ustedes va vamos van vosotros y ya yo
+hola gracias favor buenos buenas dias tardes noches quiero quisiera necesito saber podrias puedes dime
+""".split())
+
+WORD = re.compile(r"[^\W\d_]+")
+
+
+def strip_accents(text: Text) -> Text:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def stem(word: Text) -> Text:
+    """Raíz de una palabra en minúsculas; sin NLTK solo se quitan los plurales."""
+    if _stemmer is not None:
+        return strip_accents(_stemmer.stem(word))
+    word = strip_accents(word)
+    if word.endswith("ces") and len(word) > 4:
+        return word[:-3] + "z"
+    if word.endswith("es") and len(word) > 4 and word[-3] not in "aeiou":
+        return word[:-2]
+    if word.endswith("s") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def extract_keywords(text: Text) -> List[Tuple[Text, Text]]:
+    """
+    Palabras clave de un mensaje.
+
+    Returns:
+        Lista de pares (raíz, forma original en minúsculas).
+    """
+    keywords = []
+    for word in WORD.findall(text.lower()):
+        plain = strip_accents(word)
+        if len(plain) < KEYWORD_MIN_LENGTH or plain in SPANISH_STOPWORDS:
+            continue
+        keywords.append((stem(word), word))
+    return keywords
+
+
+class SpaceSaving:
+    """
+    Resumen Space-Saving de los elementos más frecuentes de un flujo.
+
+    Con `capacity` contadores, la cuenta estimada de cada elemento supera a la
+    real como mucho en su `error`, y este no pasa de N/capacity. Cada contador
+    recuerda además cuánto de su cuenta garantizada se ha volcado ya.
+    """
+
+    # Formas distintas que se recuerdan por raíz
+    MAX_SURFACES = 4
+
+    def __init__(self, capacity: int = KEYWORD_SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        # clave -> [cuenta, error, {forma: cuenta}, cuenta volcada, forma volcada]
+        self.counters: Dict[Text, List] = {}
+        self._heap: List[Tuple[int, Text]] = []
+
+    def add(self, key: Text, surface: Optional[Text] = None, count: int = 1) -> None:
+        self.total += count
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = [0, 0, {}, 0, None]
+            else:
+                # Se sustituye el contador mínimo; el nuevo hereda su cuenta como
+                # error, así su cuenta garantizada empieza en cero
+                minimum, evicted = self._pop_min()
+                del self.counters[evicted]
+                counter = [minimum, minimum, {}, 0, None]
+            self.counters[key] = counter
+        counter[0] += count
+        if surface is not None:
+            surfaces = counter[2]
+            if surface in surfaces or len(surfaces) < self.MAX_SURFACES:
+                surfaces[surface] = surfaces.get(surface, 0) + count
+        heapq.heappush(self._heap, (counter[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c[0], k) for k, c in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[int, Text]:
+        # Las entradas del montículo cuya cuenta ya no coincide están obsoletas
+        while True:
+            count, key = heapq.heappop(self._heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == count:
+                return count, key
+
+    def top(self, n: int) -> List[Tuple[Text, Text, int, int]]:
+        """
+        Los `n` elementos con mayor cuenta estimada.
+
+        Returns:
+            Lista de (clave, forma más habitual, cuenta estimada, error máximo).
+        """
+        items = heapq.nlargest(n, self.counters.items(), key=lambda item: item[1][0])
+        return [(key, self._surface(key, counter), counter[0], counter[1]) for key, counter in items]
+
+    @staticmethod
+    def _surface(key: Text, counter: List) -> Text:
+        return max(counter[2], key=counter[2].get) if counter[2] else key
+
+    def unflushed(self, n: int) -> List[Tuple[List, Text, int]]:
+        """
+        Cuenta garantizada aún sin volcar de los `n` elementos más frecuentes y
+        de los que ya se volcaron alguna vez.
+
+        Returns:
+            Lista de (contador, forma, incremento); se confirman con `mark_flushed`.
+        """
+        counters = {key: counter for key, counter in self.counters.items() if counter[3]}
+        counters.update(heapq.nlargest(n, self.counters.items(), key=lambda item: item[1][0]))
+        pending = []
+        for key, counter in counters.items():
+            delta = counter[0] - counter[1] - counter[3]
+            if delta > 0:
+                pending.append((counter, counter[4] or self._surface(key, counter), delta))
+        return pending
+
+    @staticmethod
+    def mark_flushed(pending: Iterable[Tuple[List, Text, int]]) -> None:
+        """Anota como volcados los incrementos de `unflushed`."""
+        for counter, surface, delta in pending:
+            # Si el contador se sustituyó entretanto, ya no está en el resumen y no importa
+            counter[3] += delta
+            counter[4] = surface
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+
+class KeywordTracker:
+    """Cuenta las palabras clave por día y las vuelca en `keyword_frequency`."""
+
+    def __init__(self, capacity: int = KEYWORD_SKETCH_CAPACITY, top_n: int = KEYWORD_TOP_N,
+                 flush_interval: float = KEYWORD_FLUSH_INTERVAL):
+        self.capacity = capacity
+        self.top_n = top_n
+        self.flush_interval = flush_interval
+        self.sketches: Dict[date, SpaceSaving] = {}
+        # Último mensaje de `messages` contado; se guarda con cada volcado
+        self.last_message_id: Optional[int] = None
+        self._last_flush = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+        atexit.register(self._flush_on_exit)
+
+    def record(self, text: Text, day: Optional[date] = None, message_id: Optional[int] = None) -> None:
+        """Añade las palabras clave de un mensaje y programa el volcado si toca."""
+        if message_id is not None:
+            self.last_message_id = message_id
+        day = day or date.today()
+        sketch = self.sketches.get(day)
+        if sketch is None:
+            sketch = self.sketches[day] = SpaceSaving(self.capacity)
+        for key, surface in extract_keywords(text):
+            sketch.add(key, surface)
+
+        if time.monotonic() - self._last_flush >= self.flush_interval and (
+                self._flush_task is None or self._flush_task.done()):
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                # Sin bucle de eventos (scripts, pruebas): se vuelca al salir
+                pass
+
+    def take_rows(self) -> Tuple[List[Tuple[date, Text, int]], List[Tuple[date, List]]]:
+        """
+        Filas (fecha, palabra, incremento) con lo que falta por volcar de cada día.
+
+        Returns:
+            Las filas y los incrementos a confirmar con `commit_rows` tras escribirlas.
+        """
+        self._last_flush = time.monotonic()
+        rows, pending = [], []
+        for day, sketch in self.sketches.items():
+            day_pending = sketch.unflushed(self.top_n)
+            merged: Dict[Text, int] = {}
+            for _, surface, delta in day_pending:
+                # Raíces distintas pueden compartir forma al truncarse
+                keyword = surface[:100]
+                merged[keyword] = merged.get(keyword, 0) + delta
+            rows.extend((day, keyword, count) for keyword, count in merged.items())
+            pending.append((day, day_pending))
+        return rows, pending
+
+    def commit_rows(self, pending: List[Tuple[date, List]]) -> None:
+        """Confirma los incrementos escritos y descarta los resúmenes de días pasados."""
+        today = date.today()
+        for day, day_pending in pending:
+            SpaceSaving.mark_flushed(day_pending)
+            if day < today:
+                self.sketches.pop(day, None)
+
+    async def flush(self) -> int:
+        """
+        Suma a `keyword_frequency` los incrementos de cada día en una sola
+        sentencia, junto con el último mensaje contado.
+        """
+        rows, pending = self.take_rows()
+        checkpoint = self.last_message_id
+        if rows or checkpoint is not None:
+            query = """
+            INSERT INTO keyword_frequency (date, keyword, count)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE count = count + VALUES(count)
+            """
+            try:
+                async with transaction() as cursor:
+                    if rows:
+                        await executemany(cursor, query, rows)
+                    if checkpoint is not None:
+                        await execute(
+                            cursor,
+                            """
+                            INSERT INTO batch_job_state (job, last_message_id) VALUES (%s, %s)
+                            ON DUPLICATE KEY UPDATE last_message_id = VALUES(last_message_id)
+                            """,
+                            (JOB_NAME, checkpoint),
+                        )
+            except DatabaseError as e:
+                # Los incrementos siguen pendientes y se reintentan en el siguiente volcado
+                logger.error(f"Error al guardar las palabras clave: {e!r}")
+                return 0
+        self.commit_rows(pending)
+        return len(rows)
+
+    def _flush_on_exit(self) -> None:
+        if not self.sketches:
+            return
+        try:
+            asyncio.run(self.flush())
+        except Exception as e:
+            logger.error(f"No se pudieron guardar las palabras clave al salir: {e}")
+
+
+    async def count_new_messages(self, batch_size: int = KEYWORD_BATCH_SIZE) -> int:
+        """
+        Cuenta los mensajes de usuario guardados desde el último procesado,
+        volcando tras cada lote.
+
+        Returns:
+            Número de mensajes contados.
+        """
+        counted = 0
+        async with transaction() as cursor:
+            time_column = await message_time_column(cursor)
+            if self.last_message_id is None:
+                await execute(cursor, "SELECT last_message_id FROM batch_job_state WHERE job = %s", (JOB_NAME,))
+                row = await cursor.fetchone()
+                self.last_message_id = row[0] if row else 0
+        while True:
+            async with transaction() as cursor:
+                await execute(
+                    cursor,
+                    f"""
+                    SELECT id, message, DATE(`{time_column}`)
+                    FROM messages
+                    WHERE id > %s AND sender = 'user'
+                    ORDER BY id
+                    LIMIT %s
+                    """,
+                    (self.last_message_id, batch_size),
+                )
+                rows = await cursor.fetchall()
+            for message_id, text, day in rows:
+                self.record(text or "", day, message_id)
+            counted += len(rows)
+            if rows:
+                await self.flush()
+            if len(rows) < batch_size:
+                return counted
+
+
+async def message_time_column(cursor) -> Text:
+    """Columna de fecha de `messages`, que difiere entre los esquemas del proyecto."""
+    await execute(cursor, "SHOW COLUMNS FROM messages LIKE 'timestamp'")
+    return "timestamp" if await cursor.fetchone() else "created_at"
+
+
+def exact_counts(texts: Iterable[Text]) -> Dict[Text, int]:
+    """Recuento exacto por raíz, como referencia para medir la precisión del resumen."""
+    counts: Dict[Text, int] = {}
+    for text in texts:
+        for key, _ in extract_keywords(text):
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+async def run(interval: float, batch_size: int) -> None:
+    # El volcado lo hace count_new_messages tras cada lote
+    tracker = KeywordTracker(flush_interval=float("inf"))
+    while True:
+        start = time.time()
+        try:
+            counted = await tracker.count_new_messages(batch_size)
+            print(f"🔑 {counted} mensajes contados en {time.time() - start:.1f} s")
+        except DatabaseError as e:
+            logger.error(f"Error al leer los mensajes nuevos: {e!r}")
+        if not interval:
+            break
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recuento de palabras clave de los mensajes")
+    parser.add_argument("--batch-size", type=int, default=KEYWORD_BATCH_SIZE,
+                        help="Mensajes leídos por lote")
+    parser.add_argument("--interval", type=float, default=0, help="Repetir cada N segundos (0 = una sola vez)")
+    args = parser.parse_args()
+    asyncio.run(run(args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Agrupación de consultas idénticas simultáneas ("single-flight").
+
+Cuando muchos estudiantes hacen la misma pregunta a la vez, solo la primera
+petición consulta la base de datos; las demás esperan ese mismo resultado.
+El resultado se guarda además unos segundos, de modo que las preguntas que
+llegan justo después tampoco repiten la consulta.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Text
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la caché de consultas
+KB_CACHE_TTL = float(os.getenv("KB_CACHE_TTL", "5"))
+KB_CACHE_MAX_ENTRIES = int(os.getenv("KB_CACHE_MAX_ENTRIES", "1024"))
+KB_STATS_LOG_EVERY = int(os.getenv("KB_STATS_LOG_EVERY", "1000"))
+
+NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: Text) -> Text:
+    """
+    Clave de agrupación de una consulta: minúsculas, sin acentos ni puntuación.
+
+    La búsqueda FULLTEXT usa una intercalación que no distingue mayúsculas ni
+    acentos e ignora la puntuación, así que estas variantes dan el mismo resultado.
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+class SingleFlight:
+    """Comparte una única ejecución en curso entre las llamadas con la misma clave."""
+
+    def __init__(self, name: Text, ttl: float = KB_CACHE_TTL, max_entries: int = KB_CACHE_MAX_ENTRIES,
+                 log_every: int = KB_STATS_LOG_EVERY):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.log_every = log_every
+        self._inflight: Dict[Text, asyncio.Future] = {}
+        self._cache: "OrderedDict[Text, tuple]" = OrderedDict()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    def _cached(self, key: Text):
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Text, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def do(self, key: Text, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Devuelve el resultado de `fn()` para `key`, ejecutándola como mucho una vez a la vez.
+
+        Args:
+            key: Clave de agrupación (por ejemplo, la consulta normalizada).
+            fn: Función sin argumentos que devuelve la corrutina a ejecutar.
+
+        Returns:
+            El resultado de la caché, de la ejecución en curso o de una nueva.
+        """
+        self.calls += 1
+        if self.log_every and self.calls % self.log_every == 0:
+            logger.info("Consultas %s: %s", self.name, self.stats())
+
+        found, value = self._cached(key)
+        if found:
+            self.cache_hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # shield: si una petición se cancela, la consulta sigue para las demás
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Text, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Los errores no se guardan: la siguiente petición vuelve a intentarlo
+            self.errors += 1
+            return
+        self._store(key, task.result())
+
+    def stats(self) -> Dict[Text, Any]:
+        saved = self.coalesced + self.cache_hits
+        return {
+            "calls": self.calls,
+            "db_calls": self.executions,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "db_calls_saved": saved,
+            "saved_ratio": round(saved / self.calls, 4) if self.calls else 0.0,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+            "cached": len(self._cache),
+        }
+
+
+# Instancia compartida por las acciones que consultan la base de conocimiento
+knowledge_base_lookups = SingleFlight("knowledge_base")
@@ -0,0 +1,159 @@
+"""
+Trazas distribuidas para el servidor de acciones.
+
+Recoge el contexto de traza que la pasarela envía como metadata del mensaje
+(`trace_id` y `parent_span_id`) y registra spans para cada acción y cada
+operación de base de datos en un archivo JSONL local, con el mismo formato
+que `backend/tracing.py`, cuya CLI puede combinar ambos archivos.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Text
+
+# Configuración
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_FILE = os.getenv("ACTIONS_TRACE_FILE", "actions_traces.jsonl")
+SERVICE_NAME = "actions"
+
+_current_span = contextvars.ContextVar("current_action_span", default=None)
+
+
+class Span:
+    """Unidad de trabajo medida dentro de una traza."""
+
+    def __init__(self, name: Text, trace_id: Text, parent_id: Optional[Text] = None,
+                 attributes: Optional[Dict[Text, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set_error(self, error: Exception) -> None:
+        self.status = "error"
+        self.attributes["error"] = str(error)
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": SERVICE_NAME,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _SpanWriter:
+    """Escribe los spans en un hilo en segundo plano para no bloquear las acciones."""
+
+    def __init__(self, path: Text):
+        self.path = path
+        self._queue: "queue.Queue[Dict[Text, Any]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-writer", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in batch:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+
+
+_writer = _SpanWriter(TRACE_FILE)
+
+
+@contextmanager
+def _span(name: Text, trace_id: Text, parent_id: Optional[Text], **attributes: Any):
+    span = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_error(e)
+        raise
+    finally:
+        span.duration_ms = (time.perf_counter() - span._start_perf) * 1000
+        _current_span.reset(token)
+        if TRACING_ENABLED:
+            _writer.export(span)
+
+
+def _trace_context(tracker) -> Dict[Text, Any]:
+    """Extrae el contexto de traza de la metadata del último mensaje."""
+    metadata = tracker.latest_message.get("metadata") or {}
+    return {
+        "trace_id": metadata.get("trace_id") or uuid.uuid4().hex,
+        "parent_id": metadata.get("parent_span_id"),
+    }
+
+
+def traced_action(run):
+    """Decorador para `Action.run` que abre un span por ejecución de la acción."""
+
+    if inspect.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def async_wrapper(self, dispatcher, tracker, domain):
+            context = _trace_context(tracker)
+            with _span(f"action.{self.name()}", context["trace_id"], context["parent_id"],
+                       sender_id=tracker.sender_id):
+                return await run(self, dispatcher, tracker, domain)
+
+        return async_wrapper
+
+    @functools.wraps(run)
+    def wrapper(self, dispatcher, tracker, domain):
+        context = _trace_context(tracker)
+        with _span(f"action.{self.name()}", context["trace_id"], context["parent_id"],
+                   sender_id=tracker.sender_id):
+            return run(self, dispatcher, tracker, domain)
+
+    return wrapper
+
+
+@contextmanager
+def db_span(operation: Text, **attributes: Any):
+    """Span para una operación de base de datos dentro de la acción actual."""
+    parent = _current_span.get()
+    if parent is None:
+        # Fuera de una acción trazada no se registra nada
+        yield None
+        return
+    with _span(f"db.{operation}", parent.trace_id, parent.span_id, **attributes) as span:
+        yield span
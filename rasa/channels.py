@@ -0,0 +1,62 @@
+"""
+Canales de entrada personalizados para Rasa.
+
+El canal `rest` de Rasa 3.6 no sobrescribe `InputChannel.get_metadata`, así
+que descarta la metadata que envía la pasarela y el contexto de traza
+(`trace_id`, `parent_span_id`) nunca llega a las acciones. `TracedRestInput`
+es el mismo canal REST (misma ruta `/webhooks/rest/webhook`, también en modo
+streaming) pero entrega la metadata del cuerpo de la petición al mensaje.
+
+Además acepta el análisis NLU ya hecho por la pasarela en micro-lotes
+(`parse_data`, ver `backend/nlu_batcher.py`): si corresponde al texto del
+mensaje, Rasa lo usa en lugar de ejecutar el NLU para ese mensaje.
+
+Se registra en credentials.yml con su ruta de módulo en lugar de `rest`.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Text
+
+from rasa.core.channels.channel import UserMessage
+from rasa.core.channels.rest import RestInput
+from sanic import Blueprint
+from sanic.request import Request
+
+# Clave interna con la que get_metadata pasa el análisis de la pasarela hasta el mensaje
+PARSE_DATA_KEY = "gateway_parse_data"
+
+
+def valid_parse_data(parse_data: Any, text: Any) -> bool:
+    """True si `parse_data` tiene la forma de `/model/parse` y es del mismo texto."""
+    if not isinstance(parse_data, dict) or not isinstance(text, str) or text.startswith("/"):
+        return False
+    intent = parse_data.get("intent")
+    return (parse_data.get("text") == text
+            and isinstance(intent, dict) and isinstance(intent.get("name"), str)
+            and isinstance(parse_data.get("entities"), list))
+
+
+class TracedRestInput(RestInput):
+    """Canal REST que conserva la metadata y el análisis NLU enviados por la pasarela."""
+
+    @classmethod
+    def name(cls) -> Text:
+        return "rest"
+
+    def get_metadata(self, request: Request) -> Optional[Dict[Text, Any]]:
+        payload = request.json or {}
+        metadata = payload.get("metadata")
+        metadata = dict(metadata) if isinstance(metadata, dict) else {}
+        parse_data = payload.get("parse_data")
+        if valid_parse_data(parse_data, payload.get("message")):
+            metadata[PARSE_DATA_KEY] = parse_data
+        return metadata or None
+
+    def blueprint(self, on_new_message: Callable[[UserMessage], Awaitable[Any]]) -> Blueprint:
+        async def handle(message: UserMessage) -> Any:
+            # El análisis no se guarda como metadata: pasa a ser el del mensaje
+            parse_data = (message.metadata or {}).pop(PARSE_DATA_KEY, None)
+            if parse_data is not None:
+                message.parse_data = parse_data
+            return await on_new_message(message)
+
+        return super().blueprint(handle)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Compactación de eventos del tracker store SQL de Rasa.
+
+Rasa solo carga los eventos posteriores al último `session_started` de una
+conversación, pero en las sesiones largas ese tramo crece sin límite. Este
+script busca conversaciones inactivas con demasiados eventos y, para cada
+una:
+
+1. Archiva en almacenamiento frío (JSONL comprimido) los eventos antiguos.
+2. Los sustituye por una instantánea: un inicio de sesión seguido de los
+   valores actuales de los slots, justo antes de los últimos turnos.
+3. Guarda un resumen de lo archivado en la tabla `tracker_snapshots`.
+
+Así el tiempo de carga del tracker queda acotado por `--keep-events`
+independientemente de la duración de la sesión.
+
+Las réplicas de Rasa guardan las conversaciones activas en la caché de
+`WriteBehindTrackerStore` (tracker_stores.py) durante `ttl_seconds`, así que
+solo se compactan conversaciones inactivas durante más tiempo que ese TTL
+(`--idle-seconds` debe ser mayor; se lee de endpoints.yml).
+
+Ejecutar este script con: python compact_trackers.py --max-events 500 --keep-events 100
+Para ejecutarlo periódicamente: python compact_trackers.py --interval 600
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import sqlalchemy as sa
+import yaml
+
+# Configuración
+DB_HOST = os.getenv("DB_HOST", "db")
+DB_PORT = os.getenv("DB_PORT", "3306")
+DB_DATABASE = os.getenv("DB_DATABASE", "eduassistai")
+DB_USERNAME = os.getenv("DB_USERNAME", "eduassistai")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
+TRACKER_STORE_URL = os.getenv(
+    "TRACKER_STORE_URL",
+    f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}",
+)
+ARCHIVE_DIR = os.getenv("TRACKER_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+ENDPOINTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endpoints.yml")
+
+# TTL por defecto de la caché de WriteBehindTrackerStore
+DEFAULT_CACHE_TTL = 900
+
+metadata = sa.MetaData()
+
+tracker_snapshots = sa.Table(
+    "tracker_snapshots",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column("sender_id", sa.String(255), nullable=False, index=True),
+    sa.Column("created_at", sa.Float, nullable=False),
+    sa.Column("archived_events", sa.Integer, nullable=False),
+    sa.Column("archive_path", sa.String(1024), nullable=False),
+    sa.Column("slots", sa.Text),
+    sa.Column("summary", sa.Text),
+)
+
+
+def tracker_cache_ttl(endpoints_file=ENDPOINTS_FILE):
+    """Segundos que una conversación puede seguir en la caché de las réplicas de Rasa (0 sin caché)."""
+    if not os.path.exists(endpoints_file):
+        return DEFAULT_CACHE_TTL
+    with open(endpoints_file, "r", encoding="utf-8") as f:
+        tracker_store = (yaml.safe_load(f) or {}).get("tracker_store") or {}
+    if not str(tracker_store.get("type", "")).endswith("WriteBehindTrackerStore"):
+        return 0
+    return float(tracker_store.get("ttl_seconds", DEFAULT_CACHE_TTL))
+
+
+def events_table(engine):
+    return sa.Table("events", sa.MetaData(), autoload_with=engine)
+
+
+def find_candidates(engine, events, max_events, idle_seconds, limit):
+    """Conversaciones inactivas con más de `max_events` eventos almacenados."""
+    query = (
+        sa.select(events.c.sender_id)
+        .group_by(events.c.sender_id)
+        .having(sa.and_(sa.func.count() > max_events,
+                        sa.func.max(events.c.timestamp) < time.time() - idle_seconds))
+        .limit(limit)
+    )
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(query)]
+
+
+def replay_slots(rows, slots=None):
+    """Calcula los valores de los slots aplicando los eventos en orden."""
+    slots = dict(slots or {})
+    for row in rows:
+        if row.type_name == "slot":
+            data = json.loads(row.data)
+            slots[data["name"]] = data.get("value")
+        elif row.type_name in ("reset_slots", "restart"):
+            slots = {}
+    return slots
+
+
+def summarize(rows):
+    """Resumen de los eventos archivados."""
+    intents = Counter(row.intent_name for row in rows if row.type_name == "user" and row.intent_name)
+    actions = Counter(row.action_name for row in rows if row.type_name == "action" and row.action_name)
+    return {
+        "first_timestamp": rows[0].timestamp,
+        "last_timestamp": rows[-1].timestamp,
+        "user_turns": sum(1 for row in rows if row.type_name == "user"),
+        "bot_messages": sum(1 for row in rows if row.type_name == "bot"),
+        "top_intents": intents.most_common(10),
+        "top_actions": actions.most_common(10),
+    }
+
+
+def snapshot_rows(sender_id, slots, before_timestamp):
+    """Eventos de la instantánea, con marcas de tiempo justo antes del corte."""
+    events = [("action", {"event": "action", "name": "action_session_start", "policy": None, "confidence": None})]
+    events.append(("session_started", {"event": "session_started"}))
+    events += [("slot", {"event": "slot", "name": name, "value": value}) for name, value in sorted(slots.items())]
+    events.append(("action", {"event": "action", "name": "action_listen", "policy": None, "confidence": None}))
+
+    step = 1e-6
+    base = before_timestamp - step * (len(events) + 1)
+    rows = []
+    for i, (type_name, data) in enumerate(events):
+        data["timestamp"] = base + i * step
+        rows.append({
+            "sender_id": sender_id,
+            "type_name": type_name,
+            "timestamp": data["timestamp"],
+            "intent_name": None,
+            "action_name": data.get("name") if type_name == "action" else None,
+            "data": json.dumps(data),
+        })
+    return rows
+
+
+def archive(sender_id, rows, archive_dir):
+    """Escribe los eventos en un archivo JSONL comprimido y devuelve su ruta."""
+    safe_sender = re.sub(r"[^A-Za-z0-9_.-]", "_", sender_id)[:100]
+    directory = os.path.join(archive_dir, safe_sender)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{int(rows[-1].timestamp * 1000)}.jsonl.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(row.data + "\n")
+    return path
+
+
+def compact_sender(engine, events, sender_id, keep_events, archive_dir=ARCHIVE_DIR, idle_seconds=0):
+    """
+    Compacta los eventos de una conversación. Si ha tenido actividad en los
+    últimos `idle_seconds` (volvió después de elegirla) se deja como está.
+
+    Returns:
+        Número de eventos archivados (0 si no había nada que compactar).
+    """
+    with engine.begin() as connection:
+        rows = connection.execute(
+            sa.select(events.c.id, events.c.type_name, events.c.timestamp, events.c.intent_name,
+                      events.c.action_name, events.c.data)
+            .where(events.c.sender_id == sender_id)
+            .order_by(events.c.timestamp)
+        ).all()
+        if len(rows) <= keep_events:
+            return 0
+        if idle_seconds and rows[-1].timestamp >= time.time() - idle_seconds:
+            return 0
+
+        # El corte se hace al inicio de un turno de usuario para no partir un turno
+        cutoff = len(rows) - keep_events
+        while cutoff > 0 and rows[cutoff].type_name != "user":
+            cutoff -= 1
+        if cutoff == 0:
+            return 0
+
+        old_rows = rows[:cutoff]
+        slots = replay_slots(old_rows)
+        summary = summarize(old_rows)
+        path = archive(sender_id, old_rows, archive_dir)
+
+        ids = [row.id for row in old_rows]
+        for start in range(0, len(ids), 1000):
+            connection.execute(sa.delete(events).where(events.c.id.in_(ids[start:start + 1000])))
+        connection.execute(sa.insert(events), snapshot_rows(sender_id, slots, rows[cutoff].timestamp))
+        connection.execute(sa.insert(tracker_snapshots).values(
+            sender_id=sender_id,
+            created_at=time.time(),
+            archived_events=len(old_rows),
+            archive_path=path,
+            slots=json.dumps(slots, default=str),
+            summary=json.dumps(summary, default=str),
+        ))
+    return len(old_rows)
+
+
+def compact_all(engine, max_events, keep_events, idle_seconds, limit, archive_dir=ARCHIVE_DIR):
+    """Compacta todas las conversaciones candidatas y devuelve (conversaciones, eventos)."""
+    metadata.create_all(engine)
+    events = events_table(engine)
+    senders = find_candidates(engine, events, max_events, idle_seconds, limit)
+    archived = 0
+    for sender_id in senders:
+        archived += compact_sender(engine, events, sender_id, keep_events, archive_dir, idle_seconds)
+    return len(senders), archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compactación del tracker store SQL de Rasa")
+    parser.add_argument("--url", default=TRACKER_STORE_URL, help="URL SQLAlchemy del tracker store")
+    parser.add_argument("--max-events", type=int, default=500, help="Eventos a partir de los cuales se compacta")
+    parser.add_argument("--keep-events", type=int, default=100, help="Eventos recientes que se conservan")
+    parser.add_argument("--idle-seconds", type=int, default=1800,
+                        help="Inactividad mínima de la conversación (mayor que el TTL de la caché de trackers)")
+    parser.add_argument("--endpoints", default=ENDPOINTS_FILE, help="endpoints.yml de Rasa, para leer el TTL de la caché")
+    parser.add_argument("--limit", type=int, default=500, help="Conversaciones por ronda")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--interval", type=int, default=0, help="Repetir cada N segundos (0 = una sola vez)")
+    args = parser.parse_args()
+
+    # Una conversación en caché se volvería a escribir entera sobre la versión compactada
+    cache_ttl = tracker_cache_ttl(args.endpoints)
+    if args.idle_seconds <= cache_ttl:
+        parser.error(f"--idle-seconds ({args.idle_seconds}) debe ser mayor que el TTL de la caché "
+                     f"de trackers ({cache_ttl:g} s)")
+
+    engine = sa.create_engine(args.url, pool_pre_ping=True)
+    while True:
+        start = time.time()
+        senders, archived = compact_all(engine, args.max_events, args.keep_events,
+                                        args.idle_seconds, args.limit, args.archive_dir)
+        print(f"🗜️ {senders} conversaciones compactadas, {archived} eventos archivados "
+              f"en {time.time() - start:.1f} s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Extracción de cursos y profesores del catálogo en el pipeline de NLU.
+
+`CatalogGazetteerExtractor` añade al análisis de cada mensaje las entidades
+`curso` y `profesor` del diccionario de la base de datos
+(actions/gazetteer.py) que DIET no extrajo. Al ser parte del NLU, las
+políticas ya las ven al elegir la siguiente acción y llenan los slots por
+sus mappings `from_entity`, igual que las de DIET; también llegan a
+`/model/parse` y al servidor de NLU por lotes.
+
+El pipeline de Rasa es síncrono, así que el diccionario se carga y se
+actualiza cada GAZETTEER_REFRESH_INTERVAL segundos en un hilo propio, con
+su bucle de eventos y su pool de aiomysql, compartido por todos los modelos
+que cargue el proceso. Hasta la primera carga, o sin base de datos, el
+extractor no añade nada.
+
+Se registra en config.yml con su ruta de módulo, después de DIETClassifier:
+
+    - name: gazetteer_extractor.CatalogGazetteerExtractor
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Text
+
+from rasa.engine.graph import ExecutionContext, GraphComponent
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.nlu.extractors.extractor import EntityExtractorMixin
+from rasa.shared.nlu.constants import ENTITIES, TEXT
+from rasa.shared.nlu.training_data.message import Message
+
+from actions.db import DatabaseError
+from actions.gazetteer import GAZETTEER_REFRESH_INTERVAL, CatalogGazetteer, merge_entities
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRefresher:
+    """Hilo que carga el diccionario y lo actualiza periódicamente."""
+
+    def __init__(self, gazetteer: CatalogGazetteer, interval: float = GAZETTEER_REFRESH_INTERVAL) -> None:
+        self.gazetteer = gazetteer
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gazetteer-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.run(self._refresh_forever())
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.gazetteer.refresh()
+            except DatabaseError as e:
+                # Se sigue con lo que ya estuviera cargado y se reintenta en el siguiente intervalo
+                logger.warning(f"No se pudo actualizar el diccionario de entidades: {e!r}")
+            await asyncio.sleep(self.interval)
+
+
+_refresher: Optional[CatalogRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def shared_gazetteer() -> CatalogGazetteer:
+    """Diccionario del proceso; el hilo que lo actualiza arranca la primera vez."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = CatalogRefresher(CatalogGazetteer())
+            _refresher.start()
+        return _refresher.gazetteer
+
+
+@DefaultV1Recipe.register(DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR, is_trainable=False)
+class CatalogGazetteerExtractor(GraphComponent, EntityExtractorMixin):
+    """Completa las entidades `curso` y `profesor` con el catálogo de la base de datos."""
+
+    @classmethod
+    def create(
+        cls,
+        config: Dict[Text, Any],
+        model_storage: ModelStorage,
+        resource: Resource,
+        execution_context: ExecutionContext,
+    ) -> CatalogGazetteerExtractor:
+        return cls(shared_gazetteer())
+
+    def __init__(self, gazetteer: CatalogGazetteer) -> None:
+        self.gazetteer = gazetteer
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            text = message.get(TEXT)
+            if not text or text.startswith("/"):
+                continue
+            entities = message.get(ENTITIES, [])
+            found = merge_entities(entities, self.gazetteer.extract(text))
+            if found:
+                message.set(ENTITIES, entities + found, add_to_output=True)
+        return messages
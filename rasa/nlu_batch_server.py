@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Servidor de análisis NLU por lotes.
+
+Carga un modelo de Rasa en proceso y expone `POST /model/parse_batch`, que
+recibe `{"texts": [...]}` y ejecuta el grafo NLU una sola vez con todos los
+mensajes, de modo que tokenizadores, featurizers y DIETClassifier procesan
+el lote completo en lugar de un mensaje por llamada HTTP.
+
+Igual que las réplicas de Rasa, acepta `PUT /model` con `{"model_file": ...}`
+para cambiar de modelo sin reiniciar: la pasarela lo llama en cada despliegue
+y vuelta atrás (`backend/model_rollout.py`), y cada respuesta indica el
+modelo con el que se analizó el lote.
+
+Ejecutar este script con: python nlu_batch_server.py --model models/ --port 5006
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from sanic import Sanic, response
+
+from rasa.core.agent import Agent
+from rasa.core.channels.channel import UserMessage
+from rasa.engine.constants import PLACEHOLDER_MESSAGE, PLACEHOLDER_TRACKER
+from rasa.model import get_latest_model
+
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+def parse_batch(agent, texts):
+    """Analiza una lista de textos con una única ejecución del grafo NLU."""
+    processor = agent.processor
+    messages = [UserMessage(text) for text in texts]
+    results = processor.graph_runner.run(
+        inputs={PLACEHOLDER_MESSAGE: messages, PLACEHOLDER_TRACKER: None},
+        targets=[processor.model_metadata.nlu_target],
+    )
+    parsed = []
+    for message in results[processor.model_metadata.nlu_target]:
+        parse_data = {"text": "", "intent": {"name": None, "confidence": 0.0}, "entities": []}
+        parse_data.update(message.as_dict(only_output_properties=True))
+        parsed.append(parse_data)
+    return parsed
+
+
+def create_app(model_path, max_batch_size):
+    app = Sanic("nlu_batch_server")
+    # Modelo servido; se sustituye entero al cambiar de modelo
+    state = {"agent": Agent.load(model_path), "model_file": model_path}
+    print(f"✅ Modelo cargado: {model_path}")
+
+    @app.before_server_start
+    async def setup(app, loop):
+        app.ctx.model_lock = asyncio.Lock()
+
+    @app.get("/status")
+    async def status(request):
+        return response.json({"model_file": state["model_file"]})
+
+    @app.put("/model")
+    async def replace_model(request):
+        model_file = (request.json or {}).get("model_file")
+        if not isinstance(model_file, str) or not model_file:
+            return response.json({"error": "model_file is required"}, status=400)
+        async with app.ctx.model_lock:
+            if os.path.basename(model_file) != os.path.basename(state["model_file"]):
+                start = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                try:
+                    agent = await loop.run_in_executor(None, Agent.load, model_file)
+                except Exception as e:
+                    return response.json({"error": f"could not load {model_file}: {e}"}, status=400)
+                state.update(agent=agent, model_file=model_file)
+                print(f"🔄 Modelo cambiado a {model_file} en {time.perf_counter() - start:.1f} s")
+        return response.empty(status=204)
+
+    @app.post("/model/parse_batch")
+    async def parse(request):
+        texts = (request.json or {}).get("texts") or []
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return response.json({"error": "texts must be a list of strings"}, status=400)
+        if len(texts) > max_batch_size:
+            return response.json({"error": f"batch larger than {max_batch_size}"}, status=413)
+
+        start = time.perf_counter()
+        agent, model_file = state["agent"], state["model_file"]
+        # El grafo es síncrono y usa CPU; se ejecuta fuera del bucle de eventos
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, parse_batch, agent, texts)
+        return response.json({
+            "results": results,
+            "model_file": model_file,
+            "batch_size": len(texts),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        })
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de análisis NLU por lotes")
+    parser.add_argument("--model", default=DEFAULT_MODELS_DIR, help="Modelo o directorio de modelos")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    model_path = get_latest_model(args.model) if os.path.isdir(args.model) else args.model
+    app = create_app(model_path, args.max_batch_size)
+    app.run(host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
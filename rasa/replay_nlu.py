@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Reevaluación masiva del NLU sobre los mensajes almacenados.
+
+Lee los mensajes de usuario de la tabla `messages` con un cursor del lado
+del servidor, en bloques, los analiza con un modelo de Rasa cargado en
+proceso en varios procesos trabajadores y compara la intención y la
+confianza con las almacenadas. Solo se mantienen agregados en memoria, de
+modo que el consumo es acotado aunque haya millones de filas.
+
+Genera en el directorio de salida:
+- confusion.csv: pares (intención almacenada, intención nueva) con su recuento
+- intents.csv: acuerdo y desplazamiento de confianza por intención
+- summary.json: resumen global
+
+Ejecutar este script con: python replay_nlu.py --model models/nuevo.tar.gz --workers 4
+"""
+
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+import pymysql
+import pymysql.cursors
+
+# Configuración de la base de datos
+DB_HOST = os.getenv("DB_HOST", "db")
+DB_PORT = int(os.getenv("DB_PORT", "3306"))
+DB_DATABASE = os.getenv("DB_DATABASE", "eduassistai")
+DB_USERNAME = os.getenv("DB_USERNAME", "eduassistai")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
+
+# Intervalos del histograma de desplazamiento de confianza (nueva - almacenada)
+SHIFT_BINS = [-1.0, -0.5, -0.2, -0.1, -0.05, 0.05, 0.1, 0.2, 0.5, 1.0]
+
+_agent = None
+
+
+class ReplayReport:
+    """Agregados acumulables del análisis; se combinan entre procesos."""
+
+    def __init__(self):
+        self.rows = 0
+        self.confusion = Counter()
+        self.stats = defaultdict(lambda: [0, 0, 0.0, 0.0, 0.0, 0.0])  # n, acuerdos, Σ almacenada, Σ nueva, Σ Δ, Σ Δ²
+        self.histogram = defaultdict(lambda: [0] * (len(SHIFT_BINS) + 1))
+
+    def add(self, stored_intent, stored_confidence, new_intent, new_confidence):
+        self.rows += 1
+        self.confusion[(stored_intent, new_intent)] += 1
+        shift = new_confidence - stored_confidence
+        stats = self.stats[stored_intent]
+        stats[0] += 1
+        stats[1] += int(stored_intent == new_intent)
+        stats[2] += stored_confidence
+        stats[3] += new_confidence
+        stats[4] += shift
+        stats[5] += shift * shift
+        bucket = next((i for i, edge in enumerate(SHIFT_BINS) if shift < edge), len(SHIFT_BINS))
+        self.histogram[stored_intent][bucket] += 1
+
+    def merge(self, other):
+        self.rows += other["rows"]
+        self.confusion.update({tuple(k.split("\x00")): v for k, v in other["confusion"].items()})
+        for intent, values in other["stats"].items():
+            self.stats[intent] = [a + b for a, b in zip(self.stats[intent], values)]
+        for intent, values in other["histogram"].items():
+            self.histogram[intent] = [a + b for a, b in zip(self.histogram[intent], values)]
+
+    def to_partial(self):
+        """Representación compacta y serializable para devolver desde un trabajador."""
+        return {
+            "rows": self.rows,
+            "confusion": {"\x00".join(k): v for k, v in self.confusion.items()},
+            "stats": dict(self.stats),
+            "histogram": dict(self.histogram),
+        }
+
+    def write(self, output_dir, elapsed):
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "confusion.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stored_intent", "new_intent", "count"])
+            for (stored, new), count in self.confusion.most_common():
+                writer.writerow([stored, new, count])
+
+        with open(os.path.join(output_dir, "intents.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["intent", "messages", "agreement_rate", "mean_stored_confidence",
+                             "mean_new_confidence", "mean_shift", "std_shift"]
+                            + [f"shift<{edge}" for edge in SHIFT_BINS] + ["shift>=1.0"])
+            for intent, (n, agree, stored, new, shift, shift_sq) in sorted(self.stats.items()):
+                mean_shift = shift / n
+                std_shift = math.sqrt(max(shift_sq / n - mean_shift ** 2, 0.0))
+                writer.writerow([intent, n, round(agree / n, 4), round(stored / n, 4), round(new / n, 4),
+                                 round(mean_shift, 4), round(std_shift, 4)] + self.histogram[intent])
+
+        agreements = sum(values[1] for values in self.stats.values())
+        summary = {
+            "messages": self.rows,
+            "agreement_rate": round(agreements / self.rows, 4) if self.rows else None,
+            "intents": len(self.stats),
+            "elapsed_seconds": round(elapsed, 2),
+            "messages_per_second": round(self.rows / elapsed, 1) if elapsed else None,
+        }
+        with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def init_worker(model_path):
+    """Carga el modelo una vez por proceso trabajador."""
+    global _agent
+    from rasa.core.agent import Agent
+    _agent = Agent.load(model_path)
+
+
+def process_chunk(rows, batch_size):
+    """Analiza un bloque de filas y devuelve sus agregados parciales."""
+    from nlu_batch_server import parse_batch
+
+    report = ReplayReport()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        parsed = parse_batch(_agent, [text for _, text, _, _ in batch])
+        for (_, _, stored_intent, stored_confidence), result in zip(batch, parsed):
+            intent = result.get("intent") or {}
+            report.add(stored_intent, float(stored_confidence or 0.0),
+                       intent.get("name") or "none", float(intent.get("confidence") or 0.0))
+    return report.to_partial()
+
+
+def message_time_column(cursor):
+    """Columna de fecha de `messages`, que difiere entre los esquemas del proyecto."""
+    cursor.execute("SHOW COLUMNS FROM messages LIKE 'timestamp'")
+    # fetchall: con un cursor sin buffer hay que leer el resultado entero
+    return "timestamp" if cursor.fetchall() else "created_at"
+
+
+def stream_messages(args):
+    """Genera bloques de mensajes usando un cursor sin buffer (del lado del servidor)."""
+    connection = pymysql.connect(host=DB_HOST, port=DB_PORT, database=DB_DATABASE,
+                                 user=DB_USERNAME, password=DB_PASSWORD, charset="utf8mb4",
+                                 cursorclass=pymysql.cursors.SSCursor)
+    query = """
+    SELECT id, message, intent, confidence
+    FROM messages
+    WHERE sender = 'user' AND intent IS NOT NULL
+    """
+    params = []
+
+    try:
+        with connection.cursor() as cursor:
+            if args.since or args.until:
+                time_column = message_time_column(cursor)
+                if args.since:
+                    query += f" AND `{time_column}` >= %s"
+                    params.append(args.since)
+                if args.until:
+                    query += f" AND `{time_column}` < %s"
+                    params.append(args.until)
+            query += " ORDER BY id"
+            if args.limit:
+                query += " LIMIT %s"
+                params.append(args.limit)
+
+            # La lectura se frena mientras los trabajadores analizan; sin esto
+            # MySQL cerraría la consulta sin buffer tras net_write_timeout
+            cursor.execute("SET SESSION net_write_timeout = 3600")
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(args.chunk_size)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reevaluación masiva del NLU sobre mensajes almacenados")
+    parser.add_argument("--model", required=True, help="Ruta al modelo de Rasa (.tar.gz)")
+    parser.add_argument("--workers", type=int, default=max(multiprocessing.cpu_count() - 1, 1))
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Filas por bloque leído de MySQL")
+    parser.add_argument("--batch-size", type=int, default=64, help="Mensajes por ejecución del grafo NLU")
+    parser.add_argument("--since", help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Fecha final exclusiva (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--output-dir", default="replay_report")
+    args = parser.parse_args()
+
+    report = ReplayReport()
+    # Limita los bloques en vuelo para que la lectura no se adelante al análisis
+    in_flight = threading.BoundedSemaphore(args.workers * 2)
+    errors = []
+
+    chunks_done = [0]
+
+    def on_done(partial):
+        report.merge(partial)
+        in_flight.release()
+        chunks_done[0] += 1
+        if chunks_done[0] % 10 == 0:
+            print(f"⏳ {report.rows} mensajes analizados...")
+
+    def on_error(error):
+        errors.append(error)
+        in_flight.release()
+
+    start = time.time()
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.model,)) as pool:
+        for rows in stream_messages(args):
+            in_flight.acquire()
+            if errors:
+                break
+            pool.apply_async(process_chunk, (rows, args.batch_size), callback=on_done, error_callback=on_error)
+        pool.close()
+        pool.join()
+
+    if errors:
+        print(f"❌ Error durante el análisis: {errors[0]}")
+        return 1
+
+    summary = report.write(args.output_dir, time.time() - start)
+    print(f"✅ {summary['messages']} mensajes analizados en {summary['elapsed_seconds']} s "
+          f"(acuerdo {summary['agreement_rate']})")
+    print(f"Informes escritos en {args.output_dir}/")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,15 @@
+"""Configuración común de las pruebas del proyecto Rasa (acciones y scripts)."""
+
+import os
+import sys
+import tempfile
+
+RASA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(RASA_DIR)
+
+# Las trazas de las pruebas no deben ensuciar el directorio de trabajo
+os.environ.setdefault("ACTIONS_TRACE_FILE", os.path.join(tempfile.gettempdir(), "test_actions_traces.jsonl"))
+os.environ.setdefault("TRACE_FILE", os.path.join(tempfile.gettempdir(), "test_gateway_traces.jsonl"))
+
+# Igual que en el contenedor (/app): `actions`, `channels`, `tracker_stores`... en la raíz
+sys.path.insert(0, RASA_DIR)
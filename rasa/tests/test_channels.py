@@ -0,0 +1,44 @@
+"""Pruebas del canal REST con el análisis NLU hecho por la pasarela."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("rasa.core.channels.rest")
+
+from rasa.core.channels.channel import UserMessage  # noqa: E402
+from rasa.core.channels.rest import RestInput  # noqa: E402
+
+from channels import PARSE_DATA_KEY, TracedRestInput, valid_parse_data  # noqa: E402
+
+PARSE_DATA = {"text": "hola", "intent": {"name": "saludo", "confidence": 0.97}, "entities": []}
+
+
+def test_valid_parse_data_requires_same_text_and_shape():
+    assert valid_parse_data(PARSE_DATA, "hola")
+    assert not valid_parse_data(PARSE_DATA, "adiós")
+    assert not valid_parse_data({"text": "hola", "intent": "saludo", "entities": []}, "hola")
+    assert not valid_parse_data({**PARSE_DATA, "text": "/saludo"}, "/saludo")
+    assert not valid_parse_data(None, "hola")
+
+
+def test_parse_data_reaches_the_user_message_not_the_metadata(monkeypatch):
+    channel = TracedRestInput()
+    metadata = channel.get_metadata(SimpleNamespace(json={
+        "sender": "42", "message": "hola", "metadata": {"trace_id": "t"}, "parse_data": PARSE_DATA}))
+    assert metadata == {"trace_id": "t", PARSE_DATA_KEY: PARSE_DATA}
+
+    # Función que TracedRestInput entrega al blueprint de RestInput
+    handlers = []
+    monkeypatch.setattr(RestInput, "blueprint", lambda self, handle: handlers.append(handle))
+    received = []
+
+    async def on_new_message(message):
+        received.append(message)
+
+    channel.blueprint(on_new_message)
+    asyncio.run(handlers[0](UserMessage("hola", sender_id="42", metadata=metadata)))
+
+    assert received[0].parse_data == PARSE_DATA
+    assert received[0].metadata == {"trace_id": "t"}
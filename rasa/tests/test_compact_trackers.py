@@ -0,0 +1,71 @@
+"""Pruebas de la compactación del tracker store frente a la caché de trackers."""
+
+import json
+import time
+
+import pytest
+import sqlalchemy as sa
+
+import compact_trackers
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'tracker.db'}")
+    sa.Table(
+        "events", sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("sender_id", sa.String(255)),
+        sa.Column("type_name", sa.String(255)),
+        sa.Column("timestamp", sa.Float),
+        sa.Column("intent_name", sa.String(255)),
+        sa.Column("action_name", sa.String(255)),
+        sa.Column("data", sa.Text),
+    ).create(engine)
+    return engine
+
+
+def add_turns(engine, sender_id, turns, last_timestamp):
+    events = compact_trackers.events_table(engine)
+    rows = []
+    for i in range(turns):
+        timestamp = last_timestamp - (turns - i)
+        for type_name, name in (("user", None), ("action", "utter_saludo"), ("bot", None)):
+            rows.append({"sender_id": sender_id, "type_name": type_name, "timestamp": timestamp,
+                         "intent_name": "saludo" if type_name == "user" else None, "action_name": name,
+                         "data": json.dumps({"event": type_name, "timestamp": timestamp})})
+    with engine.begin() as connection:
+        connection.execute(sa.insert(events), rows)
+
+
+def test_cache_ttl_is_read_from_endpoints(tmp_path):
+    endpoints = tmp_path / "endpoints.yml"
+    endpoints.write_text("tracker_store:\n  type: tracker_stores.WriteBehindTrackerStore\n  ttl_seconds: 1200\n")
+    assert compact_trackers.tracker_cache_ttl(str(endpoints)) == 1200
+    endpoints.write_text("tracker_store:\n  type: SQL\n")
+    assert compact_trackers.tracker_cache_ttl(str(endpoints)) == 0
+    assert compact_trackers.tracker_cache_ttl(str(tmp_path / "missing.yml")) == compact_trackers.DEFAULT_CACHE_TTL
+
+
+def test_only_idle_conversations_are_compacted(engine, tmp_path):
+    now = time.time()
+    add_turns(engine, "idle", 50, now - 3600)
+    add_turns(engine, "active", 50, now)
+
+    senders, archived = compact_trackers.compact_all(engine, max_events=100, keep_events=30, idle_seconds=1800,
+                                                     limit=10, archive_dir=str(tmp_path / "archive"))
+    assert senders == 1 and archived > 0
+
+    events = compact_trackers.events_table(engine)
+    with engine.connect() as connection:
+        counts = dict(connection.execute(
+            sa.select(events.c.sender_id, sa.func.count()).group_by(events.c.sender_id)).all())
+    assert counts["active"] == 150
+    assert counts["idle"] < 150
+
+
+def test_conversation_that_became_active_is_skipped(engine, tmp_path):
+    add_turns(engine, "back", 50, time.time())
+    events = compact_trackers.events_table(engine)
+    assert compact_trackers.compact_sender(engine, events, "back", keep_events=30,
+                                           archive_dir=str(tmp_path / "archive"), idle_seconds=1800) == 0
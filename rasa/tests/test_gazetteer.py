@@ -0,0 +1,138 @@
+"""Diccionario de cursos y profesores: apellidos con contexto, erratas y actualizaciones."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("aiomysql")
+
+from actions import gazetteer as gazetteer_module  # noqa: E402
+from actions.gazetteer import (  # noqa: E402
+    CatalogGazetteer, GuardedPhrase, Gazetteer, subject_phrases, teacher_phrases
+)
+
+
+@pytest.fixture
+def gazetteer():
+    index = Gazetteer(fuzzy_min_length=5)
+    index.add("user:1", "profesor", "Ana María Blanco Ruiz", teacher_phrases("Ana María Blanco Ruiz"))
+    index.add("user:2", "profesor", "Luis Flores", teacher_phrases("Luis Flores"))
+    index.add("user:3", "profesor", "Pedro Campos Díaz", teacher_phrases("Pedro Campos Díaz"))
+    index.add("subject:1", "curso", "Electrónica", subject_phrases("Electrónica", "ELE101"))
+    return index
+
+
+def values(index, text):
+    return [(e["entity"], e["value"]) for e in index.extract(text)]
+
+
+def test_surname_alias_needs_context():
+    phrases = teacher_phrases("Ana María Blanco Ruiz")
+    assert phrases == ["Ana María Blanco Ruiz", "Ana Blanco", "Blanco"]
+    assert isinstance(phrases[2], GuardedPhrase)
+    assert not isinstance(phrases[1], GuardedPhrase)
+
+
+@pytest.mark.parametrize("text", [
+    "la hoja tiene que ser blanco y negro",
+    "me regalaron flores",
+    "¿dónde están los campos de deporte?",
+])
+def test_ordinary_words_are_not_teachers(gazetteer, text):
+    assert values(gazetteer, text) == []
+
+
+@pytest.mark.parametrize("text, teacher", [
+    ("¿a qué hora atiende el profe blanco?", "Ana María Blanco Ruiz"),
+    ("la profesora flores no vino", "Luis Flores"),
+    ("quiero hablar con la Dra. Campos", "Pedro Campos Díaz"),
+    ("¿Blanco da clase hoy?", "Ana María Blanco Ruiz"),
+    ("necesito el correo de Flores", "Luis Flores"),
+])
+def test_surname_after_title_or_capitalized(gazetteer, text, teacher):
+    assert values(gazetteer, text) == [("profesor", teacher)]
+
+
+def test_full_names_match_without_context(gazetteer):
+    assert values(gazetteer, "el correo de ana blanco") == [("profesor", "Ana María Blanco Ruiz")]
+    assert values(gazetteer, "pedro campos diaz") == [("profesor", "Pedro Campos Díaz")]
+
+
+def test_common_words_are_not_fuzzy_matched(gazetteer):
+    assert values(gazetteer, "mándalo a mi correo electrónico") == []
+    assert values(gazetteer, "profe blancos") == []
+
+
+def test_typos_still_match(gazetteer):
+    entities = gazetteer.extract("apuntes de electrónca")
+    assert [(e["entity"], e["value"]) for e in entities] == [("curso", "Electrónica")]
+    assert entities[0]["confidence_entity"] < 1
+    assert values(gazetteer, "el profesor flroes") == [("profesor", "Luis Flores")]
+
+
+class FakeCatalog:
+    """`subjects` y `users` en memoria, con el filtro por `updated_at` de las actualizaciones."""
+
+    def __init__(self):
+        self.subjects = {}
+        self.users = {}
+        self._result = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield self
+
+    async def execute(self, cursor, query, params=None):
+        since = params[0] if params else None
+        if query == "SELECT id FROM subjects":
+            self._result = [(subject_id,) for subject_id in self.subjects]
+        elif query == "SELECT id FROM users WHERE role = 'teacher'":
+            self._result = [(user_id,) for user_id, row in self.users.items() if row[1] == "teacher"]
+        else:
+            table = self.subjects if "FROM subjects" in query else self.users
+            self._result = [(row_id, *row) for row_id, row in table.items() if since is None or row[2] >= since]
+
+    async def fetchall(self):
+        return self._result
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = FakeCatalog()
+    monkeypatch.setattr(gazetteer_module, "transaction", catalog.transaction)
+    monkeypatch.setattr(gazetteer_module, "execute", catalog.execute)
+    return catalog
+
+
+def test_refresh_removes_deleted_rows_even_if_the_count_is_unchanged(catalog):
+    catalog.subjects[1] = ("Electrónica", "ELE101", datetime(2024, 3, 1))
+    catalog.users[1] = ("Luis Flores", "teacher", datetime(2024, 3, 1))
+    index = CatalogGazetteer()
+    asyncio.run(index.refresh())
+    assert index.loaded and len(index) == 2
+
+    # Se borra una fila de cada tabla y se crea otra: el número de filas no cambia
+    del catalog.subjects[1]
+    del catalog.users[1]
+    catalog.subjects[2] = ("Termodinámica", "TER201", datetime(2024, 3, 2))
+    catalog.users[2] = ("Pedro Campos Díaz", "teacher", datetime(2024, 3, 2))
+    asyncio.run(index.refresh())
+
+    assert sorted(index._entries) == ["subject:2", "user:2"]
+    assert values(index, "el profe flores de electrónica") == []
+    assert values(index, "termodinámica con pedro campos") == [
+        ("curso", "Termodinámica"), ("profesor", "Pedro Campos Díaz")
+    ]
+
+
+def test_refresh_drops_teachers_whose_role_changed(catalog):
+    catalog.users[1] = ("Luis Flores", "teacher", datetime(2024, 3, 1))
+    index = CatalogGazetteer()
+    asyncio.run(index.refresh())
+
+    catalog.users[1] = ("Luis Flores", "student", datetime(2024, 3, 2))
+    asyncio.run(index.refresh())
+
+    assert "user:1" not in index
@@ -0,0 +1,174 @@
+"""Recuento de palabras clave: resumen por día y volcados incrementales."""
+
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("aiomysql")
+
+from actions import keyword_stats  # noqa: E402
+from actions.keyword_stats import KeywordTracker, SpaceSaving  # noqa: E402
+
+
+class FakeTable:
+    """`keyword_frequency` en memoria con la semántica de ON DUPLICATE KEY UPDATE count = count + ..."""
+
+    def __init__(self):
+        self.counts = {}
+        self.fail = False
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield self
+
+    async def executemany(self, cursor, query, rows):
+        assert "count = count + VALUES(count)" in query
+        if self.fail:
+            raise keyword_stats.DatabaseError[0]("sin conexión")
+        for day, keyword, count in rows:
+            self.counts[(day, keyword)] = self.counts.get((day, keyword), 0) + count
+
+
+def make_tracker(**kwargs):
+    tracker = KeywordTracker(**kwargs)
+    # Las pruebas no escriben en la base de datos al salir
+    atexit.unregister(tracker._flush_on_exit)
+    return tracker
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(keyword_stats, "transaction", table.transaction)
+    monkeypatch.setattr(keyword_stats, "executemany", table.executemany)
+    return table
+
+
+def test_repeated_flushes_add_only_new_occurrences(table):
+    tracker = make_tracker(capacity=50, top_n=10)
+    day = date.today()
+    for _ in range(3):
+        tracker.record("matrícula", day)
+    asyncio.run(tracker.flush())
+    asyncio.run(tracker.flush())
+    for _ in range(2):
+        tracker.record("matrícula", day)
+    asyncio.run(tracker.flush())
+
+    assert table.counts == {(day, "matrícula"): 5}
+
+
+def test_flushed_counts_never_exceed_exact_counts(table):
+    # Más raíces que contadores: el resumen sustituye contadores y acumula error
+    tracker = make_tracker(capacity=5, top_n=3)
+    day = date.today()
+    texts = ["horario examen"] * 20 + [f"palabra{chr(97 + i)}{chr(97 + j)}" for i in range(10) for j in range(3)]
+    for i, text in enumerate(texts):
+        tracker.record(text, day)
+        if i % 7 == 0:
+            asyncio.run(tracker.flush())
+    asyncio.run(tracker.flush())
+
+    exact = keyword_stats.exact_counts(texts)
+    for (_, keyword), count in table.counts.items():
+        assert count <= exact[keyword_stats.stem(keyword)]
+    assert table.counts[(day, "horario")] == 20
+    assert table.counts[(day, "examen")] == 20
+
+
+def test_failed_flush_is_retried(table):
+    tracker = make_tracker(capacity=50, top_n=10)
+    day = date.today()
+    tracker.record("biblioteca", day)
+    table.fail = True
+    assert asyncio.run(tracker.flush()) == 0
+    table.fail = False
+    asyncio.run(tracker.flush())
+
+    assert table.counts == {(day, "biblioteca"): 1}
+
+
+def test_past_days_are_dropped_after_their_last_flush(table):
+    tracker = make_tracker(capacity=50, top_n=10)
+    yesterday = date.today() - timedelta(days=1)
+    tracker.record("biblioteca", yesterday)
+    tracker.record("biblioteca")
+    asyncio.run(tracker.flush())
+
+    assert list(tracker.sketches) == [date.today()]
+    assert table.counts == {(yesterday, "biblioteca"): 1, (date.today(), "biblioteca"): 1}
+
+
+def test_replaced_counter_starts_with_no_guaranteed_count():
+    sketch = SpaceSaving(capacity=1)
+    sketch.add("a", "a", count=3)
+    SpaceSaving.mark_flushed(sketch.unflushed(1))
+    sketch.add("b", "b")
+
+    # "b" hereda la cuenta de "a" como error: solo su propia aparición está garantizada
+    assert sketch.counters["b"][:2] == [4, 3]
+    assert sketch.unflushed(1)[0][2] == 1
+
+
+class FakeMessages(FakeTable):
+    """`messages` y `batch_job_state` en memoria, además de `keyword_frequency`."""
+
+    def __init__(self, messages):
+        super().__init__()
+        self.messages = messages
+        self.checkpoint = None
+        self._result = []
+
+    async def execute(self, cursor, query, params=None):
+        if "SHOW COLUMNS" in query:
+            self._result = []
+        elif "SELECT last_message_id" in query:
+            self._result = [(self.checkpoint,)] if self.checkpoint is not None else []
+        elif "FROM messages" in query:
+            assert "DATE(`created_at`)" in query
+            last_id, limit = params
+            self._result = [row for row in self.messages if row[0] > last_id][:limit]
+        elif "INSERT INTO batch_job_state" in query:
+            if self.fail:
+                raise keyword_stats.DatabaseError[0]("sin conexión")
+            self.checkpoint = params[1]
+
+    async def fetchone(self):
+        return self._result[0] if self._result else None
+
+    async def fetchall(self):
+        return self._result
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    day = date.today()
+    table = FakeMessages([(i, text, day) for i, text in enumerate(
+        ["horario del examen", "examen de cálculo", "biblioteca", "horario"], start=1)])
+    monkeypatch.setattr(keyword_stats, "transaction", table.transaction)
+    monkeypatch.setattr(keyword_stats, "executemany", table.executemany)
+    monkeypatch.setattr(keyword_stats, "execute", table.execute)
+    return table
+
+
+def test_new_messages_are_counted_once_with_their_checkpoint(messages):
+    tracker = make_tracker(capacity=50, top_n=10, flush_interval=float("inf"))
+
+    assert asyncio.run(tracker.count_new_messages(batch_size=3)) == 4
+    assert asyncio.run(tracker.count_new_messages(batch_size=3)) == 0
+
+    day = date.today()
+    assert messages.checkpoint == 4
+    assert messages.counts == {(day, "horario"): 2, (day, "examen"): 2, (day, "cálculo"): 1,
+                               (day, "biblioteca"): 1}
+
+
+def test_restart_resumes_from_the_saved_checkpoint(messages):
+    messages.checkpoint = 2
+    tracker = make_tracker(capacity=50, top_n=10, flush_interval=float("inf"))
+
+    assert asyncio.run(tracker.count_new_messages()) == 2
+    assert messages.counts == {(date.today(), "biblioteca"): 1, (date.today(), "horario"): 1}
@@ -0,0 +1,57 @@
+"""Pruebas de la lectura de mensajes de replay_nlu.py."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import replay_nlu
+
+
+class FakeCursor:
+    def __init__(self, columns):
+        self.columns = columns
+        self.queries = []
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        if query.startswith("SHOW COLUMNS"):
+            self._result = [("timestamp",)] if "timestamp" in self.columns else []
+        else:
+            self._result = []
+
+    def fetchall(self):
+        return self._result
+
+    def fetchmany(self, size):
+        return []
+
+
+@pytest.mark.parametrize("columns, expected", [({"timestamp"}, "timestamp"), ({"created_at"}, "created_at")])
+def test_date_filters_use_the_schema_time_column(monkeypatch, columns, expected):
+    cursor = FakeCursor(columns)
+    connection = SimpleNamespace(cursor=lambda: cursor, close=lambda: None)
+    monkeypatch.setattr(replay_nlu.pymysql, "connect", lambda **kwargs: connection)
+
+    args = SimpleNamespace(since="2024-01-01", until="2024-02-01", limit=0, chunk_size=100)
+    assert list(replay_nlu.stream_messages(args)) == []
+
+    query, params = cursor.queries[-1]
+    assert f"`{expected}` >= %s" in query and f"`{expected}` < %s" in query
+    assert params == ["2024-01-01", "2024-02-01"]
+
+
+def test_no_schema_lookup_without_date_filters(monkeypatch):
+    cursor = FakeCursor({"timestamp"})
+    connection = SimpleNamespace(cursor=lambda: cursor, close=lambda: None)
+    monkeypatch.setattr(replay_nlu.pymysql, "connect", lambda **kwargs: connection)
+
+    list(replay_nlu.stream_messages(SimpleNamespace(since=None, until=None, limit=10, chunk_size=100)))
+    assert not any(query.startswith("SHOW COLUMNS") for query, _ in cursor.queries)
+    assert cursor.queries[-1][1] == [10]
@@ -0,0 +1,57 @@
+"""Propagación del contexto de traza pasarela → canal REST → acciones."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "backend"))
+
+import tracing as gateway_tracing  # noqa: E402
+from actions import tracing as actions_tracing  # noqa: E402
+
+
+def gateway_payload(message="hola"):
+    """Cuerpo que envía la pasarela al webhook REST dentro de su span."""
+    with gateway_tracing.start_span("gateway.chat") as span:
+        payload = {"sender": "42", "message": message, "metadata": gateway_tracing.trace_metadata()}
+    return span, payload
+
+
+def test_trace_id_round_trip_through_rest_channel():
+    pytest.importorskip("rasa.core.channels.rest")
+    from channels import TracedRestInput
+
+    span, payload = gateway_payload()
+    metadata = TracedRestInput().get_metadata(SimpleNamespace(json=payload))
+    assert metadata == {"trace_id": span.trace_id, "parent_span_id": span.span_id}
+
+    tracker = SimpleNamespace(latest_message={"text": "hola", "metadata": metadata})
+    assert actions_tracing._trace_context(tracker) == {"trace_id": span.trace_id, "parent_id": span.span_id}
+
+
+def test_rest_channel_ignores_missing_or_invalid_metadata():
+    pytest.importorskip("rasa.core.channels.rest")
+    from channels import TracedRestInput
+
+    channel = TracedRestInput()
+    assert channel.get_metadata(SimpleNamespace(json={"sender": "42", "message": "hola"})) is None
+    assert channel.get_metadata(SimpleNamespace(json={"metadata": "x"})) is None
+    assert channel.get_metadata(SimpleNamespace(json=None)) is None
+
+
+def test_actions_join_gateway_trace():
+    span, payload = gateway_payload()
+    tracker = SimpleNamespace(latest_message={"text": "hola", "metadata": payload["metadata"]})
+    context = actions_tracing._trace_context(tracker)
+    assert context["trace_id"] == span.trace_id
+    assert context["parent_id"] == span.span_id
+
+
+def test_actions_start_new_trace_without_metadata():
+    tracker = SimpleNamespace(latest_message={"text": "hola"})
+    context = actions_tracing._trace_context(tracker)
+    assert len(context["trace_id"]) == 32
+    assert context["parent_id"] is None
@@ -0,0 +1,123 @@
+"""Escritura diferida de trackers: lotes, fallos a mitad y recuperación del diario."""
+
+import asyncio
+import atexit
+import json
+
+import pytest
+
+pytest.importorskip("rasa.core.tracker_store")
+
+from tracker_stores import LocalTrackerCache, WriteBehindTrackerStore  # noqa: E402
+
+
+def user_event(text, timestamp):
+    return {"event": "user", "timestamp": timestamp, "text": text,
+            "parse_data": {"intent": {"name": "saludo"}}}
+
+
+def make_store(tmp_path, **kwargs):
+    store = WriteBehindTrackerStore(
+        dialect="sqlite", db=str(tmp_path / "tracker.db"),
+        journal_path=str(tmp_path / "journal.jsonl"), **kwargs
+    )
+    # Las pruebas no escriben en la base de datos al salir
+    atexit.unregister(store._flush_on_exit)
+    return store
+
+
+def stored_texts(store):
+    with store.backing_store.session_scope() as session:
+        rows = session.query(store.backing_store.SQLEvent).order_by(store.backing_store.SQLEvent.id).all()
+        return [(row.sender_id, json.loads(row.data)["text"]) for row in rows]
+
+
+def write_journal(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_recover_journal_skips_committed_events(tmp_path):
+    write_journal(tmp_path / "journal.jsonl", [
+        {"sender_id": "a", "events": [user_event("a1", 1.0), user_event("a2", 2.0)]},
+        {"sender_id": "b", "events": [user_event("b1", 3.0)]},
+        {"committed": {"a": 1}},
+        {"sender_id": "a", "events": [user_event("a3", 4.0)]},
+        {"committed": {"b": 1}},
+    ])
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as f:
+        # Línea a medio escribir por una caída
+        f.write('{"sender_id": "a", "eve')
+
+    store = make_store(tmp_path)
+    store._journal.close()
+
+    assert stored_texts(store) == [("a", "a2"), ("a", "a3")]
+    assert not (tmp_path / "journal.jsonl").exists() or (tmp_path / "journal.jsonl").stat().st_size == 0
+
+
+def test_failed_batch_returns_to_pending_ahead_of_newer_events(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store._dirty["a"] = ("tracker-a", [user_event("a1", 1.0)])
+    store._dirty["b"] = ("tracker-b", [user_event("b1", 2.0)])
+
+    def fail(batch):
+        # Mientras se escribe el lote llega un turno nuevo de "a"
+        store._dirty["a"] = ("tracker-a2", [user_event("a2", 3.0)])
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(store, "_insert_events", fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.flush())
+
+    assert list(store._dirty) == ["a", "b"]
+    assert store._dirty["a"][0] == "tracker-a2"
+    assert [event["text"] for event in store._dirty["a"][1]] == ["a1", "a2"]
+    assert not store._flushing
+
+    monkeypatch.undo()
+    assert asyncio.run(store.flush()) == 2
+    store._journal.close()
+    assert stored_texts(store) == [("a", "a1"), ("a", "a2"), ("b", "b1")]
+
+
+def test_partially_committed_flush_is_recovered_without_duplicates(tmp_path, monkeypatch):
+    store = make_store(tmp_path, flush_batch_size=1)
+    for sender_id, text, timestamp in [("a", "a1", 1.0), ("b", "b1", 2.0)]:
+        events = [user_event(text, timestamp)]
+        store._dirty[sender_id] = (f"tracker-{sender_id}", events)
+        store._journal.append({"sender_id": sender_id, "events": events})
+
+    insert_events = store._insert_events
+
+    def fail_second_batch(batch):
+        if batch[0][0] == "b":
+            raise RuntimeError("sin conexión")
+        insert_events(batch)
+
+    monkeypatch.setattr(store, "_insert_events", fail_second_batch)
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.flush())
+    # Caída: el diario conserva "b" y marca "a" como escrito
+    store._journal.close()
+
+    recovered = make_store(tmp_path)
+    recovered._journal.close()
+
+    assert stored_texts(recovered) == [("a", "a1"), ("b", "b1")]
+
+
+def test_local_cache_expires_and_evicts_least_recent():
+    cache = LocalTrackerCache(capacity=2, ttl_seconds=60)
+    cache.set("a", "tracker-a")
+    cache.set("b", "tracker-b")
+    cache.get("a")
+    cache.fill("c", "tracker-c", None)
+
+    assert cache.get("a") == ("tracker-a", None)
+    assert cache.get("b") == (None, None)
+
+    expired = LocalTrackerCache(capacity=2, ttl_seconds=-1)
+    expired.set("a", "tracker-a")
+    assert expired.get("a") == (None, None)
@@ -0,0 +1,456 @@
+"""
+Tracker store en memoria con escritura diferida a SQL.
+
+Mantiene las conversaciones activas en una caché LRU con expiración (local
+o compatible con Redis para varias réplicas) y escribe los cambios en el
+tracker store SQL en segundo plano, por lotes, en lugar de hacer una lectura
+y una escritura síncronas contra MySQL en cada turno.
+
+Cada turno solo añade a SQL sus eventos nuevos. Para sobrevivir a
+reinicios, esos eventos se anotan también en un diario local (JSONL), desde
+un hilo en segundo plano, que se reaplica al arrancar y se vacía en cuanto
+no queda nada pendiente.
+
+Con varias réplicas de Rasa la caché tiene que ser `cache_backend: redis`,
+que comparten todas: con la caché local, una réplica no ve las escrituras de
+otra que aún no han llegado a SQL. La pasarela no arranca el despliegue de
+modelos con réplicas de reserva si TRACKER_CACHE_BACKEND no es redis. En
+Redis cada conversación lleva un contador de versión junto a su entrada, así
+que comprobar que una copia es la última no cuesta una consulta a SQL; si
+Redis falla, se sigue leyendo y escribiendo en SQL sin caché. La
+compactación (compact_trackers.py) solo toca conversaciones inactivas más
+tiempo que el TTL de la caché, que ya no tienen entrada.
+
+Configuración en endpoints.yml:
+
+    tracker_store:
+      type: tracker_stores.WriteBehindTrackerStore
+      dialect: "mysql"
+      url: ...
+      cache_backend: redis   # o "local" con una sola réplica
+      redis_url: redis://redis:6379/0
+      cache_size: 2000
+      ttl_seconds: 900
+      flush_interval: 0.5
+      flush_batch_size: 100
+      journal_path: journal/tracker_writes.jsonl
+"""
+
+import asyncio
+import atexit
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Text, Tuple
+
+from rasa.core.brokers.broker import EventBroker
+from rasa.core.tracker_store import SerializedTrackerAsText, SQLTrackerStore, TrackerStore
+from rasa.shared.core.domain import Domain
+from rasa.shared.core.trackers import DialogueStateTracker
+from rasa.shared.nlu.constants import INTENT_NAME_KEY
+
+logger = logging.getLogger(__name__)
+
+# Atributo del tracker con cuántos de sus eventos están ya en SQL o pendientes de escribir
+KNOWN_EVENTS_ATTR = "_write_behind_known_events"
+
+
+class LocalTrackerCache:
+    """
+    Caché LRU en proceso con expiración por TTL.
+
+    Solo la usa una réplica, que es la única que escribe sus entradas, así
+    que no necesita versiones: `get` devuelve siempre None como versión.
+    """
+
+    def __init__(self, capacity: int, ttl_seconds: float) -> None:
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[Text, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Text) -> Tuple[Optional[Text], Optional[int]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None, None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None, None
+            self._items.move_to_end(key)
+            return value, None
+
+    def set(self, key: Text, value: Text) -> None:
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def fill(self, key: Text, value: Text, version: Optional[int]) -> None:
+        self.set(key, value)
+
+    def delete(self, key: Text) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class RedisTrackerCache:
+    """
+    Caché compartida en Redis (o un servidor compatible) para varias réplicas.
+
+    Cada conversación tiene un contador de versión que sube con cada `set`, y
+    su entrada guarda la versión con la que se escribió (`<versión>:<tracker>`).
+    Una entrada solo es válida si su versión coincide con la del contador, así
+    que una réplica que rellena la caché desde SQL (`fill`) no puede pisar lo
+    que otra guardó mientras tanto.
+    """
+
+    # KEYS: contador, entrada. ARGV: tracker, TTL
+    SET_SCRIPT = """
+    local version = redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('SET', KEYS[2], version .. ':' .. ARGV[1], 'EX', ARGV[2])
+    return version
+    """
+
+    # KEYS: contador, entrada. ARGV: tracker, TTL, versión leída antes de ir a SQL
+    FILL_SCRIPT = """
+    local version = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if version ~= tonumber(ARGV[3]) then
+        return 0
+    end
+    redis.call('SET', KEYS[2], version .. ':' .. ARGV[1], 'EX', ARGV[2])
+    return 1
+    """
+
+    def __init__(self, url: Text, ttl_seconds: float, prefix: Text = "tracker_cache:",
+                 version_prefix: Text = "tracker_cache_version:", socket_timeout: float = 0.5) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=socket_timeout,
+                                           socket_connect_timeout=socket_timeout)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+        self.version_prefix = version_prefix
+        self._set_script = self.client.register_script(self.SET_SCRIPT)
+        self._fill_script = self.client.register_script(self.FILL_SCRIPT)
+        self.stale_hits = 0
+
+    def _keys(self, key: Text) -> List[Text]:
+        return [self.version_prefix + key, self.prefix + key]
+
+    def get(self, key: Text) -> Tuple[Optional[Text], int]:
+        """
+        Devuelve la entrada (None si no está o es de una versión anterior) y
+        la versión actual, en una sola consulta.
+        """
+        version, value = self.client.mget(self._keys(key))
+        version = int(version or 0)
+        if value is None:
+            return None, version
+        entry_version, _, serialised = value.decode("utf-8").partition(":")
+        if entry_version != str(version):
+            self.stale_hits += 1
+            return None, version
+        return serialised, version
+
+    def set(self, key: Text, value: Text) -> None:
+        self._set_script(keys=self._keys(key), args=[value, self.ttl_seconds])
+
+    def fill(self, key: Text, value: Text, version: Optional[int]) -> None:
+        """Guarda la copia leída de SQL solo si nadie ha guardado una versión nueva desde `get`."""
+        self._fill_script(keys=self._keys(key), args=[value, self.ttl_seconds, version or 0])
+
+    def delete(self, key: Text) -> None:
+        self.client.delete(self.prefix + key)
+
+
+class JournalWriter:
+    """
+    Diario de escrituras pendientes, escrito en un hilo en segundo plano para
+    no bloquear el bucle de eventos de Rasa con E/S de disco.
+
+    Cada línea es un objeto JSON: `{"sender_id", "events"}` con los eventos
+    nuevos de un turno, o `{"committed": {sender_id: n}}` cuando los n
+    primeros eventos pendientes de cada conversación ya están en SQL.
+    """
+
+    _TRUNCATE = object()
+    _STOP = object()
+
+    def __init__(self, path: Text) -> None:
+        self.path = path
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="tracker-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: Dict[Text, Any]) -> None:
+        self._queue.put(json.dumps(entry))
+
+    def truncate(self) -> None:
+        self._queue.put(self._TRUNCATE)
+
+    def close(self) -> None:
+        """Escribe lo que quede en la cola y detiene el hilo."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                items = [self._queue.get()]
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for item in items:
+                    if item is self._STOP:
+                        f.flush()
+                        return
+                    if item is self._TRUNCATE:
+                        f.truncate(0)
+                        f.seek(0)
+                    else:
+                        f.write(item + "\n")
+                f.flush()
+
+
+class WriteBehindTrackerStore(TrackerStore, SerializedTrackerAsText):
+    """Tracker store con caché caliente y escritura diferida al SQLTrackerStore."""
+
+    def __init__(
+        self,
+        domain: Optional[Domain] = None,
+        host: Optional[Text] = None,
+        event_broker: Optional[EventBroker] = None,
+        cache_backend: Text = "local",
+        cache_size: int = 2000,
+        ttl_seconds: float = 900,
+        redis_url: Optional[Text] = None,
+        flush_interval: float = 0.5,
+        flush_batch_size: int = 100,
+        journal_path: Text = "journal/tracker_writes.jsonl",
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(domain, event_broker, **kwargs)
+        self.backing_store = SQLTrackerStore(domain=domain, host=host, **kwargs)
+        self.shared_cache = cache_backend == "redis"
+        if self.shared_cache:
+            self.cache = RedisTrackerCache(redis_url or "redis://localhost:6379/0", ttl_seconds)
+        else:
+            self.cache = LocalTrackerCache(int(cache_size), float(ttl_seconds))
+
+        self.flush_interval = float(flush_interval)
+        self.flush_batch_size = int(flush_batch_size)
+        self.journal_path = journal_path
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+
+        # Conversaciones con cambios sin escribir: sender_id -> (tracker serializado, eventos nuevos)
+        self._dirty: "OrderedDict[Text, Tuple[Text, List[Dict[Text, Any]]]]" = OrderedDict()
+        # Las que se están escribiendo ahora mismo; siguen siendo la versión más reciente
+        self._flushing: Dict[Text, Tuple[Text, List[Dict[Text, Any]]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        self._recover_journal()
+        self._journal = JournalWriter(self.journal_path)
+        atexit.register(self._flush_on_exit)
+
+    @property
+    def domain(self) -> Domain:
+        return self._domain
+
+    @domain.setter
+    def domain(self, domain: Optional[Domain]) -> None:
+        self._domain = domain or Domain.empty()
+        if hasattr(self, "backing_store"):
+            self.backing_store.domain = domain
+
+    async def save(self, tracker: DialogueStateTracker) -> None:
+        """Guarda el tracker en la caché y anota sus eventos nuevos para escribirlos en segundo plano."""
+        if self.event_broker:
+            await self.stream_events(tracker)
+
+        sender_id = tracker.sender_id
+        known = getattr(tracker, KNOWN_EVENTS_ATTR, None)
+        if known is None:
+            # Tracker que no salió de retrieve (p. ej. reemplazado desde la API):
+            # se toman como nuevos los eventos que no están en SQL, como SQLTrackerStore
+            pending = self._pending_entry(sender_id)
+            known = await self._run(self._stored_event_count, sender_id) + (len(pending[1]) if pending else 0)
+        new_events = [event.as_dict() for event in itertools.islice(tracker.events, known, None)]
+        setattr(tracker, KNOWN_EVENTS_ATTR, len(tracker.events))
+
+        serialised = self.serialise_tracker(tracker)
+        await self._cache_call(self.cache.set, sender_id, serialised)
+        _, pending_events = self._dirty.pop(sender_id, (None, []))
+        self._dirty[sender_id] = (serialised, pending_events + new_events)
+        if new_events:
+            self._journal.append({"sender_id": sender_id, "events": new_events})
+
+        self._ensure_flush_task()
+
+    async def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        """
+        Devuelve el tracker desde los pendientes, la caché o, si no, desde SQL.
+        Con la caché compartida, una entrada cuya versión no es la última
+        (otra réplica guardó después) se descarta y se vuelve a leer de SQL.
+        """
+        tracker = None
+        pending = self._pending_entry(sender_id)
+        if pending is not None:
+            tracker = self.deserialise_tracker(sender_id, pending[0])
+        else:
+            serialised, version = await self._cache_call(self.cache.get, sender_id, default=(None, None))
+            if serialised is not None:
+                tracker = self.deserialise_tracker(sender_id, serialised)
+            if tracker is None:
+                tracker = await self.backing_store.retrieve(sender_id)
+                if tracker is not None:
+                    await self._cache_call(self.cache.fill, sender_id, self.serialise_tracker(tracker), version)
+
+        if tracker is not None:
+            # Todos sus eventos están ya en SQL o pendientes de escribir
+            setattr(tracker, KNOWN_EVENTS_ATTR, len(tracker.events))
+        return tracker
+
+    async def _cache_call(self, method: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        """
+        Llama a la caché: la de Redis fuera del bucle de eventos. Si falla, se
+        sigue sin caché (las lecturas van a SQL) y se devuelve `default`.
+        """
+        try:
+            if self.shared_cache:
+                return await self._run(method, *args)
+            return method(*args)
+        except Exception as e:
+            logger.warning(f"Caché de trackers no disponible: {e}")
+            return default
+
+    def _stored_event_count(self, sender_id: Text) -> int:
+        """Eventos de la última sesión en SQL: los que SQLTrackerStore.retrieve devolvería."""
+        with self.backing_store.session_scope() as session:
+            return self.backing_store._event_query(
+                session, sender_id, fetch_events_from_all_sessions=False
+            ).count()
+
+    def _pending_entry(self, sender_id: Text) -> Optional[Tuple[Text, List[Dict[Text, Any]]]]:
+        return self._dirty.get(sender_id) or self._flushing.get(sender_id)
+
+    async def retrieve_full_tracker(self, conversation_id: Text) -> Optional[DialogueStateTracker]:
+        await self.flush()
+        return await self.backing_store.retrieve_full_tracker(conversation_id)
+
+    async def keys(self) -> Iterable[Text]:
+        return set(await self.backing_store.keys()) | set(self._dirty) | set(self._flushing)
+
+    @staticmethod
+    async def _run(function: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta E/S bloqueante (SQL, Redis) fuera del bucle de eventos."""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args))
+
+    def _ensure_flush_task(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error al escribir trackers en la base de datos: {e}")
+
+    async def flush(self) -> int:
+        """Escribe en SQL los eventos pendientes, por lotes. Devuelve cuántas conversaciones escribió."""
+        written = 0
+        # El candado se crea dentro del bucle de eventos que lo va a usar
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._dirty:
+                batch = []
+                while self._dirty and len(batch) < self.flush_batch_size:
+                    batch.append(self._dirty.popitem(last=False))
+                self._flushing.update(batch)
+                try:
+                    await self._run(self._insert_events, [(sender_id, events) for sender_id, (_, events) in batch])
+                except Exception:
+                    # Se devuelven al principio, delante de lo que haya llegado mientras tanto
+                    for sender_id, (serialised, events) in reversed(batch):
+                        newer = self._dirty.pop(sender_id, None)
+                        self._dirty[sender_id] = (newer[0], events + newer[1]) if newer else (serialised, events)
+                        self._dirty.move_to_end(sender_id, last=False)
+                    raise
+                finally:
+                    for sender_id, _ in batch:
+                        self._flushing.pop(sender_id, None)
+                self._journal.append({"committed": {sender_id: len(events) for sender_id, (_, events) in batch
+                                                    if events}})
+                written += len(batch)
+            # Solo se vacía cuando no queda nada pendiente, así el diario siempre
+            # contiene todos los eventos sin escribir.
+            if not self._dirty:
+                self._journal.truncate()
+        return written
+
+    def _insert_events(self, batch: List[Tuple[Text, List[Dict[Text, Any]]]]) -> None:
+        """Inserta los eventos en la tabla de SQLTrackerStore en una sola transacción."""
+        store = self.backing_store
+        with store.session_scope() as session:
+            for sender_id, events in batch:
+                for data in events:
+                    session.add(store.SQLEvent(
+                        sender_id=sender_id,
+                        type_name=data.get("event"),
+                        timestamp=data.get("timestamp"),
+                        intent_name=(data.get("parse_data") or {}).get("intent", {}).get(INTENT_NAME_KEY),
+                        action_name=data.get("name"),
+                        data=json.dumps(data),
+                    ))
+            session.commit()
+
+    def _recover_journal(self) -> None:
+        """Escribe en SQL los eventos que quedaron pendientes en el último arranque."""
+        if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+            return
+        pending: "OrderedDict[Text, List[Dict[Text, Any]]]" = OrderedDict()
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última línea incompleta por una caída
+                    continue
+                if "committed" in entry:
+                    for sender_id, count in entry["committed"].items():
+                        pending[sender_id] = pending.get(sender_id, [])[count:]
+                else:
+                    pending.setdefault(entry["sender_id"], []).extend(entry["events"])
+
+        batch = [(sender_id, events) for sender_id, events in pending.items() if events]
+        logger.info(f"Recuperando los eventos pendientes de {len(batch)} conversaciones del diario")
+        if batch:
+            self._insert_events(batch)
+        os.remove(self.journal_path)
+
+    def _flush_on_exit(self) -> None:
+        try:
+            if self._dirty:
+                self._flush_lock = None
+                asyncio.run(self.flush())
+        except Exception as e:
+            # Los pendientes siguen en el diario y se recuperarán al arrancar
+            logger.error(f"No se pudieron escribir los trackers pendientes al salir: {e}")
+        finally:
+            self._journal.close()
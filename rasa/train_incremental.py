@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento incremental del modelo de Rasa.
+
+Calcula una huella del dominio, la configuración, el NLU, las historias y las
+reglas, y la compara con la del último entrenamiento para decidir:
+
+- Sin cambios: no se entrena y se reutiliza el último modelo.
+- Solo se añadieron ejemplos de NLU: se ajusta el último modelo con
+  `rasa train --finetune` usando una fracción de las épocas.
+- Cualquier otro cambio: entrenamiento completo, reutilizando la caché de
+  componentes de Rasa (featurizers incluidos) en un directorio persistente.
+
+Ejecutar este script con: python train_incremental.py [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import yaml
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(PROJECT_DIR, "models")
+STATE_FILE = os.path.join(MODELS_DIR, ".training_state.json")
+CACHE_DIR = os.environ.get("RASA_CACHE_DIRECTORY", os.path.join(MODELS_DIR, ".rasa_cache"))
+
+SOURCES = {
+    "config": "config.yml",
+    "domain": "domain.yml",
+    "nlu": os.path.join("data", "nlu.yml"),
+    "stories": os.path.join("data", "stories.yml"),
+    "rules": os.path.join("data", "rules.yml"),
+}
+
+
+def load_yaml(relative_path):
+    path = os.path.join(PROJECT_DIR, relative_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def fingerprint(content):
+    """Huella estable del contenido YAML (independiente del formato y los comentarios)."""
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def nlu_examples(content):
+    """Devuelve el conjunto de huellas de (intención, ejemplo) del archivo NLU."""
+    examples = set()
+    for item in (content or {}).get("nlu", []):
+        key = item.get("intent") or item.get("synonym") or item.get("regex") or item.get("lookup")
+        for line in (item.get("examples") or "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                digest = hashlib.sha1(f"{key}\x00{line[2:].strip()}".encode("utf-8")).hexdigest()
+                examples.add(digest)
+    return examples
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def plan_training(state, fingerprints, examples):
+    """
+    Decide el modo de entrenamiento.
+
+    Returns:
+        Una tupla (modo, motivo) con modo en "skip", "finetune" o "full".
+    """
+    last_model = state.get("last_model")
+    if not last_model or not os.path.exists(os.path.join(PROJECT_DIR, last_model)):
+        return "full", "no hay un modelo anterior"
+
+    previous = state.get("fingerprints", {})
+    changed = [name for name, value in fingerprints.items() if previous.get(name) != value]
+    if not changed:
+        return "skip", "no hay cambios desde el último entrenamiento"
+
+    if changed == ["nlu"]:
+        previous_examples = set(state.get("nlu_examples", []))
+        if previous_examples and previous_examples <= examples:
+            added = len(examples - previous_examples)
+            return "finetune", f"solo se añadieron {added} ejemplos de NLU"
+        return "full", "se modificaron o eliminaron ejemplos de NLU"
+
+    return "full", f"cambios en: {', '.join(changed)}"
+
+
+def run_rasa_train(mode, state, model_name, epoch_fraction):
+    command = ["rasa", "train", "--out", MODELS_DIR, "--fixed-model-name", model_name]
+    if mode == "finetune":
+        command += ["--finetune", os.path.join(PROJECT_DIR, state["last_model"]),
+                    "--epoch-fraction", str(epoch_fraction)]
+
+    env = dict(os.environ, RASA_CACHE_DIRECTORY=CACHE_DIR)
+    subprocess.run(command, check=True, cwd=PROJECT_DIR, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrenamiento incremental de Rasa")
+    parser.add_argument("--force", action="store_true", help="Forzar un entrenamiento completo")
+    parser.add_argument("--epoch-fraction", type=float, default=0.2,
+                        help="Fracción de épocas para el ajuste incremental")
+    args = parser.parse_args()
+
+    contents = {name: load_yaml(path) for name, path in SOURCES.items()}
+    fingerprints = {name: fingerprint(content) for name, content in contents.items()}
+    examples = nlu_examples(contents["nlu"])
+
+    state = load_state()
+    mode, reason = ("full", "entrenamiento forzado") if args.force else plan_training(state, fingerprints, examples)
+    full_seconds = state.get("last_full_seconds")
+    print(f"🧭 Modo de entrenamiento: {mode} ({reason})")
+
+    if mode == "skip":
+        print(f"✅ Se reutiliza el modelo {state['last_model']}")
+        if full_seconds:
+            print(f"⏱️ Tiempo ahorrado: ~{full_seconds:.0f} s")
+        return 0
+
+    model_name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    start = time.time()
+    try:
+        run_rasa_train(mode, state, model_name, args.epoch_fraction)
+    except subprocess.CalledProcessError as e:
+        if mode != "finetune":
+            print(f"❌ Error al entrenar el modelo: {e}")
+            return 1
+        # Rasa rechaza el ajuste si el modelo anterior no es compatible
+        print("⚠️ El ajuste incremental falló, se realiza un entrenamiento completo.")
+        mode = "full"
+        start = time.time()
+        try:
+            run_rasa_train(mode, state, model_name, args.epoch_fraction)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error al entrenar el modelo: {e}")
+            return 1
+    elapsed = time.time() - start
+
+    if mode == "full":
+        state["last_full_seconds"] = elapsed
+    state.update({
+        "last_model": os.path.relpath(os.path.join(MODELS_DIR, f"{model_name}.tar.gz"), PROJECT_DIR),
+        "fingerprints": fingerprints,
+        "nlu_examples": sorted(examples),
+        "last_mode": mode,
+        "last_seconds": elapsed,
+    })
+    save_state(state)
+
+    print(f"✅ Modelo {state['last_model']} entrenado en {elapsed:.1f} s")
+    if mode == "finetune" and full_seconds:
+        print(f"⏱️ Tiempo ahorrado frente al último entrenamiento completo: ~{max(full_seconds - elapsed, 0):.0f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
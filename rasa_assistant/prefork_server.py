@@ -0,0 +1,203 @@
+"""
+Servidor de acciones con varios procesos trabajadores pre-bifurcados.
+
+El proceso maestro importa el paquete de acciones (y con él VADER, spaCy y
+demás recursos de solo lectura), congela el recolector de basura para que
+esas páginas de memoria no se copien al escribir, abre el socket del puerto
+y después crea los trabajadores con fork(). Todos aceptan conexiones del
+mismo socket, de modo que el rendimiento crece con el número de núcleos sin
+cargar los modelos una vez por proceso.
+
+Reciclado de trabajadores:
+- Con `max_requests`, cada trabajador termina de forma ordenada tras atender
+  ese número de peticiones (más una variación aleatoria para que no se
+  reinicien todos a la vez) y el maestro lo sustituye.
+- Con SIGHUP, el maestro reemplaza los trabajadores uno a uno.
+- Con SIGTERM o SIGINT, el maestro detiene todos los trabajadores y sale.
+
+Cada trabajador sirve la aplicación con `create_server` en su propio bucle de
+eventos. `app.run` no sirve aquí: en Sanic 22 arranca su propio gestor de
+procesos, que vuelve a abrir el puerto en cada trabajador (EADDRINUSE).
+"""
+
+import asyncio
+import gc
+import os
+import random
+import signal
+import socket
+import time
+
+# Tiempo máximo que se espera a un trabajador antes de forzar su cierre
+WORKER_GRACEFUL_TIMEOUT = float(os.getenv("ACTION_WORKER_GRACEFUL_TIMEOUT", "30"))
+
+
+class PreforkActionServer:
+    """Proceso maestro que mantiene un grupo de trabajadores del servidor de acciones."""
+
+    def __init__(self, action_package="actions", host="0.0.0.0", port=5055, workers=None,
+                 max_requests=0, max_requests_jitter=0):
+        self.action_package = action_package
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.app = None
+        self.sock = None
+        self.children = {}
+        self._shutting_down = False
+        self._reload_requested = False
+
+    def create_app(self):
+        """Aplicación Sanic del servidor de acciones."""
+        from rasa_sdk.endpoint import create_app
+
+        return create_app(self.action_package)
+
+    def prepare(self):
+        """Carga las acciones y sus recursos y abre el socket antes de bifurcar."""
+        self.app = self.create_app()
+        if self.max_requests:
+            self._install_recycling()
+
+        # Los objetos ya cargados no los vuelve a recorrer el recolector, así
+        # sus páginas se comparten con los trabajadores sin copiarse
+        gc.collect()
+        gc.freeze()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(1024)
+        self.sock.set_inheritable(True)
+
+    def _install_recycling(self):
+        state = {"served": 0, "limit": self.max_requests}
+
+        @self.app.middleware("response")
+        async def count_requests(request, response):
+            state["served"] += 1
+            if state["served"] == state["limit"]:
+                # Se deja terminar la respuesta en curso antes de detener el trabajador
+                asyncio.get_running_loop().call_later(0.1, os.kill, os.getpid(), signal.SIGTERM)
+
+        self._recycle_state = state
+
+    def spawn(self):
+        """Crea un trabajador y devuelve su pid."""
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+
+        # Proceso trabajador
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # Las acciones usan random; cada trabajador necesita su propia semilla
+        random.seed()
+        if self.max_requests:
+            self._recycle_state["limit"] = self.max_requests + random.randint(0, self.max_requests_jitter)
+        exit_code = 0
+        try:
+            self.serve()
+        except Exception as e:
+            print(f"❌ Error en el trabajador {os.getpid()}: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def serve(self):
+        """Atiende peticiones en el socket compartido hasta recibir SIGTERM o SIGINT."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(
+            self.app.create_server(sock=self.sock, access_log=False, return_asyncio_server=True)
+        )
+        loop.run_until_complete(server.startup())
+        loop.run_until_complete(server.before_start())
+        loop.run_until_complete(server.after_start())
+
+        # Parada ordenada: deja de aceptar conexiones y termina las respuestas en curso
+        stopped = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopped.set)
+        loop.run_until_complete(stopped.wait())
+
+        loop.run_until_complete(server.before_stop())
+        server.server.close()
+        for connection in list(server.connections):
+            connection.close_if_idle()
+        try:
+            loop.run_until_complete(asyncio.wait_for(server.wait_closed(), WORKER_GRACEFUL_TIMEOUT))
+        except asyncio.TimeoutError:
+            pass
+        loop.run_until_complete(server.after_stop())
+        loop.close()
+
+    def stop_worker(self, pid, timeout=WORKER_GRACEFUL_TIMEOUT):
+        """Detiene un trabajador de forma ordenada, forzando el cierre si no responde."""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            finished, _ = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.pop(pid, None)
+
+    def rolling_restart(self):
+        """Sustituye los trabajadores uno a uno sin dejar de atender peticiones."""
+        for pid in list(self.children):
+            self.spawn()
+            self.stop_worker(pid)
+        print(f"♻️ {len(self.children)} trabajadores reemplazados")
+
+    def _on_shutdown(self, signum, frame):
+        self._shutting_down = True
+
+    def _on_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def run(self):
+        self.prepare()
+        signal.signal(signal.SIGTERM, self._on_shutdown)
+        signal.signal(signal.SIGINT, self._on_shutdown)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚀 Servidor de acciones en el puerto {self.port} con {self.workers} trabajadores "
+              f"(maestro {os.getpid()})")
+
+        while not self._shutting_down:
+            if self._reload_requested:
+                self._reload_requested = False
+                self.rolling_restart()
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.children:
+                started = self.children.pop(pid)
+                # Evita un bucle de reinicios si el trabajador falla al arrancar
+                if time.monotonic() - started < 1:
+                    time.sleep(1)
+                if not self._shutting_down:
+                    self.spawn()
+                continue
+            time.sleep(0.2)
+
+        print("\n🛑 Deteniendo trabajadores...")
+        for pid in list(self.children):
+            self.stop_worker(pid)
+        self.sock.close()
@@ -2,8 +2,10 @@
 """
 Script para iniciar el servidor de acciones de Rasa.
 Ejecutar este script con: python start_action_server.py
+Con varios procesos trabajadores: python start_action_server.py --workers 4 --max-requests 10000
 """
 
+import argparse
 import subprocess
 import os
 import sys
@@ -52,12 +54,12 @@ def check_dependencies():
     print("✅ Todas las dependencias necesarias están instaladas.")
     return True
 
-def start_action_server():
+def start_action_server(port=5055, workers=1, max_requests=0, max_requests_jitter=0):
     """Inicia el servidor de acciones de Rasa."""
     if not check_dependencies():
         return
     
-    print("\n🚀 Iniciando el servidor de acciones en el puerto 5055...")
+    print(f"\n🚀 Iniciando el servidor de acciones en el puerto {port}...")
     
     # Asegurarse de que estamos en el directorio correcto
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -72,14 +74,31 @@ def start_action_server():
         with open("actions/__init__.py", "w") as f:
             f.write("# Este archivo es necesario para que Python reconozca el directorio como un paquete\n")
     
+    # Varios trabajadores: se cargan las acciones una vez y se bifurca
+    if workers != 1:
+        sys.path.insert(0, script_dir)
+        from prefork_server import PreforkActionServer
+        PreforkActionServer("actions", port=port, workers=workers or None,
+                            max_requests=max_requests, max_requests_jitter=max_requests_jitter).run()
+        print("🛑 Servidor de acciones detenido.")
+        return
+    
     # Iniciar el servidor de acciones
     try:
-        subprocess.run(["rasa", "run", "actions", "--port", "5055"])
+        subprocess.run(["rasa", "run", "actions", "--port", str(port)])
     except KeyboardInterrupt:
         print("\n🛑 Servidor de acciones detenido.")
     except Exception as e:
         print(f"❌ Error al iniciar el servidor de acciones: {e}")
-        print("\nIntenta ejecutar manualmente: rasa run actions --port 5055")
+        print(f"\nIntenta ejecutar manualmente: rasa run actions --port {port}")
 
 if __name__ == "__main__":
-    start_action_server()
+    parser = argparse.ArgumentParser(description="Inicia el servidor de acciones de Rasa")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ACTION_SERVER_WORKERS", "1")),
+                        help="Procesos trabajadores (0 = uno por núcleo)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("ACTION_WORKER_MAX_REQUESTS", "0")),
+                        help="Peticiones tras las que se recicla un trabajador (0 = nunca)")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("ACTION_WORKER_MAX_REQUESTS_JITTER", "0")))
+    args = parser.parse_args()
+    start_action_server(args.port, args.workers, args.max_requests, args.max_requests_jitter)
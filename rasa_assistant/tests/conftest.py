@@ -0,0 +1,8 @@
+"""Configuración común de las pruebas de rasa_assistant."""
+
+import os
+import sys
+
+ASSISTANT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ASSISTANT_DIR)
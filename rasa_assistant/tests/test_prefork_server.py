@@ -0,0 +1,90 @@
+"""Prueba de humo del servidor de acciones pre-bifurcado."""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip("sanic")
+
+ASSISTANT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Servidor con una aplicación mínima en lugar de las acciones (sin rasa_sdk ni modelos)
+SERVER = textwrap.dedent("""
+    import os
+    import sys
+
+    from sanic import Sanic
+    from sanic.response import json
+
+    from prefork_server import PreforkActionServer
+
+
+    class HealthServer(PreforkActionServer):
+        def create_app(self):
+            app = Sanic("prefork_smoke")
+
+            @app.get("/health")
+            async def health(request):
+                return json({"status": "ok", "pid": os.getpid()})
+
+            return app
+
+
+    HealthServer(host="127.0.0.1", port=int(sys.argv[1]), workers=2).run()
+""")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_health(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                return response.status, json.loads(response.read())
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def test_two_workers_serve_health_on_shared_socket(tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text(SERVER)
+    port = free_port()
+    process = subprocess.Popen([sys.executable, str(script), str(port)], cwd=ASSISTANT_DIR,
+                               env=dict(os.environ, PYTHONPATH=ASSISTANT_DIR),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                               start_new_session=True)
+    try:
+        pids = set()
+        for _ in range(40):
+            status, body = get_health(port)
+            assert status == 200
+            assert body["status"] == "ok"
+            pids.add(body["pid"])
+        # Las peticiones las atienden los trabajadores, nunca el maestro
+        assert process.pid not in pids
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            output, _ = process.communicate(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            raise
+
+    assert process.returncode == 0
+    assert "Address already in use" not in output
+    assert "Error en el trabajador" not in output
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Auditoría de índices y planes de consulta.
+
+Crea una base de datos desechable en un MySQL o MariaDB local a partir de los
+archivos de esquema del proyecto, la llena con datos sintéticos del tamaño
+indicado y ejecuta las consultas que lanza el código Python (acciones de
+Rasa, session_reaper y procedimientos de analítica):
+
+1. Obtiene el plan de cada consulta (EXPLAIN y EXPLAIN ANALYZE en MySQL,
+   ANALYZE FORMAT=JSON en MariaDB) y mide su latencia.
+2. Marca los recorridos completos de tabla o de índice.
+3. Prueba los índices candidatos de cada consulta marcada, conserva los que
+   eliminan el recorrido completo o mejoran la latencia y descarta el resto.
+4. Escribe la migración con los índices aceptados y un informe JSON con la
+   latencia antes y después.
+
+Los índices candidatos que ya crean los archivos de esquema se retiran antes
+de medir la consulta ("antes" es siempre sin el índice) y se vuelven a crear
+al probarlos; en el informe aparecen con `in_schema` y no se repiten en la
+migración.
+
+Ejecutar este script con:
+    python scripts/index_audit.py --host 127.0.0.1 --user root --password secret --messages 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import string
+import time
+from datetime import datetime, timedelta
+
+import pymysql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SCHEMAS = [
+    os.path.join(ROOT, "scripts", "init-db.sql"),
+    os.path.join(ROOT, "conversation_analytics.sql"),
+    os.path.join(ROOT, "subject_analytics.sql"),
+]
+
+INTENTS = [
+    "saludo", "despedida", "agradecimiento", "consulta_horarios", "consulta_profesor",
+    "consulta_curso", "consulta_ubicacion", "consulta_eventos", "consulta_tramites", "fallback",
+]
+
+FALLBACK_TEXTS = [
+    "¿Cuál es el horario de matemáticas?",
+    "¿Quién es el profesor de física?",
+    "¿Dónde está la biblioteca?",
+    "¿Cuándo son los exámenes finales?",
+    "¿Cómo solicito un certificado de estudios?",
+    "¿Qué eventos hay esta semana?",
+]
+
+# Consultas que ejecuta el código de producción. `{time}` es la columna de
+# fecha de `messages` (created_at o timestamp según el esquema) y `{bot}` el
+# valor del remitente del asistente.
+QUERIES = [
+    {
+        "name": "conversation_open",
+        "source": "rasa/actions/actions.py ActionGuardarMensaje",
+        "sql": """
+            SELECT id FROM conversations
+            WHERE session_id = %s AND ended_at IS NULL
+            ORDER BY started_at DESC
+            LIMIT 1""",
+        "params": lambda s: (s.session(),),
+        "candidates": [("conversations", "idx_conversations_session_open", "(session_id, ended_at, started_at)")],
+    },
+    {
+        "name": "knowledge_base_match",
+        "source": "rasa/actions/actions.py ActionConsultaKnowledgeBase",
+        "sql": """
+            SELECT answer
+            FROM knowledge_base
+            WHERE MATCH(question) AGAINST(%s IN NATURAL LANGUAGE MODE)
+            ORDER BY MATCH(question) AGAINST(%s IN NATURAL LANGUAGE MODE) DESC
+            LIMIT 1""",
+        "params": lambda s: (s.text(),) * 2,
+        "candidates": [("knowledge_base", "idx_knowledge_base_question", "FULLTEXT (question)")],
+    },
+    {
+        "name": "conversation_insert",
+        "source": "rasa/actions/actions.py ActionGuardarMensaje",
+        "sql": "INSERT INTO conversations (session_id) VALUES (%s)",
+        "params": lambda s: (s.new_session(),),
+    },
+    {
+        "name": "conversation_touch",
+        "source": "rasa/actions/actions.py ActionGuardarMensaje",
+        "sql": "UPDATE conversations SET last_activity_at = CURRENT_TIMESTAMP WHERE id = %s",
+        "params": lambda s: (s.conversation_id(),),
+        "requires": {"conversations": ["last_activity_at"]},
+    },
+    {
+        "name": "message_insert",
+        "source": "rasa/actions/actions.py ActionGuardarMensaje",
+        "sql": """
+            INSERT INTO messages (conversation_id, sender, message, intent, confidence)
+            VALUES (%s, 'user', %s, %s, %s)""",
+        "params": lambda s: (s.conversation_id(), s.text(), random.choice(INTENTS), round(random.random(), 4)),
+    },
+    {
+        "name": "entity_insert",
+        "source": "rasa/actions/actions.py ActionGuardarMensaje",
+        "sql": """
+            INSERT INTO entities (message_id, entity_name, entity_value, confidence)
+            VALUES (%s, 'curso', 'matemáticas', 0.9)""",
+        "params": lambda s: (s.message_id(),),
+        "requires": {"entities": ["message_id", "entity_name"]},
+    },
+    {
+        "name": "feedback_insert",
+        "source": "rasa/actions/actions.py ActionRegistrarFeedback",
+        "sql": "INSERT INTO feedback (message_id, rating, comment) VALUES (%s, %s, %s)",
+        "params": lambda s: (s.message_id(), random.randint(1, 5), "Gracias"),
+        "requires": {"feedback": ["message_id"]},
+    },
+    {
+        "name": "gazetteer_teachers_changed",
+        "source": "rasa/actions/gazetteer.py CatalogGazetteer.refresh",
+        "sql": "SELECT id, name, role, updated_at FROM users WHERE updated_at >= %s",
+        "params": lambda s: (s.day(),),
+        "candidates": [("users", "idx_users_updated_at", "(updated_at)")],
+    },
+    {
+        "name": "idle_conversations",
+        "source": "backend/session_reaper.py",
+        "sql": """
+            SELECT id, DATE(started_at)
+            FROM conversations
+            WHERE ended_at IS NULL AND last_activity_at < NOW() - INTERVAL %s MINUTE
+            ORDER BY last_activity_at
+            LIMIT %s""",
+        "params": lambda s: (30, 1000),
+        "requires": {"conversations": ["last_activity_at"]},
+        "candidates": [("conversations", "idx_conversations_idle", "(ended_at, last_activity_at)")],
+    },
+    {
+        "name": "daily_conversation_metrics",
+        "source": "conversation_analytics.sql calculate_daily_metrics",
+        "sql": """
+            SELECT
+                COUNT(DISTINCT c.id),
+                COUNT(m.id),
+                IFNULL(SUM(CASE WHEN m.intent = 'fallback' THEN 1 ELSE 0 END)
+                       / NULLIF(COUNT(CASE WHEN m.sender = 'user' THEN 1 ELSE NULL END), 0), 0)
+            FROM conversations c
+            JOIN messages m ON c.id = m.conversation_id
+            WHERE DATE(c.started_at) = %s""",
+        "params": lambda s: (s.day(),),
+        "candidates": [("conversations", "idx_conversations_started_at", "(started_at)")],
+        "note": "DATE(c.started_at) impide usar un índice sobre started_at; "
+                "reescribir como rango started_at >= fecha AND started_at < fecha + 1 día",
+    },
+    {
+        "name": "daily_intent_metrics",
+        "source": "conversation_analytics.sql calculate_daily_metrics",
+        "sql": """
+            SELECT IFNULL(m.intent, 'unknown') AS intent_name, COUNT(*), AVG(m.confidence),
+                   SUM(CASE WHEN m.intent = 'fallback' THEN 1 ELSE 0 END)
+            FROM messages m
+            JOIN conversations c ON m.conversation_id = c.id
+            WHERE DATE(m.{time}) = %s AND m.sender = 'user' AND m.intent IS NOT NULL
+            GROUP BY intent_name""",
+        "params": lambda s: (s.day(),),
+        "candidates": [("messages", "idx_messages_sender_time", "(sender, {time})")],
+        "note": "DATE(m.{time}) impide usar el índice por rango de fecha",
+    },
+]
+
+
+class Sampler:
+    """Valores de parámetros extraídos de los datos sintéticos cargados."""
+
+    def __init__(self, sessions, conversations, messages, days, texts):
+        self.sessions = sessions
+        self.conversations = conversations
+        self.messages = messages
+        self.days = days
+        self.texts = texts
+
+    def session(self):
+        return f"sesion_{random.randint(1, self.sessions)}"
+
+    def new_session(self):
+        return "auditoria_" + "".join(random.choices(string.ascii_lowercase, k=12))
+
+    def conversation_id(self):
+        return random.randint(1, self.conversations)
+
+    def message_id(self):
+        return random.randint(1, self.messages)
+
+    def day(self):
+        return (datetime.now() - timedelta(days=random.randint(0, self.days - 1))).date()
+
+    def text(self):
+        return random.choice(self.texts)
+
+
+def load_texts():
+    """Ejemplos de entrenamiento del NLU como textos de mensajes sintéticos."""
+    path = os.path.join(ROOT, "rasa", "data", "nlu.yml")
+    try:
+        import yaml
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except (ImportError, OSError):
+        return FALLBACK_TEXTS
+    texts = []
+    for item in data.get("nlu", []):
+        for line in str(item.get("examples", "")).splitlines():
+            line = re.sub(r"\[([^\]]+)\]\([^)]+\)|\[([^\]]+)\]\{[^}]+\}", r"\1\2", line.strip().lstrip("- "))
+            if line:
+                texts.append(line)
+    return texts or FALLBACK_TEXTS
+
+
+def split_statements(sql):
+    """Divide un archivo SQL en sentencias respetando las directivas DELIMITER."""
+    delimiter = ";"
+    statements = []
+    buffer = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split()[1]
+            continue
+        if not buffer and (not stripped or stripped.startswith("--")):
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = "\n".join(buffer).strip()
+            statements.append(statement[: -len(delimiter)].strip())
+            buffer = []
+    if buffer and "\n".join(buffer).strip():
+        statements.append("\n".join(buffer).strip())
+    return statements
+
+
+def apply_schema(cursor, paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        for statement in statements:
+            # La base de datos la elige la auditoría
+            if re.match(r"(CREATE\s+DATABASE|USE)\b", statement, re.IGNORECASE):
+                continue
+            try:
+                cursor.execute(statement)
+            except pymysql.MySQLError as e:
+                print(f"⚠️ {os.path.basename(path)}: {e.args[-1]} en «{statement.splitlines()[0][:60]}»")
+
+
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name, column_type FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,),
+    )
+    return {row[0].lower(): row[1] for row in cursor.fetchall()}
+
+
+def insert_batches(connection, cursor, sql, rows, batch_size=2000):
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[start:start + batch_size])
+        connection.commit()
+
+
+def load_synthetic_data(connection, args, texts):
+    """
+    Carga datos sintéticos. Los triggers se retiran durante la carga y se
+    vuelven a crear al final para que las inserciones medidas los incluyan.
+
+    Returns:
+        Sampler con los rangos de identificadores cargados.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT trigger_name FROM information_schema.triggers WHERE trigger_schema = DATABASE()")
+    triggers = []
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"SHOW CREATE TRIGGER `{name}`")
+        triggers.append((name, cursor.fetchone()[2]))
+        cursor.execute(f"DROP TRIGGER `{name}`")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+
+    conversation_columns = table_columns(cursor, "conversations")
+    message_columns = table_columns(cursor, "messages")
+    time_column = "created_at" if "created_at" in message_columns else "timestamp"
+    bot_sender = re.findall(r"'([^']+)'", message_columns["sender"])[1]
+
+    messages = args.messages
+    conversations = max(messages // 10, 1)
+    sessions = max(conversations // 3, 1)
+    now = datetime.now()
+
+    print(f"⏳ Cargando {conversations} conversaciones y {messages} mensajes...")
+    rows = []
+    starts = []
+    for i in range(conversations):
+        started_at = now - timedelta(days=random.random() * args.days)
+        starts.append(started_at)
+        ended_at = None if random.random() < args.open_ratio else started_at + timedelta(minutes=random.randint(1, 30))
+        row = [f"sesion_{random.randint(1, sessions)}", started_at, ended_at]
+        if "last_activity_at" in conversation_columns:
+            row.append(ended_at or started_at + timedelta(minutes=random.randint(0, 30)))
+        rows.append(tuple(row))
+    columns = "session_id, started_at, ended_at" + (", last_activity_at" if "last_activity_at" in conversation_columns else "")
+    placeholders = ", ".join(["%s"] * len(rows[0]))
+    insert_batches(connection, cursor, f"INSERT INTO conversations ({columns}) VALUES ({placeholders})", rows)
+
+    rows = []
+    for i in range(messages):
+        conversation_id = random.randint(1, conversations)
+        created_at = starts[conversation_id - 1] + timedelta(seconds=random.randint(0, 1800))
+        if i % 2 == 0:
+            rows.append((conversation_id, "user", random.choice(texts), random.choice(INTENTS),
+                         round(random.random(), 4), created_at))
+        else:
+            rows.append((conversation_id, bot_sender, random.choice(texts), None, None, created_at))
+    insert_batches(connection, cursor,
+                   f"INSERT INTO messages (conversation_id, sender, message, intent, confidence, {time_column}) "
+                   f"VALUES (%s, %s, %s, %s, %s, %s)", rows)
+
+    entity_columns = table_columns(cursor, "entities")
+    if "entity_name" in entity_columns:
+        rows = [(random.randint(1, messages), "curso", "matemáticas", 0.9) for _ in range(messages // 2)]
+        insert_batches(connection, cursor, "INSERT INTO entities (message_id, entity_name, entity_value, confidence) "
+                                           "VALUES (%s, %s, %s, %s)", rows)
+
+    if table_columns(cursor, "feedback"):
+        rows = [(random.randint(1, messages), random.randint(1, 5), "Comentario") for _ in range(messages // 20)]
+        insert_batches(connection, cursor, "INSERT INTO feedback (message_id, rating, comment) VALUES (%s, %s, %s)", rows)
+
+    if table_columns(cursor, "knowledge_base"):
+        rows = [(1, random.choice(texts) + f" ({i})", f"Respuesta sintética {i}") for i in range(args.knowledge)]
+        insert_batches(connection, cursor, "INSERT INTO knowledge_base (document_id, question, answer) "
+                                           "VALUES (%s, %s, %s)", rows)
+
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    for name, statement in triggers:
+        cursor.execute(statement)
+    cursor.execute("ANALYZE TABLE conversations, messages")
+    cursor.fetchall()
+    connection.commit()
+    cursor.close()
+
+    sampler = Sampler(sessions, conversations, messages, args.days, texts)
+    return sampler, {"time": time_column, "bot": bot_sender}
+
+
+def is_mariadb(cursor):
+    cursor.execute("SELECT VERSION()")
+    return "mariadb" in cursor.fetchone()[0].lower()
+
+
+def explain(cursor, sql, params, scan_threshold):
+    """Plan de la consulta y los recorridos completos que contiene."""
+    cursor.execute("EXPLAIN " + sql, params)
+    names = [d[0].lower() for d in cursor.description]
+    plan = [dict(zip(names, row)) for row in cursor.fetchall()]
+    scans = [
+        f"{step['table']} ({step['type']}, ~{step['rows']} filas)"
+        for step in plan
+        if step.get("type") in ("ALL", "index") and (step.get("rows") or 0) >= scan_threshold
+    ]
+    return plan, scans
+
+
+def analyze(cursor, sql, params, mariadb):
+    """Plan con tiempos reales (solo consultas SELECT)."""
+    try:
+        cursor.execute(("ANALYZE FORMAT=JSON " if mariadb else "EXPLAIN ANALYZE ") + sql, params)
+        return "\n".join(str(row[0]) for row in cursor.fetchall())
+    except pymysql.MySQLError as e:
+        return f"no disponible: {e.args[-1]}"
+
+
+def measure(connection, cursor, query, sql, sampler, repetitions):
+    """Mediana y p95 de latencia en ms; las escrituras se deshacen tras cada ejecución."""
+    timings = []
+    for _ in range(repetitions):
+        params = query["params"](sampler)
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+        connection.rollback()
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+    }
+
+
+def run_query(connection, query, sql, sampler, args, mariadb):
+    """Plan, recorridos completos y latencia de una consulta."""
+    cursor = connection.cursor()
+    params = query["params"](sampler)
+    result = {}
+    try:
+        result["plan"], result["full_scans"] = explain(cursor, sql, params, args.scan_threshold)
+        if sql.lstrip().upper().startswith("SELECT"):
+            result["analyze"] = analyze(cursor, sql, params, mariadb)
+        result.update(measure(connection, cursor, query, sql, sampler, args.repetitions))
+    except pymysql.MySQLError as e:
+        connection.rollback()
+        result = {"error": e.args[-1]}
+    cursor.close()
+    return result
+
+
+def index_exists(cursor, table, name):
+    cursor.execute(f"SHOW INDEX FROM `{table}` WHERE Key_name = %s", (name,))
+    return bool(cursor.fetchall())
+
+
+def existing_index_ddl(cursor, table, name):
+    """DDL que vuelve a crear un índice existente tal como está definido."""
+    cursor.execute(f"SHOW INDEX FROM `{table}` WHERE Key_name = %s", (name,))
+    names = [d[0].lower() for d in cursor.description]
+    rows = sorted((dict(zip(names, row)) for row in cursor.fetchall()), key=lambda r: r["seq_in_index"])
+    columns = ", ".join(
+        r["column_name"] + (f"({r['sub_part']})" if r.get("sub_part") else "") for r in rows
+    )
+    if rows[0]["index_type"] == "FULLTEXT":
+        return f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({columns});"
+    unique = "UNIQUE " if not int(rows[0]["non_unique"]) else ""
+    return f"CREATE {unique}INDEX {name} ON {table} ({columns});"
+
+
+def withdraw_schema_indexes(cursor, query):
+    """
+    Retira los índices candidatos de la consulta que ya existen en el esquema
+    para medir la latencia sin ellos.
+
+    Returns:
+        Diccionario nombre -> DDL original de los índices retirados.
+    """
+    withdrawn = {}
+    for table, name, _ in query.get("candidates", []):
+        if not index_exists(cursor, table, name):
+            continue
+        ddl = existing_index_ddl(cursor, table, name)
+        try:
+            cursor.execute(f"DROP INDEX {name} ON {table}")
+        except pymysql.MySQLError as e:
+            # Por ejemplo, si respalda una clave foránea
+            print(f"⚠️ No se puede retirar {name} para medir {query['name']}: {e.args[-1]}")
+            continue
+        withdrawn[name] = ddl
+    return withdrawn
+
+
+def index_ddl(table, name, definition):
+    if definition.upper().startswith("FULLTEXT"):
+        return f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} {definition[len('FULLTEXT'):].strip()};"
+    return f"CREATE INDEX {name} ON {table} {definition};"
+
+
+def improved(before, after, min_gain):
+    if "error" in after:
+        return False
+    if "error" in before:
+        return True
+    if before["full_scans"] and not after["full_scans"]:
+        return True
+    return after["median_ms"] <= before["median_ms"] * (1 - min_gain)
+
+
+def audit(connection, sampler, placeholders, args):
+    cursor = connection.cursor()
+    mariadb = is_mariadb(cursor)
+    results = []
+    accepted = []
+
+    for query in QUERIES:
+        missing = [
+            f"{table}.{column}"
+            for table, columns in query.get("requires", {}).items()
+            for column in columns
+            if column not in table_columns(cursor, table)
+        ]
+        if missing:
+            results.append({"name": query["name"], "source": query["source"],
+                            "skipped": f"faltan columnas: {', '.join(missing)}"})
+            continue
+
+        sql = query["sql"].format(**placeholders)
+        withdrawn = withdraw_schema_indexes(cursor, query)
+        before = run_query(connection, query, sql, sampler, args, mariadb)
+        entry = {"name": query["name"], "source": query["source"], "before": before, "candidates": []}
+        if "note" in query:
+            entry["note"] = query["note"].format(**placeholders)
+
+        restore = dict(withdrawn)
+        if "error" in before or before["full_scans"]:
+            for table, name, definition in query.get("candidates", []):
+                if index_exists(cursor, table, name):
+                    continue
+                ddl = withdrawn.get(name) or index_ddl(table, name, definition.format(**placeholders))
+                cursor.execute(ddl.rstrip(";"))
+                restore.pop(name, None)
+                after = run_query(connection, query, sql, sampler, args, mariadb)
+                candidate = {"ddl": ddl, "after": after, "accepted": improved(before, after, args.min_gain),
+                             "in_schema": name in withdrawn}
+                entry["candidates"].append(candidate)
+                if candidate["accepted"]:
+                    if not candidate["in_schema"]:
+                        accepted.append(ddl)
+                    entry["after"] = after
+                    break
+                if name not in withdrawn:
+                    cursor.execute(f"DROP INDEX {name} ON {table}")
+        # Los índices del esquema vuelven a su sitio para las consultas siguientes
+        for ddl in restore.values():
+            cursor.execute(ddl.rstrip(";"))
+        results.append(entry)
+
+    cursor.close()
+    return results, accepted
+
+
+def print_report(results):
+    print(f"\n{'consulta':<28} {'antes (ms)':>11} {'después (ms)':>13}  observaciones")
+    for entry in results:
+        if "skipped" in entry:
+            print(f"{entry['name']:<28} {'-':>11} {'-':>13}  omitida: {entry['skipped']}")
+            continue
+        before = entry["before"]
+        after = entry.get("after")
+        before_text = "error" if "error" in before else f"{before['median_ms']:.3f}"
+        after_text = f"{after['median_ms']:.3f}" if after else "-"
+        notes = []
+        if "error" in before:
+            notes.append(f"❌ {before['error']}")
+        elif before["full_scans"]:
+            notes.append("⚠️ recorrido completo: " + ", ".join(before["full_scans"]))
+        for candidate in entry["candidates"]:
+            notes.append(("✅ " if candidate["accepted"] else "✖ ") + candidate["ddl"]
+                         + (" (ya en el esquema)" if candidate.get("in_schema") else ""))
+        if entry.get("note") and not after and (before.get("full_scans") or "error" in before):
+            notes.append(f"💡 {entry['note']}")
+        print(f"{entry['name']:<28} {before_text:>11} {after_text:>13}  {' | '.join(notes) or 'ok'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoría de índices y planes de consulta")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="eduassistai_index_audit",
+                        help="Base de datos desechable (se elimina y se vuelve a crear)")
+    parser.add_argument("--schema", action="append", help="Archivos de esquema (por defecto los del proyecto)")
+    parser.add_argument("--messages", type=int, default=100000, help="Mensajes sintéticos a cargar")
+    parser.add_argument("--knowledge", type=int, default=5000, help="Entradas sintéticas de knowledge_base")
+    parser.add_argument("--days", type=int, default=90, help="Días de historial sintético")
+    parser.add_argument("--open-ratio", type=float, default=0.05, help="Proporción de conversaciones abiertas")
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--scan-threshold", type=int, default=1000,
+                        help="Filas estimadas a partir de las que se marca un recorrido completo")
+    parser.add_argument("--min-gain", type=float, default=0.2, help="Mejora mínima de latencia para aceptar un índice")
+    parser.add_argument("--output", default="index_audit_migration.sql")
+    parser.add_argument("--report", default="index_audit_report.json")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    connection = pymysql.connect(host=args.host, port=args.port, user=args.user,
+                                 password=args.password, charset="utf8mb4")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+            cursor.execute(f"CREATE DATABASE `{args.database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            cursor.execute(f"USE `{args.database}`")
+            apply_schema(cursor, args.schema or DEFAULT_SCHEMAS)
+        connection.commit()
+
+        sampler, placeholders = load_synthetic_data(connection, args, load_texts())
+        results, accepted = audit(connection, sampler, placeholders, args)
+    finally:
+        connection.close()
+
+    print_report(results)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"messages": args.messages, "results": results}, f, indent=2, default=str, ensure_ascii=False)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(f"-- Índices propuestos por scripts/index_audit.py ({datetime.now():%Y-%m-%d})\n")
+        for ddl in accepted:
+            f.write(ddl + "\n")
+
+    print(f"\n✅ {len(accepted)} índices nuevos aceptados, migración en {args.output}, informe en {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,8 @@ CREATE TABLE IF NOT EXISTS users (
     password VARCHAR(255) NOT NULL,
     role ENUM('admin', 'teacher', 'student') NOT NULL DEFAULT 'student',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_users_updated_at (updated_at)
 );
 
 -- Tabla de instituciones
@@ -45,6 +46,9 @@ CREATE TABLE IF NOT EXISTS conversations (
     session_id VARCHAR(255) NOT NULL,
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     ended_at TIMESTAMP NULL,
+    last_activity_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_conversations_session_open (session_id, ended_at, started_at),
+    INDEX idx_conversations_idle (ended_at, last_activity_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
 
@@ -57,9 +61,19 @@ CREATE TABLE IF NOT EXISTS messages (
     intent VARCHAR(255),
     confidence FLOAT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_messages_intent (intent, id),
     FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
 );
 
+-- Punto de control de los procesos por lotes (último mensaje procesado o
+-- momento de la última ejecución)
+CREATE TABLE IF NOT EXISTS batch_job_state (
+    job VARCHAR(50) PRIMARY KEY,
+    last_message_id INT NOT NULL DEFAULT 0,
+    checkpoint_at TIMESTAMP NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- Tabla de feedback
 CREATE TABLE IF NOT EXISTS feedback (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -88,6 +102,7 @@ CREATE TABLE IF NOT EXISTS knowledge_base (
     answer TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT INDEX idx_knowledge_base_question (question),
     FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
 );
 
@@ -0,0 +1,43 @@
+-- Migración: cierre de conversaciones inactivas (backend/session_reaper.py)
+-- Ejecutar una sola vez sobre bases de datos existentes:
+--   mysql -u $DB_USERNAME -p $DB_DATABASE < scripts/migrations/001_session_reaper.sql
+
+-- Última actividad de la conversación, actualizada con cada mensaje
+-- (ActionGuardarMensaje y logMessage del panel). Se añade sin valor por
+-- defecto para que las filas existentes queden a NULL y se puedan rellenar
+-- con su último mensaje; el valor por defecto se pone después.
+ALTER TABLE conversations
+    ADD COLUMN last_activity_at TIMESTAMP NULL;
+
+-- La columna de fecha de `messages` difiere entre los esquemas del proyecto
+SET @message_time = (
+    SELECT IF(COUNT(*) > 0, 'timestamp', 'created_at')
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'messages' AND COLUMN_NAME = 'timestamp'
+);
+SET @backfill = CONCAT(
+    'UPDATE conversations c ',
+    'LEFT JOIN (SELECT conversation_id, MAX(`', @message_time, '`) AS last_message_at ',
+    '           FROM messages GROUP BY conversation_id) m ON m.conversation_id = c.id ',
+    'SET c.last_activity_at = GREATEST(c.started_at, COALESCE(m.last_message_at, c.started_at)) ',
+    'WHERE c.last_activity_at IS NULL'
+);
+PREPARE backfill FROM @backfill;
+EXECUTE backfill;
+DEALLOCATE PREPARE backfill;
+
+ALTER TABLE conversations
+    MODIFY COLUMN last_activity_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Búsqueda de la conversación abierta de una sesión:
+--   WHERE session_id = ? AND ended_at IS NULL ORDER BY started_at DESC LIMIT 1
+CREATE INDEX idx_conversations_session_open ON conversations (session_id, ended_at, started_at);
+
+-- Búsqueda de conversaciones abiertas e inactivas por el reaper
+CREATE INDEX idx_conversations_idle ON conversations (ended_at, last_activity_at);
+
+-- Las métricas diarias se recalculan por lotes desde el reaper, una vez por
+-- fecha afectada, en lugar de una llamada al procedimiento por cada fila. El
+-- reaper recalcula también las fechas de las conversaciones cerradas desde el
+-- panel (ver 005_session_reaper_checkpoint.sql)
+DROP TRIGGER IF EXISTS after_conversation_end;
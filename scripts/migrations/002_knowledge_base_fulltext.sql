@@ -0,0 +1,4 @@
+-- Migración: índice FULLTEXT para la búsqueda de ActionConsultaKnowledgeBase
+-- Sin él, MATCH(question) AGAINST(...) falla con "Can't find FULLTEXT index"
+-- (detectado con scripts/index_audit.py)
+ALTER TABLE knowledge_base ADD FULLTEXT INDEX idx_knowledge_base_question (question);
@@ -0,0 +1,20 @@
+-- Migración: agrupación de preguntas sin respuesta (backend/fallback_clusters.py)
+-- Ejecutar una sola vez sobre bases de datos existentes:
+--   mysql -u $DB_USERNAME -p $DB_DATABASE < scripts/migrations/003_difficult_questions_clusters.sql
+
+-- Identificador estable de cada grupo y firma MinHash de su pregunta
+-- representativa, para seguir ampliando los grupos en ejecuciones posteriores
+ALTER TABLE difficult_questions
+    ADD COLUMN cluster_key CHAR(16) NULL,
+    ADD COLUMN minhash VARBINARY(480) NULL,
+    ADD UNIQUE KEY uq_difficult_questions_cluster (subject_id, cluster_key);
+
+-- Punto de control de los procesos por lotes (último mensaje procesado)
+CREATE TABLE IF NOT EXISTS batch_job_state (
+    job VARCHAR(50) PRIMARY KEY,
+    last_message_id INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Lectura de los fallbacks nuevos: WHERE id > ? AND sender = 'user' AND intent IN (...)
+CREATE INDEX idx_messages_intent ON messages (intent, id);
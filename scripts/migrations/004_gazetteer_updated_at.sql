@@ -0,0 +1,7 @@
+-- Migración: actualización incremental del diccionario de entidades (rasa/actions/gazetteer.py)
+-- Ejecutar una sola vez sobre bases de datos existentes:
+--   mysql -u $DB_USERNAME -p $DB_DATABASE < scripts/migrations/004_gazetteer_updated_at.sql
+
+-- Lectura de las filas cambiadas: WHERE updated_at >= ?
+CREATE INDEX idx_subjects_updated_at ON subjects (updated_at);
+CREATE INDEX idx_users_updated_at ON users (updated_at);
@@ -0,0 +1,14 @@
+-- Migración: punto de control del cierre de conversaciones (backend/session_reaper.py)
+-- Ejecutar una sola vez sobre bases de datos existentes:
+--   mysql -u $DB_USERNAME -p $DB_DATABASE < scripts/migrations/005_session_reaper_checkpoint.sql
+
+CREATE TABLE IF NOT EXISTS batch_job_state (
+    job VARCHAR(50) PRIMARY KEY,
+    last_message_id INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Momento de la última ejecución del reaper: en la siguiente se recalculan
+-- las métricas de las conversaciones terminadas desde entonces
+ALTER TABLE batch_job_state
+    ADD COLUMN checkpoint_at TIMESTAMP NULL;
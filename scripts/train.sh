@@ -21,9 +21,10 @@ if ! docker-compose ps | grep -q "rasa"; then
     sleep 5
 fi
 
-# Entrenar el modelo de Rasa
+# Entrenar el modelo de Rasa (incremental: se omite o se ajusta si los datos apenas cambiaron)
+# Usa --force para forzar un entrenamiento completo
 echo -e "${YELLOW}Entrenando el modelo de Rasa...${NC}"
-docker-compose exec rasa rasa train
+docker-compose exec rasa python train_incremental.py "$@"
 
 # Verificar si el entrenamiento fue exitoso
 if [ $? -eq 0 ]; then
@@ -36,4 +37,6 @@ else
 fi
 
 echo -e "${GREEN}¡Entrenamiento completado con éxito!${NC}"
-echo -e "Para reiniciar el servicio de Rasa con el nuevo modelo, ejecuta: ${YELLOW}docker-compose restart rasa${NC}"
+echo -e "Para servir este modelo, ejecuta: ${YELLOW}docker-compose restart rasa rasa-standby${NC}"
+echo -e "Los modelos entrenados desde la pasarela (${YELLOW}POST /api/train${NC}) se despliegan sin cortes al activarlos"
+echo -e "(${YELLOW}POST /api/train/<job_id>/activate${NC} o ${YELLOW}trained_models.is_active${NC}); para volver al anterior: ${YELLOW}POST /api/models/rollback${NC}"
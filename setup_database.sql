@@ -12,7 +12,8 @@ CREATE TABLE IF NOT EXISTS users (
     password VARCHAR(255) NOT NULL,
     role ENUM('student', 'teacher', 'admin') NOT NULL DEFAULT 'student',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_users_updated_at (updated_at)
 );
 
 -- Tabla de documentos
@@ -90,6 +91,9 @@ CREATE TABLE IF NOT EXISTS conversations (
     session_id VARCHAR(100) NOT NULL,
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     ended_at TIMESTAMP NULL,
+    last_activity_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_conversations_session_open (session_id, ended_at, started_at),
+    INDEX idx_conversations_idle (ended_at, last_activity_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
 
@@ -102,6 +106,7 @@ CREATE TABLE IF NOT EXISTS messages (
     intent VARCHAR(100),
     confidence DECIMAL(5,4),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_messages_intent (intent, id),
     FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
 );
 
@@ -5,7 +5,8 @@ CREATE TABLE IF NOT EXISTS subjects (
     code VARCHAR(20) NOT NULL UNIQUE,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_subjects_updated_at (updated_at)
 );
 
 -- Tabla de relación profesor-materia
@@ -65,7 +66,20 @@ CREATE TABLE IF NOT EXISTS difficult_questions (
     fallback_count INT DEFAULT 0,
     last_asked TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+    -- Grupo de preguntas casi iguales (backend/fallback_clusters.py)
+    cluster_key CHAR(16) NULL,
+    minhash VARBINARY(480) NULL,
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_difficult_questions_cluster (subject_id, cluster_key)
+);
+
+-- Punto de control de los procesos por lotes (último mensaje procesado o
+-- momento de la última ejecución)
+CREATE TABLE IF NOT EXISTS batch_job_state (
+    job VARCHAR(50) PRIMARY KEY,
+    last_message_id INT NOT NULL DEFAULT 0,
+    checkpoint_at TIMESTAMP NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Procedimiento almacenado para clasificar un mensaje por materia